@@ -0,0 +1,206 @@
+import re
+import time
+import logging
+import pymongo
+from pymongo import UpdateOne, ReturnDocument
+from bson import Binary
+import db
+
+logger = logging.getLogger(__name__)
+
+# Canonical amenity dictionary: one document per amenity, {_id: bit, name, count}.
+# Each listing stores the bits of its amenities in two forms:
+#   amenityIds  - list of bit positions (multikey index, used for facets)
+#   amenityMask - BinData bitmask, tested with $bitsAllSet
+AMENITIES_COLLECTION = "amenities"
+COUNTERS_COLLECTION = "counters"
+
+DICTIONARY_TTL = 300  # seconds
+
+_dictionary_cache = {"loaded_at": 0, "ids": {}}
+
+# Prefixes the amenities modal puts in front of amenities a listing lacks
+UNAVAILABLE_PREFIXES = ("unavailable:", "not included:")
+
+
+def normalize_amenity(text):
+    """Normalize a scraped feature string into a canonical amenity name
+
+    Returns an empty string for features that describe a missing amenity.
+    """
+    # The modal renders a title and an optional description on separate lines
+    name = (text or "").strip().split("\n")[0].lower()
+    if name.startswith(UNAVAILABLE_PREFIXES):
+        return ""
+    name = re.sub(r"\s+", " ", name)
+    return name.strip(" .")
+
+
+def encode_mask(amenity_ids):
+    """Pack bit positions into a little-endian BinData mask for $bitsAllSet"""
+    mask = 0
+    for amenity_id in amenity_ids:
+        mask |= 1 << amenity_id
+    return Binary(mask.to_bytes((mask.bit_length() + 7) // 8 or 1, "little"))
+
+
+def decode_mask(mask):
+    """Unpack a BinData mask back into a Python int"""
+    return int.from_bytes(bytes(mask), "little") if mask else 0
+
+
+def ensure_amenity_indexes(db_name, listings_collection):
+    """Create the amenity dictionary and listing amenity indexes"""
+    try:
+        db.get_collection(db_name, AMENITIES_COLLECTION).create_index(
+            [("name", pymongo.ASCENDING)], unique=True)
+        db.get_collection(db_name, listings_collection).create_index(
+            [("amenityIds", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating amenity indexes: {str(e)}")
+        return False
+
+
+def load_dictionary(db_name, refresh=False):
+    """Get the {name: bit} amenity dictionary, cached for DICTIONARY_TTL seconds"""
+    if not refresh and time.time() - _dictionary_cache["loaded_at"] < DICTIONARY_TTL:
+        return _dictionary_cache["ids"]
+
+    try:
+        collection = db.get_collection(db_name, AMENITIES_COLLECTION)
+        ids = {doc["name"]: doc["_id"] for doc in collection.find({}, {"name": 1})}
+        _dictionary_cache.update(loaded_at=time.time(), ids=ids)
+    except Exception as e:
+        logger.error(f"Error loading amenity dictionary: {str(e)}")
+
+    return _dictionary_cache["ids"]
+
+
+def register_amenities(db_name, names):
+    """Add unseen amenity names to the dictionary and return the updated dictionary"""
+    dictionary = load_dictionary(db_name)
+    new_names = sorted({name for name in names if name and name not in dictionary})
+    if not new_names:
+        return dictionary
+
+    try:
+        amenities = db.get_collection(db_name, AMENITIES_COLLECTION)
+        counters = db.get_collection(db_name, COUNTERS_COLLECTION)
+
+        # Reserve a contiguous block of bit positions in one round-trip
+        counter = counters.find_one_and_update(
+            {"_id": AMENITIES_COLLECTION},
+            {"$inc": {"seq": len(new_names)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        first_id = counter["seq"] - len(new_names)
+
+        amenities.bulk_write([
+            UpdateOne({"name": name}, {"$setOnInsert": {"_id": first_id + offset, "name": name}}, upsert=True)
+            for offset, name in enumerate(new_names)
+        ], ordered=False)
+    except Exception as e:
+        # A concurrent writer may have registered the same names; reload picks them up
+        logger.warning(f"Error registering amenities: {str(e)}")
+
+    return load_dictionary(db_name, refresh=True)
+
+
+def encode_features(features, dictionary):
+    """Encode a listing's features into its amenityIds and amenityMask fields"""
+    amenity_ids = sorted({dictionary[name] for name in map(normalize_amenity, features or [])
+                          if name in dictionary})
+    return {"amenityIds": amenity_ids, "amenityMask": encode_mask(amenity_ids)}
+
+
+def encode_listing(db_name, listing):
+    """Add amenity fields to a freshly scraped listing, registering new amenities"""
+    names = [normalize_amenity(feature) for feature in listing.get("features", [])]
+    dictionary = register_amenities(db_name, names)
+    listing.update(encode_features(listing.get("features", []), dictionary))
+    return listing
+
+
+def lookup_amenity_ids(db_name, amenities):
+    """Map amenity names to bit positions, or None if one is not in the dictionary"""
+    dictionary = load_dictionary(db_name)
+    amenity_ids = []
+    for amenity in amenities:
+        name = normalize_amenity(amenity)
+        if name not in dictionary:
+            return None
+        amenity_ids.append(dictionary[name])
+    return amenity_ids
+
+
+def amenity_filter(db_name, amenities):
+    """Build a listing filter requiring all the given amenities
+
+    Returns None if an amenity is not in the dictionary, so the caller can
+    fall back to matching the raw feature strings.
+    """
+    amenity_ids = lookup_amenity_ids(db_name, amenities)
+    if not amenity_ids:
+        return None
+
+    return {
+        # Equality on one id lets the planner use the multikey index,
+        # the bitmask test then checks the rest without array scans
+        "amenityIds": amenity_ids[0],
+        "amenityMask": {"$bitsAllSet": amenity_ids}
+    }
+
+
+def amenity_facets(db_name, collection_name, query={}):
+    """Count matching listings per amenity"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        counts = collection.aggregate([
+            {"$match": query},
+            {"$unwind": "$amenityIds"},
+            {"$group": {"_id": "$amenityIds", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}}
+        ])
+        names = {amenity_id: name for name, amenity_id in load_dictionary(db_name).items()}
+        return [{"id": doc["_id"], "name": names.get(doc["_id"], ""), "count": doc["count"]}
+                for doc in counts]
+    except Exception as e:
+        logger.error(f"Error counting amenity facets: {str(e)}")
+        return []
+
+
+def rebuild_amenity_index(db_name, collection_name, batch_size=1000):
+    """Build the dictionary from all scraped features and re-encode every listing"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        names = {normalize_amenity(feature) for feature in collection.distinct("features")}
+        dictionary = register_amenities(db_name, names)
+
+        updated = 0
+        operations = []
+        for listing in collection.find({}, {"features": 1}):
+            operations.append(UpdateOne(
+                {"_id": listing["_id"]},
+                {"$set": encode_features(listing.get("features", []), dictionary)}
+            ))
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        # Keep per-amenity listing counts on the dictionary for admin views
+        count_updates = [
+            UpdateOne({"_id": facet["id"]}, {"$set": {"count": facet["count"]}})
+            for facet in amenity_facets(db_name, collection_name)
+        ]
+        if count_updates:
+            db.get_collection(db_name, AMENITIES_COLLECTION).bulk_write(count_updates, ordered=False)
+
+        logger.info(f"Encoded amenities for {updated} listings ({len(dictionary)} amenities)")
+        return {"amenities": len(dictionary), "updated_listings": updated}
+    except Exception as e:
+        logger.error(f"Error rebuilding amenity index: {str(e)}")
+        return {"amenities": 0, "updated_listings": 0}
@@ -0,0 +1,130 @@
+import datetime
+import logging
+import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import db
+
+logger = logging.getLogger(__name__)
+
+# Each listing has one availability document holding its booked nights as
+# 'YYYY-MM-DD' strings, so a conflict check is a single conditional update
+# and date filtering is an indexed lookup instead of a scan of trips
+AVAILABILITY_COLLECTION = "availability"
+
+# Longest stay we will expand into individual nights
+MAX_NIGHTS = 365
+
+
+def parse_date(value):
+    """Parse a 'YYYY-MM-DD' (or ISO datetime) string into a date, raising ValueError if invalid"""
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def nights_between(check_in, check_out):
+    """List the booked nights for a stay; the check-out day itself is free"""
+    start = parse_date(check_in)
+    end = parse_date(check_out)
+
+    if end <= start:
+        raise ValueError("checkOut must be after checkIn")
+    if (end - start).days > MAX_NIGHTS:
+        raise ValueError(f"stays are limited to {MAX_NIGHTS} nights")
+
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range((end - start).days)]
+
+
+def ensure_availability_indexes(db_name, collection_name=AVAILABILITY_COLLECTION):
+    """Create the availability indexes"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        collection.create_index([("listingId", pymongo.ASCENDING)], unique=True)
+        # Multikey index used by the /search date filter
+        collection.create_index([("bookedNights", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating availability indexes: {str(e)}")
+        return False
+
+
+def reserve_nights(db_name, collection_name, listing_id, nights):
+    """Atomically book nights for a listing
+
+    Returns False if any of the nights is already taken and None if the
+    database couldn't be reached.
+    """
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        # The filter only matches when none of the nights are booked. On a
+        # conflict the upsert tries to insert a second document for the
+        # listing, which the unique listingId index rejects.
+        collection.update_one(
+            {"listingId": listing_id, "bookedNights": {"$nin": nights}},
+            {"$addToSet": {"bookedNights": {"$each": nights}}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        logger.info(f"Booking conflict for listing {listing_id}")
+        return False
+    except Exception as e:
+        logger.error(f"Error reserving nights: {str(e)}")
+        return None
+
+
+def release_nights(db_name, collection_name, listing_id, nights):
+    """Free previously booked nights for a listing"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"listingId": listing_id},
+            {"$pullAll": {"bookedNights": nights}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error releasing nights: {str(e)}")
+        return False
+
+
+def backfill_trip_nights(db_name, trips_collection, collection_name=AVAILABILITY_COLLECTION, batch_size=500):
+    """Reserve the nights of existing upcoming and active trips
+
+    Trips booked before availability documents existed are otherwise
+    invisible to the overlap check. Safe to run repeatedly. Returns the
+    number of listings whose availability changed.
+    """
+    try:
+        nights_by_listing = {}
+        for trip in db.get_collection(db_name, trips_collection).find(
+                {"status": {"$in": ["upcoming", "active"]}}, {"listingId": 1, "checkIn": 1, "checkOut": 1}):
+            try:
+                nights = nights_between(trip["checkIn"], trip["checkOut"])
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping nights of trip {trip['_id']}: {e}")
+                continue
+            nights_by_listing.setdefault(trip["listingId"], set()).update(nights)
+
+        collection = db.get_collection(db_name, collection_name)
+        operations = [UpdateOne({"listingId": listing_id}, {"$addToSet": {"bookedNights": {"$each": sorted(nights)}}},
+                                upsert=True)
+                      for listing_id, nights in nights_by_listing.items()]
+        updated = 0
+        for start in range(0, len(operations), batch_size):
+            result = collection.bulk_write(operations[start:start + batch_size], ordered=False)
+            updated += result.modified_count + result.upserted_count
+        if updated:
+            logger.info(f"Backfilled booked nights for {updated} listings")
+        return updated
+    except Exception as e:
+        logger.error(f"Error backfilling booked nights: {str(e)}")
+        return 0
+
+
+def get_unavailable_listing_ids(db_name, collection_name, nights):
+    """Get the IDs of listings with at least one of the nights booked"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        return collection.distinct("listingId", {"bookedNights": {"$in": nights}})
+    except Exception as e:
+        logger.error(f"Error getting unavailable listings: {str(e)}")
+        return []
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from urllib.parse import unquote, urlsplit
+
+import httpx
+import main
+import http_fetcher
+from fixtures import FixtureStore, ReplayServer, FIXTURES_DIR
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+# Extracted values from a known-good run, compared on later runs to catch regressions
+EXPECTED_FILE = 'expected.json'
+
+
+class SeleniumEngine:
+    """The production extraction path: Chrome plus main.PLACE_FIELD_EXTRACTORS"""
+
+    name = 'selenium'
+
+    def __init__(self, page_load_wait=0, profile=None):
+        self.page_load_wait = page_load_wait
+        self.browser = main.initialize_browser(profile)
+        self.browser_pages = 0
+
+    def discover(self, site_url, location):
+        return main.get_place_urls(self.browser, location, site_url)
+
+    def extract(self, url):
+        """Scrape one listing, returning (place, seconds per field)"""
+        timings = {}
+        start = time.perf_counter()
+        self.browser.get(url)
+        time.sleep(self.page_load_wait)
+        timings['page_load'] = time.perf_counter() - start
+        self.browser_pages += 1
+
+        place = {"url": url}
+        for field, extractor in main.PLACE_FIELD_EXTRACTORS.items():
+            start = time.perf_counter()
+            place[field] = extractor(self.browser)
+            timings[field] = time.perf_counter() - start
+        return place, timings
+
+    def close(self):
+        self.browser.quit()
+
+
+class HttpEngine:
+    """HTTP-first path: parse embedded page data, browser for the fields left over"""
+
+    name = 'http'
+
+    def __init__(self, page_load_wait=0, profile=None):
+        self.page_load_wait = page_load_wait
+        self.profile = profile
+        self.client = httpx.Client(headers=http_fetcher.HEADERS)
+        self.browser = None
+        self.browser_pages = 0
+
+    def discover(self, site_url, location):
+        return []
+
+    def extract(self, url):
+        timings = {}
+        start = time.perf_counter()
+        response = self.client.get(url)
+        timings['page_load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        place = {"url": url}
+        place.update(http_fetcher.parse_place(response.text))
+        timings['parse'] = time.perf_counter() - start
+
+        missing = [field for field in main.PLACE_FIELD_EXTRACTORS if not place.get(field)]
+        if missing:
+            if self.browser is None:
+                self.browser = main.initialize_browser(self.profile)
+            self.browser_pages += 1
+            start = time.perf_counter()
+            self.browser.get(url)
+            time.sleep(self.page_load_wait)
+            timings['browser_load'] = time.perf_counter() - start
+            for field in missing:
+                start = time.perf_counter()
+                place[field] = main.PLACE_FIELD_EXTRACTORS[field](self.browser)
+                timings[field] = time.perf_counter() - start
+        return place, timings
+
+    def close(self):
+        self.client.close()
+        if self.browser is not None:
+            self.browser.quit()
+
+
+# Extraction engines that can be benchmarked against the same fixtures
+ENGINES = {
+    SeleniumEngine.name: SeleniumEngine,
+    HttpEngine.name: HttpEngine,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def search_location(url):
+    """Location string from a recorded /s/<location>/homes search URL"""
+    parts = urlsplit(url).path.split('/')
+    return unquote(parts[2]) if len(parts) > 2 and parts[1] == 's' else None
+
+
+def compare_to_expected(places, expected):
+    """Count listings per field whose value differs from the expected run"""
+    mismatches = {}
+    for place in places:
+        key = urlsplit(place["url"]).path
+        for field, value in expected.get(key, {}).items():
+            if place.get(field) != value:
+                mismatches[field] = mismatches.get(field, 0) + 1
+    return mismatches
+
+
+def run_benchmark(engine_name, store, repeat=1, page_load_wait=0, profile=None):
+    """Run an engine over every recorded page and collect speed and memory figures"""
+    with ReplayServer(store) as server:
+        engine = ENGINES[engine_name](page_load_wait=page_load_wait, profile=profile)
+        tracemalloc.start()
+        try:
+            discovery = []
+            for search_url in store.urls('search'):
+                location = search_location(search_url)
+                if location is None:
+                    continue
+                start = time.perf_counter()
+                found = engine.discover(server.url, location)
+                discovery.append({"location": location, "seconds": time.perf_counter() - start,
+                                  "urls": len(found)})
+
+            field_timings = {}
+            places = []
+            start = time.perf_counter()
+            for _ in range(repeat):
+                places = []
+                for url in store.urls('listing'):
+                    place, timings = engine.extract(server.local_url(url))
+                    place["url"] = url
+                    places.append(place)
+                    for field, seconds in timings.items():
+                        field_timings.setdefault(field, []).append(seconds)
+            elapsed = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            engine.close()
+
+        pages = len(places) * repeat
+        return {
+            "engine": engine_name,
+            "profile": profile,
+            "pages": pages,
+            "seconds": elapsed,
+            "pages_per_second": pages / elapsed if elapsed else 0.0,
+            "browser_pages": engine.browser_pages,
+            "fields": {field: {"mean_ms": 1000 * sum(values) / len(values),
+                               "p50_ms": 1000 * percentile(values, 0.5),
+                               "p95_ms": 1000 * percentile(values, 0.95)}
+                       for field, values in field_timings.items()},
+            "empty_fields": {field: sum(1 for place in places if not place.get(field))
+                             for field in main.PLACE_FIELD_EXTRACTORS},
+            "discovery": discovery,
+            "python_peak_mb": peak_memory / 2 ** 20,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+            "fixture_misses": list(server.misses),
+            "places": places
+        }
+
+
+def print_report(result, mismatches=None):
+    print(f"\nEngine: {result['engine']} (browser profile: {result['profile'] or 'default'})")
+    print(f"  {result['pages']} pages in {result['seconds']:.2f}s "
+          f"({result['pages_per_second']:.2f} pages/sec), {len(result['fixture_misses'])} fixture misses")
+    print(f"  {result['browser_pages']} pages loaded in the browser")
+    memory = f"  memory: {result['python_peak_mb']:.1f} MB python peak"
+    if result['max_rss_mb'] is not None:
+        memory += f", {result['max_rss_mb']:.1f} MB max RSS"
+    print(memory)
+    for search in result['discovery']:
+        print(f"  discovery '{search['location']}': {search['urls']} urls in {search['seconds']:.2f}s")
+
+    print(f"\n  {'field':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'empty':>8}{'changed':>9}")
+    for field, stats in result['fields'].items():
+        print(f"  {field:<15}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{result['empty_fields'].get(field, ''):>8}{(mismatches or {}).get(field, ''):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark listing extraction against recorded fixtures")
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help='Engine to run; repeat to compare engines (default: all)')
+    parser.add_argument('--dir', default=FIXTURES_DIR, help='Fixture directory from fixtures.py')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the listing fixtures')
+    parser.add_argument('--page-load-wait', type=float, default=0,
+                        help='Seconds to sleep after each page load, as production does')
+    parser.add_argument('--profile', choices=sorted(main.browser_profiles.BROWSER_PROFILES),
+                        help='Browser profile for engines that use Chrome')
+    parser.add_argument('--save-expected', action='store_true',
+                        help='Store this run\'s extracted values as the regression baseline')
+    parser.add_argument('--json', help='Write full results to this file')
+    args = parser.parse_args()
+
+    store = FixtureStore(args.dir)
+    if not store.pages:
+        parser.error(f"No fixtures in {args.dir}; record some with fixtures.py first")
+
+    expected_path = os.path.join(args.dir, EXPECTED_FILE)
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path) as f:
+            expected = json.load(f)
+
+    results = []
+    for engine_name in args.engine or sorted(ENGINES):
+        result = run_benchmark(engine_name, store, args.repeat, args.page_load_wait, args.profile)
+        print_report(result, compare_to_expected(result['places'], expected))
+        results.append(result)
+
+    misses = sorted({path for result in results for path in result['fixture_misses']})
+    if misses:
+        parser.exit(1, f"{len(misses)} requests had no recorded fixture, results are not comparable:\n  "
+                       + "\n  ".join(misses) + "\n")
+
+    if args.save_expected and results:
+        with open(expected_path, 'w') as f:
+            json.dump({urlsplit(place["url"]).path: {k: v for k, v in place.items() if k != "url"}
+                       for place in results[0]['places']}, f, indent=2)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
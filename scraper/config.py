@@ -0,0 +1,57 @@
+# config.py
+import os
+from dotenv import load_dotenv
+
+HOST="192.168.1.71"
+USER="root"
+PASSWD="Babycakes15!"
+DB="airbnb"
+
+# Load environment variables from .env file
+load_dotenv()
+
+class Config:
+    # Common configurations
+    DB_NAME = "airbnb"
+    COLLECTION_NAME = "listings"
+    # Serve /search from the in-memory column engine instead of MongoDB
+    SEARCH_ENGINE_ENABLED = os.getenv('SEARCH_ENGINE_ENABLED', 'false').lower() == 'true'
+    # Parse listing pages over plain HTTP first, using the browser only for missing fields
+    HTTP_FETCH_ENABLED = os.getenv('HTTP_FETCH_ENABLED', 'false').lower() == 'true'
+    HTTP_FETCH_CONCURRENCY = int(os.getenv('HTTP_FETCH_CONCURRENCY', 8))
+    # Browser profile from browser_profiles.BROWSER_PROFILES used when a job doesn't pick one
+    BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'default')
+    # Browsers fetching search result pages in parallel
+    SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', 3))
+    # Crawl states and provinces as map tiles so the per-search result cap doesn't truncate them
+    TILED_SEARCH_ENABLED = os.getenv('TILED_SEARCH_ENABLED', 'false').lower() == 'true'
+    # Keep compressed raw listing pages so extractors can be re-run without re-crawling
+    PAGE_ARCHIVE_ENABLED = os.getenv('PAGE_ARCHIVE_ENABLED', 'false').lower() == 'true'
+    # Download listing pictures after each crawl and serve thumbnails from /images
+    IMAGE_PIPELINE_ENABLED = os.getenv('IMAGE_PIPELINE_ENABLED', 'false').lower() == 'true'
+    # Seconds between sweeps that move trips to active/completed from their dates
+    TRIP_STATUS_SWEEP_SECONDS = int(os.getenv('TRIP_STATUS_SWEEP_SECONDS', 900))
+
+class DevelopmentConfig(Config):
+    ENV = 'development'
+    DEBUG = True
+    HOST = os.getenv('DEV_HOST', '127.0.0.1')  # Replace with your local IP
+    PORT = int(os.getenv('DEV_PORT', 5000))
+    CORS_ORIGINS = [
+        'http://localhost:6969',
+        'http://127.0.0.1:6969'  # Replace with your local IP
+    ]
+
+class ProductionConfig(Config):
+    ENV = 'production'
+    DEBUG = False
+    HOST = os.getenv('PROD_HOST', '0.0.0.0')
+    PORT = int(os.getenv('PROD_PORT', 5000))
+    CORS_ORIGINS = [
+        os.getenv('PROD_DOMAIN', 'https://realestayer.duocore.dev')
+    ]
+
+# Configure based on environment
+env = os.getenv('FLASK_ENV', 'development')
+config = ProductionConfig if env == 'production' else DevelopmentConfig
+
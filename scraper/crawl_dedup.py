@@ -0,0 +1,134 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Listings near a state or province border show up in the results of every
+# region they touch. Each crawl generation (one /scrape-north-america run)
+# keeps a Bloom filter of the listing URLs it has already saved, written to
+# disk after every region so a restarted crawl with the same generation
+# carries on where it stopped. A false positive skips a listing that wasn't
+# seen, at DEFAULT_ERROR_RATE.
+
+SEEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crawl_state')
+DEFAULT_CAPACITY = 2_000_000
+DEFAULT_ERROR_RATE = 1e-4
+# Generations kept on disk; older filters are deleted when a new one starts
+KEEP_GENERATIONS = 5
+GENERATION_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, backed by a numpy bit array"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return np.array([(first + i * second) % self.size for i in range(self.hashes)], dtype=np.int64)
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        return bool(np.all(self.bits[positions >> 3] & (1 << (positions & 7)).astype(np.uint8)))
+
+    def add(self, key):
+        """Add a key; returns False if it was (probably) already present"""
+        positions = self._positions(key)
+        masks = (1 << (positions & 7)).astype(np.uint8)
+        if np.all(self.bits[positions >> 3] & masks):
+            return False
+        np.bitwise_or.at(self.bits, positions >> 3, masks)
+        self.count += 1
+        return True
+
+    def save(self, path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, bits=self.bits,
+                                meta=np.array([self.capacity, self.count], dtype=np.int64),
+                                error_rate=np.array([self.error_rate]))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            capacity, count = (int(value) for value in data["meta"])
+            bloom = cls(capacity, float(data["error_rate"][0]))
+            bloom.bits = data["bits"].copy()
+            bloom.count = count
+        return bloom
+
+
+class SeenUrls:
+    """The listing URLs a crawl generation has already saved"""
+
+    def __init__(self, generation, directory=SEEN_DIR, capacity=DEFAULT_CAPACITY,
+                 error_rate=DEFAULT_ERROR_RATE):
+        if not GENERATION_PATTERN.match(generation):
+            raise ValueError(f"Invalid crawl generation: {generation}")
+        self.generation = generation
+        self.path = os.path.join(directory, f"seen-{generation}.npz")
+        self._lock = threading.Lock()
+        self.skipped = 0
+
+        if os.path.exists(self.path):
+            self.bloom = BloomFilter.load(self.path)
+            logger.info(f"Resuming crawl generation {generation} with {self.bloom.count} seen URLs")
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.bloom = BloomFilter(capacity, error_rate)
+            prune_generations(directory, keep=KEEP_GENERATIONS - 1)
+
+    def filter_new(self, urls):
+        """The URLs this generation hasn't saved yet, without marking them
+
+        Call mark_seen once their listings are written, so listings from a
+        region that failed part way are scraped again on resume.
+        """
+        with self._lock:
+            new_urls = [url for url in dict.fromkeys(urls) if url not in self.bloom]
+            self.skipped += len(urls) - len(new_urls)
+        if len(new_urls) < len(urls):
+            logger.info(f"Skipping {len(urls) - len(new_urls)} listings already scraped in this crawl")
+        return new_urls
+
+    def mark_seen(self, urls):
+        """Record URLs whose listings have been written"""
+        with self._lock:
+            for url in urls:
+                self.bloom.add(url)
+
+    def save(self):
+        try:
+            with self._lock:
+                self.bloom.save(self.path)
+        except OSError as e:
+            logger.error(f"Error saving seen URLs for generation {self.generation}: {str(e)}")
+
+
+def new_generation():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def prune_generations(directory=SEEN_DIR, keep=KEEP_GENERATIONS):
+    """Delete all but the newest `keep` generation files"""
+    files = sorted((os.path.join(directory, name) for name in os.listdir(directory)
+                    if name.startswith("seen-") and name.endswith(".npz")),
+                   key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        os.remove(path)
@@ -0,0 +1,254 @@
+import pymongo
+from bson import ObjectId
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MongoDB connection
+MONGO_URI = "mongodb://192.168.1.71:27017/"
+client = pymongo.MongoClient(MONGO_URI)
+
+
+def get_collection(db_name, collection_name):
+    """Get a MongoDB collection"""
+    try:
+        db = client[db_name]
+        collection = db[collection_name]
+        return collection
+    except Exception as e:
+        logger.error(f"Error connecting to MongoDB: {str(e)}")
+        return None
+
+
+def get_listings(db_name, collection_name, query={}, limit=0):
+    """Get listings with optional filtering and limit"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        if limit > 0:
+            return list(collection.find(query).limit(limit))
+        return list(collection.find(query))
+    except Exception as e:
+        logger.error(f"Error getting listings: {str(e)}")
+        return []
+
+
+def get_listing_by_id(db_name, collection_name, listing_id):
+    """Get a single listing by ID"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        if ObjectId.is_valid(listing_id):
+            return collection.find_one({"_id": ObjectId(listing_id)})
+        else:
+            return collection.find_one({"id": listing_id})
+    except Exception as e:
+        logger.error(f"Error getting listing by ID: {str(e)}")
+        return None
+
+
+def insert_many_into_collection(db_name, collection_name, items):
+    """Insert multiple items into a collection"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.insert_many(items)
+        return result.inserted_ids
+    except Exception as e:
+        logger.error(f"Error inserting many into collection: {str(e)}")
+        return []
+
+
+def upsert_listings_by_url(db_name, collection_name, items):
+    """Insert or update listings keyed by their canonical url and return their IDs
+
+    A re-crawled listing keeps its _id, so trips and saved listings that
+    reference it pick up its new details.
+    """
+    try:
+        collection = get_collection(db_name, collection_name)
+        # The last copy of a url in the batch wins
+        latest = {item["url"]: item for item in items if item.get("url")}
+        if not latest:
+            return []
+        collection.bulk_write([UpdateOne({"url": url}, {"$set": item}, upsert=True)
+                               for url, item in latest.items()], ordered=False)
+
+        # Oldest document first, for urls that older crawls inserted more than once
+        ids = {}
+        for listing in collection.find({"url": {"$in": list(latest)}}, {"url": 1}).sort("_id", pymongo.ASCENDING):
+            ids.setdefault(listing["url"], listing["_id"])
+        return [ids[url] for url in latest if url in ids]
+    except Exception as e:
+        logger.error(f"Error upserting listings: {str(e)}")
+        return []
+
+
+def insert_one_into_collection(db_name, collection_name, item):
+    """Insert one item into a collection and return the ID"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.insert_one(item)
+        return str(result.inserted_id)
+    except Exception as e:
+        logger.error(f"Error inserting into collection: {str(e)}")
+        return None
+
+
+def get_user_by_email(db_name, collection_name, email):
+    """Get a user by email"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        return collection.find_one({"email": email})
+    except Exception as e:
+        logger.error(f"Error getting user by email: {str(e)}")
+        return None
+
+
+def get_user_by_id(db_name, collection_name, user_id):
+    """Get a user by ID"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        if ObjectId.is_valid(user_id):
+            return collection.find_one({"_id": ObjectId(user_id)})
+        else:
+            return collection.find_one({"id": user_id})
+    except Exception as e:
+        logger.error(f"Error getting user by ID: {str(e)}")
+        return None
+
+
+def update_user(db_name, collection_name, user_id, update_data):
+    """Update a user's profile"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": update_data}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error updating user: {str(e)}")
+        return False
+
+
+def update_user_password(db_name, collection_name, user_id, hashed_password):
+    """Update a user's password"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"password": hashed_password}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error updating user password: {str(e)}")
+        return False
+
+
+def mark_user_for_deletion(db_name, collection_name, user_id):
+    """Mark a user for deletion"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"pendingDeletion": True}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error marking user for deletion: {str(e)}")
+        return False
+
+
+def get_user_trips(db_name, collection_name, user_id, status=None):
+    """Get trips for a user with optional status filter"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        query = {"userId": user_id}
+        if status:
+            query["status"] = status
+        return list(collection.find(query))
+    except Exception as e:
+        logger.error(f"Error getting user trips: {str(e)}")
+        return []
+
+
+def get_user_payment_methods(db_name, collection_name, user_id):
+    """Get payment methods for a user"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        return list(collection.find({"userId": user_id}))
+    except Exception as e:
+        logger.error(f"Error getting user payment methods: {str(e)}")
+        return []
+
+
+def add_saved_listing(db_name, collection_name, user_id, listing_id):
+    """Add a listing to user's saved listings"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$addToSet": {"savedListings": listing_id}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error adding saved listing: {str(e)}")
+        return False
+
+
+def remove_saved_listing(db_name, collection_name, user_id, listing_id):
+    """Remove a listing from user's saved listings"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$pull": {"savedListings": listing_id}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error removing saved listing: {str(e)}")
+        return False
+
+
+def get_filters(db_name, collection_name, query={}, limit=10):
+    """Get distinct filters available based on query"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        features = collection.distinct("features", query)
+        regions = collection.distinct("region", query)
+        countries = collection.distinct("country", query)
+
+        return {
+            "features": features,
+            "regions": regions,
+            "countries": countries
+        }
+    except Exception as e:
+        logger.error(f"Error getting filters: {str(e)}")
+        return {
+            "features": [],
+            "regions": [],
+            "countries": []
+        }
+
+
+def ensure_listing_indexes(db_name, collection_name):
+    """Create the indexes used by listing search"""
+    try:
+        collection = get_collection(db_name, collection_name)
+        # Sparse so listings scraped before coordinates were captured are skipped
+        collection.create_index([("geo", pymongo.GEOSPHERE)], sparse=True)
+        # Flat [lng, lat] index for map viewport $box searches; the default bounds exclude 180 itself
+        collection.create_index([("geo.coordinates", pymongo.GEO2D)], min=-180, max=180.000001)
+        # Crawls upsert by canonical url; not unique because older crawls inserted duplicates
+        collection.create_index([("url", pymongo.ASCENDING)])
+
+        # Sort modes for /search, each ending in _id so skip pagination is stable
+        collection.create_index([("priceValue", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+        collection.create_index([("ratingValue", pymongo.DESCENDING), ("_id", pymongo.ASCENDING)])
+        collection.create_index([("reviewCountValue", pymongo.DESCENDING), ("_id", pymongo.ASCENDING)])
+        collection.create_index([("region", pymongo.ASCENDING), ("priceValue", pymongo.ASCENDING),
+                                 ("_id", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating listing indexes: {str(e)}")
+        return False
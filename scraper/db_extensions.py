@@ -0,0 +1,911 @@
+from pymongo import MongoClient, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure
+from bson import ObjectId
+import logging
+import datetime
+import math
+import logging
+import db
+import itinerary_rollups
+
+logger = logging.getLogger(__name__)
+
+def get_user_by_email(db_name, collection_name, email):
+    """Get a user by email"""
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        user = collection.find_one({'email': email})
+        return user
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user by email: {e}")
+        return None
+    finally:
+        db.close_connection()
+
+
+def get_reviews_for_listings(db_name, collection_name, listing_ids):
+    """Get reviews for a list of listings"""
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        reviews = list(collection.find({'listingId': {'$in': listing_ids}}).sort('date', DESCENDING))
+
+        # Convert ObjectIds to strings
+        for review in reviews:
+            review['id'] = str(review['_id'])
+            del review['_id']
+
+        return reviews
+    except Exception as e:
+        logging.error(f"An error occurred while fetching reviews for listings: {e}")
+        return []
+    finally:
+        db.close_connection()
+
+
+def update_listing_review_stats(db_name, collection_name, listing_id):
+    """Update a listing's review count and average rating"""
+
+    # Get review stats first
+    stats = get_listing_review_stats(db_name, "reviews", listing_id)
+
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(listing_id)},
+            {'$set': {
+                'reviewCount': stats['totalReviews'],
+                'averageRating': stats['averageRating'],
+                'categoryRatings': stats['categoryAverages']
+            }}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while updating listing review stats: {e}")
+        return False
+
+
+def count_documents(db_name, collection_name, query=None):
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        return collection.count_documents(query or {})
+    except Exception as e:
+        logging.error(f"An error occurred while counting documents: {e}")
+        return 0
+    finally:
+        db.close_connection()
+
+
+def get_listings_with_pagination(db_name, collection_name, query=None, skip=0, limit=20):
+    """Get listings with pagination"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        cursor = collection.find(query or {}).skip(skip).limit(limit)
+
+        # Convert MongoDB documents to JSON-serializable format
+        results = []
+        for doc in cursor:
+            doc['id'] = str(doc['_id'])
+            del doc['_id']
+            results.append(doc)
+
+        return results
+    except Exception as e:
+        logging.error(f"An error occurred while fetching listings with pagination: {e}")
+        return []
+    finally:
+        db.close_connection()
+
+
+def get_user_by_id(db_name, collection_name, user_id):
+    """Get a user by ID"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        user = collection.find_one({'_id': ObjectId(user_id)})
+        return user
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user by ID: {e}")
+        return None
+    finally:
+        db.close_connection()
+
+
+def insert_one_into_collection(db_name, collection_name, document):
+    """Insert a single document into a collection"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.insert_one(document)
+        return str(result.inserted_id)
+    except Exception as e:
+        logging.error(f"An error occurred while inserting document: {e}")
+        return None
+    finally:
+        db.close_connection()
+
+
+def update_user(db_name, collection_name, user_id, update_data):
+    """Update a user document"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': update_data}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while updating user: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def update_user_password(db_name, collection_name, user_id, new_password):
+    """Update a user's password"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {'password': new_password}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while updating user password: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def mark_user_for_deletion(db_name, collection_name, user_id):
+    """Mark a user for deletion"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {
+                'markedForDeletion': True,
+                'deletionRequestDate': datetime.datetime.utcnow().isoformat()
+            }}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while marking user for deletion: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def add_saved_listing(db_name, collection_name, user_id, listing_id):
+    """Add a listing to a user's saved listings"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$addToSet': {'savedListings': listing_id}}
+        )
+        return True  # Return true even if listing was already saved
+    except Exception as e:
+        logging.error(f"An error occurred while adding saved listing: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def remove_saved_listing(db_name, collection_name, user_id, listing_id):
+    """Remove a listing from a user's saved listings"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$pull': {'savedListings': listing_id}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while removing saved listing: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def get_listings_by_ids(db_name, collection_name, listing_ids):
+    """Get listings by their IDs"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        listings = list(collection.find({'_id': {'$in': [ObjectId(id) for id in listing_ids]}}))
+
+        # Convert ObjectIds to strings
+        for listing in listings:
+            listing['id'] = str(listing['_id'])
+            del listing['_id']
+
+        return listings
+    except Exception as e:
+        logging.error(f"An error occurred while fetching listings by IDs: {e}")
+        return []
+    finally:
+        db.close_connection()
+
+
+def get_user_trips(db_name, collection_name, user_id, status=None):
+    """Get trips for a user, optionally filtered by status"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+
+        query = {'userId': user_id}
+        if status:
+            query['status'] = status
+
+        trips = list(collection.find(query).sort('bookedAt', DESCENDING))
+
+        # Convert ObjectIds to strings
+        for trip in trips:
+            trip['id'] = str(trip['_id'])
+            del trip['_id']
+
+        return trips
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user trips: {e}")
+        return []
+    finally:
+        db.close_connection()
+
+
+def get_trip_by_id(db_name, collection_name, trip_id):
+    """Get a trip by ID"""
+    if not ObjectId.is_valid(trip_id):
+        return None
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        trip = collection.find_one({'_id': ObjectId(trip_id)})
+
+        if trip:
+            trip['id'] = str(trip['_id'])
+            del trip['_id']
+
+        return trip
+    except Exception as e:
+        logging.error(f"An error occurred while fetching trip by ID: {e}")
+        return None
+
+
+def update_trip_status(db_name, collection_name, trip_id, status, from_statuses=None):
+    """Update a trip's status if it currently has one of from_statuses
+
+    Returns False if the trip's status didn't allow the change (by default,
+    if it already had the new status) and None on a database error.
+    """
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        # Matching on the old status means only one of two concurrent updates wins
+        current = {'$in': list(from_statuses)} if from_statuses else {'$ne': status}
+        result = collection.update_one(
+            {'_id': ObjectId(trip_id), 'status': current},
+            {'$set': {'status': status}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while updating trip status: {e}")
+        return None
+
+
+def _user_id_filter(user_id):
+    return {'_id': ObjectId(user_id)}
+
+
+def get_user_payment_methods(db_name, collection_name, user):
+    """Get payment methods for a user, with isDefault taken from the user's default pointer"""
+
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        payment_methods = list(collection.find({'userId': str(user['_id'])}))
+
+        # Convert ObjectIds to strings
+        for method in payment_methods:
+            method['id'] = str(method['_id'])
+            del method['_id']
+
+        for method in payment_methods:
+            method['isDefault'] = method['id'] == user.get('defaultPaymentMethodId')
+
+        return payment_methods
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user payment methods: {e}")
+        return []
+
+
+def get_payment_method_by_id(db_name, collection_name, payment_method_id):
+    """Get a payment method by ID"""
+
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        payment_method = collection.find_one({'_id': ObjectId(payment_method_id)})
+
+        if payment_method:
+            payment_method['id'] = str(payment_method['_id'])
+            del payment_method['_id']
+
+        return payment_method
+    except Exception as e:
+        logging.error(f"An error occurred while fetching payment method by ID: {e}")
+        return None
+
+
+def add_payment_method(db_name, users_collection, collection_name, user_id, payment_method):
+    """Insert a payment method, making it the default if the user has none
+
+    Returns (payment method id, whether it became the default), or (None, False).
+    """
+
+    try:
+        payment_method['_id'] = ObjectId()
+        payment_method_id = str(payment_method['_id'])
+        collection = db.get_collection(db_name, collection_name)
+        collection.insert_one(payment_method)
+
+        # One update registers the method on the user and claims the default if there is none,
+        # so concurrent adds, switches and removals all see a consistent user document
+        user = db.get_collection(db_name, users_collection).find_one_and_update(
+            _user_id_filter(user_id),
+            [{'$set': {
+                'paymentMethodIds': {'$concatArrays': [{'$ifNull': ['$paymentMethodIds', []]},
+                                                       {'$literal': [payment_method_id]}]},
+                'defaultPaymentMethodId': {'$ifNull': ['$defaultPaymentMethodId', {'$literal': payment_method_id}]}
+            }}],
+            projection={'defaultPaymentMethodId': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not user:
+            collection.delete_one({'_id': payment_method['_id']})
+            return None, False
+        return payment_method_id, user.get('defaultPaymentMethodId') == payment_method_id
+    except Exception as e:
+        logging.error(f"An error occurred while adding payment method: {e}")
+        return None, False
+
+
+def set_default_payment_method(db_name, users_collection, user_id, payment_method_id):
+    """Point the user's default at one of their payment methods, returning False if they don't have it"""
+
+    try:
+        # Ownership is checked in the filter, so a method removed concurrently can't become the default
+        result = db.get_collection(db_name, users_collection).update_one(
+            dict(_user_id_filter(user_id), paymentMethodIds=payment_method_id),
+            {'$set': {'defaultPaymentMethodId': payment_method_id}}
+        )
+        return result.matched_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while setting default payment method: {e}")
+        return False
+
+
+def remove_payment_method(db_name, users_collection, collection_name, user_id, payment_method_id):
+    """Remove a payment method, returning False if the user doesn't have it or it is the
+    default while they have others
+    """
+
+    try:
+        # The filter refuses to remove the default unless it is the only method, and the same
+        # update clears the default pointer, so no concurrent request sees one without the other
+        result = db.get_collection(db_name, users_collection).update_one(
+            dict(_user_id_filter(user_id), paymentMethodIds=payment_method_id,
+                 **{'$or': [{'defaultPaymentMethodId': {'$ne': payment_method_id}},
+                            {'paymentMethodIds.1': {'$exists': False}}]}),
+            [{'$set': {
+                'paymentMethodIds': {'$filter': {'input': '$paymentMethodIds',
+                                                 'cond': {'$ne': ['$$this', {'$literal': payment_method_id}]}}},
+                'defaultPaymentMethodId': {'$cond': [
+                    {'$eq': ['$defaultPaymentMethodId', {'$literal': payment_method_id}]},
+                    None, '$defaultPaymentMethodId']}
+            }}]
+        )
+        if not result.modified_count:
+            return False
+
+        db.get_collection(db_name, collection_name).delete_one(
+            {'_id': ObjectId(payment_method_id), 'userId': user_id})
+        return True
+    except Exception as e:
+        logging.error(f"An error occurred while removing payment method: {e}")
+        return False
+
+
+def ensure_payment_method_indexes(db_name, collection_name):
+    """Index payment methods by user for the listing and count-only checks"""
+
+    try:
+        db.get_collection(db_name, collection_name).create_index([('userId', ASCENDING)])
+        return True
+    except Exception as e:
+        logging.error(f"An error occurred while creating payment method indexes: {e}")
+        return False
+
+
+def backfill_user_payment_methods(db_name, users_collection, collection_name):
+    """Set paymentMethodIds, and defaultPaymentMethodId from the method's old isDefault flag,
+    on users that predate them
+
+    Returns the number of users updated.
+    """
+
+    try:
+        users = db.get_collection(db_name, users_collection)
+        user_ids = [str(user['_id']) for user in users.find({'paymentMethodIds': {'$exists': False}}, {'_id': 1})]
+        if not user_ids:
+            return 0
+
+        owned = {user_id: [] for user_id in user_ids}
+        defaults = {}
+        for method in db.get_collection(db_name, collection_name).find(
+                {'userId': {'$in': user_ids}}, {'userId': 1, 'isDefault': 1}):
+            owned[method['userId']].append(str(method['_id']))
+            if method.get('isDefault'):
+                defaults[method['userId']] = str(method['_id'])
+
+        operations = [
+            UpdateOne(dict(_user_id_filter(user_id), paymentMethodIds={'$exists': False}), [{'$set': {
+                'paymentMethodIds': {'$literal': payment_method_ids},
+                # Users who have picked a default since keep it
+                'defaultPaymentMethodId': {'$ifNull': ['$defaultPaymentMethodId',
+                                                       {'$literal': defaults.get(user_id)}]}
+            }}])
+            for user_id, payment_method_ids in owned.items()
+        ]
+        return users.bulk_write(operations, ordered=False).modified_count
+    except Exception as e:
+        logging.error(f"An error occurred while backfilling user payment methods: {e}")
+        return 0
+
+
+def update_notification_preferences(db_name, collection_name, user_id, preferences):
+    """Update a user's notification preferences"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {'notificationPreferences': preferences}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while updating notification preferences: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def get_user_itineraries(db_name, collection_name, user_id):
+    """Get all itineraries for a user"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        itineraries = list(collection.find({'userId': user_id}).sort('createdAt', DESCENDING))
+
+        # Convert ObjectIds to strings
+        for itinerary in itineraries:
+            itinerary['id'] = str(itinerary['_id'])
+            del itinerary['_id']
+
+        return itineraries
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user itineraries: {e}")
+        return []
+    finally:
+        db.close_connection()
+
+
+def get_itinerary_by_id(db_name, collection_name, itinerary_id):
+    """Get an itinerary by ID"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        itinerary = collection.find_one({'_id': ObjectId(itinerary_id)})
+
+        if itinerary and not itinerary_rollups.is_current(itinerary):
+            # Older itineraries, or ones whose rollup save failed, get them on read
+            _store_itinerary_rollups(collection, itinerary)
+
+        if itinerary:
+            itinerary['id'] = str(itinerary['_id'])
+            del itinerary['_id']
+
+        return itinerary
+    except Exception as e:
+        logging.error(f"An error occurred while fetching itinerary by ID: {e}")
+        return None
+
+
+def update_itinerary(db_name, collection_name, itinerary_id, update_data):
+    """Update an itinerary"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        itinerary = collection.find_one_and_update(
+            {'_id': ObjectId(itinerary_id)},
+            {'$set': update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if itinerary:
+            _store_itinerary_rollups(collection, itinerary)
+        return itinerary is not None
+    except Exception as e:
+        logging.error(f"An error occurred while updating itinerary: {e}")
+        return False
+
+
+def delete_itinerary(db_name, collection_name, itinerary_id):
+    """Delete an itinerary"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.delete_one({'_id': ObjectId(itinerary_id)})
+        return result.deleted_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while deleting itinerary: {e}")
+        return False
+
+
+# Itinerary lists whose entries are addressed by their 'id' field
+ITINERARY_SECTIONS = ('activities', 'accommodations', 'transportation')
+
+
+def _owned_itinerary_filter(itinerary_id, user_id):
+    # Ownership is part of the filter, so the write itself enforces it
+    return {'_id': ObjectId(itinerary_id), 'userId': user_id}
+
+
+def _store_itinerary_rollups(collection, itinerary):
+    """Recompute the rollups of an itinerary that was read without current ones and try to save them
+
+    The save only applies if no write has happened since the read, so a
+    slow request can't overwrite newer rollups with stale ones. It is best
+    effort: the next read recomputes them again.
+    """
+    rollups = itinerary_rollups.itinerary_rollups(itinerary)
+    itinerary.update(rollups)
+    try:
+        collection.update_one(
+            {'_id': itinerary['_id'], 'updatedAt': itinerary.get('updatedAt')},
+            {'$set': rollups}
+        )
+    except Exception as e:
+        logging.warning(f"Could not save itinerary rollups, they will be recomputed on read: {e}")
+    return itinerary
+
+
+# Attempts at an itinerary write that keeps losing to concurrent writes
+ITINERARY_WRITE_ATTEMPTS = 3
+
+
+def _apply_section_changes(itinerary, changes):
+    """The lists the changes touch, after applying them, or None if an entry to update or delete is missing"""
+    sections = {}
+    for section in ITINERARY_SECTIONS:
+        section_changes = [change for change in changes if change['section'] == section]
+        if not section_changes:
+            continue
+        entries = itinerary.get(section) or []
+        existing_ids = {entry.get('id') for entry in entries}
+        if any(change['op'] != 'add' and change['id'] not in existing_ids for change in section_changes):
+            return None
+
+        deleted = {change['id'] for change in section_changes if change['op'] == 'delete'}
+        updates = {change['id']: change['data'] for change in section_changes if change['op'] == 'update'}
+        sections[section] = [{**entry, **updates.get(entry.get('id'), {})}
+                             for entry in entries if entry.get('id') not in deleted]
+        sections[section] += [change['item'] for change in section_changes if change['op'] == 'add']
+    return sections
+
+
+def apply_itinerary_changes(db_name, collection_name, itinerary_id, user_id, changes):
+    """Apply add/update/delete edits across an itinerary's lists in one atomic update
+
+    Each change is {'op': 'add'|'update'|'delete', 'section': ..., 'id': ...,
+    'item'/'data': ...}, with each entry updated or deleted at most once.
+    The timeline and cost summary are written by the same update. Returns the
+    updated itinerary, or None if the user has no such itinerary or an entry
+    to update or delete doesn't exist.
+    """
+
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        owned = _owned_itinerary_filter(itinerary_id, user_id)
+
+        for _ in range(ITINERARY_WRITE_ATTEMPTS):
+            itinerary = collection.find_one(owned)
+            if not itinerary:
+                return None
+            sections = _apply_section_changes(itinerary, changes)
+            if sections is None:
+                return None
+
+            read_at = itinerary.get('updatedAt')
+            itinerary.update(sections, updatedAt=datetime.datetime.utcnow().isoformat())
+            rollups = itinerary_rollups.itinerary_rollups(itinerary)
+            itinerary.update(rollups)
+
+            # Only applies if nothing else wrote the itinerary since it was read; otherwise start over
+            result = collection.update_one(
+                dict(owned, updatedAt=read_at),
+                {'$set': dict(sections, updatedAt=itinerary['updatedAt'], **rollups)}
+            )
+            if result.matched_count:
+                itinerary['id'] = str(itinerary['_id'])
+                del itinerary['_id']
+                return itinerary
+
+        logging.warning(f"Gave up on itinerary {itinerary_id} after {ITINERARY_WRITE_ATTEMPTS} conflicting writes")
+        return None
+    except Exception as e:
+        logging.error(f"An error occurred while applying itinerary changes: {e}")
+        return None
+
+
+def add_itinerary_item(db_name, collection_name, itinerary_id, user_id, section, item):
+    """Append an entry to an itinerary list; returns False if the user has no such itinerary"""
+    change = {'op': 'add', 'section': section, 'item': item}
+    return apply_itinerary_changes(db_name, collection_name, itinerary_id, user_id, [change]) is not None
+
+
+def update_itinerary_item(db_name, collection_name, itinerary_id, user_id, section, item_id, update_data):
+    """Update one entry of an itinerary list and return it, or None if it wasn't found"""
+    change = {'op': 'update', 'section': section, 'id': item_id, 'data': update_data}
+    itinerary = apply_itinerary_changes(db_name, collection_name, itinerary_id, user_id, [change])
+    if not itinerary:
+        return None
+    return next((entry for entry in itinerary[section] if entry.get('id') == item_id), None)
+
+
+def delete_itinerary_item(db_name, collection_name, itinerary_id, user_id, section, item_id):
+    """Remove one entry from an itinerary list; returns False if it wasn't found"""
+    change = {'op': 'delete', 'section': section, 'id': item_id}
+    return apply_itinerary_changes(db_name, collection_name, itinerary_id, user_id, [change]) is not None
+
+
+def has_user_stayed_at_listing(db_name, collection_name, user_id, listing_id):
+    """Check if a user has stayed at a listing (completed trip)"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        # Served by the (userId, listingId, status) index; trip_status keeps status current
+        count = collection.count_documents({
+            'userId': user_id,
+            'listingId': listing_id,
+            'status': 'completed'
+        }, limit=1)
+        return count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while checking if user stayed at listing: {e}")
+        return False
+
+
+def get_user_review_for_listing(db_name, collection_name, user_id, listing_id):
+    """Get a user's review for a specific listing"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        review = collection.find_one({
+            'userId': user_id,
+            'listingId': listing_id
+        })
+
+        if review:
+            review['id'] = str(review['_id'])
+            del review['_id']
+
+        return review
+    except Exception as e:
+        logging.error(f"An error occurred while fetching user review for listing: {e}")
+        return None
+
+
+def get_listing_reviews(db_name, collection_name, listing_id, page=1, per_page=10, rating=0):
+    """Get reviews for a specific listing with pagination and rating filter"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+
+        # Build query
+        query = {'listingId': listing_id}
+        if rating > 0:
+            query['rating'] = rating
+
+        # Count total matching reviews
+        total_count = collection.count_documents(query)
+
+        # Calculate pagination values
+        skip = (page - 1) * per_page
+        page_count = math.ceil(total_count / per_page)
+
+        # Get reviews for current page
+        reviews = list(collection.find(query)
+                       .sort('date', DESCENDING)
+                       .skip(skip)
+                       .limit(per_page))
+
+        # Convert ObjectIds to strings
+        for review in reviews:
+            review['id'] = str(review['_id'])
+            del review['_id']
+
+        return {
+            'reviews': reviews,
+            'totalCount': total_count,
+            'pageCount': page_count
+        }
+    except Exception as e:
+        logging.error(f"An error occurred while fetching listing reviews: {e}")
+        return {'reviews': [], 'totalCount': 0, 'pageCount': 0}
+    finally:
+        db.close_connection()
+
+
+def get_listing_review_stats(db_name, collection_name, listing_id):
+    """Get review statistics for a listing"""
+    
+    try:
+        collection = db.get_collection(db_name, collection_name)
+
+        # Get count of reviews by rating
+        rating_counts = {}
+        for rating in range(1, 6):
+            count = collection.count_documents({'listingId': listing_id, 'rating': rating})
+            rating_counts[str(rating)] = count
+
+        # Get average rating
+        pipeline = [
+            {'$match': {'listingId': listing_id}},
+            {'$group': {
+                '_id': None,
+                'averageRating': {'$avg': '$rating'},
+                'count': {'$sum': 1}
+            }}
+        ]
+
+        result = list(collection.aggregate(pipeline))
+
+        if result:
+            average_rating = result[0]['averageRating']
+            total_reviews = result[0]['count']
+        else:
+            average_rating = 0
+            total_reviews = 0
+
+        # Get category averages
+        category_pipeline = [
+            {'$match': {'listingId': listing_id}},
+            {'$group': {
+                '_id': None,
+                'averageCleanliness': {'$avg': '$categories.cleanliness'},
+                'averageAccuracy': {'$avg': '$categories.accuracy'},
+                'averageCommunication': {'$avg': '$categories.communication'},
+                'averageLocation': {'$avg': '$categories.location'},
+                'averageCheckin': {'$avg': '$categories.checkin'},
+                'averageValue': {'$avg': '$categories.value'}
+            }}
+        ]
+
+        category_result = list(collection.aggregate(category_pipeline))
+
+        category_averages = {}
+        if category_result:
+            for key, value in category_result[0].items():
+                if key != '_id':
+                    # Convert key from camelCase to the category name
+                    category = key.replace('average', '').lower()
+                    category_averages[category] = value
+
+        return {
+            'averageRating': average_rating,
+            'totalReviews': total_reviews,
+            'ratingCounts': rating_counts,
+            'categoryAverages': category_averages
+        }
+    except Exception as e:
+        logging.error(f"An error occurred while fetching listing review stats: {e}")
+        return {
+            'averageRating': 0,
+            'totalReviews': 0,
+            'ratingCounts': {},
+            'categoryAverages': {}
+        }
+
+
+def get_review_by_id(db_name, collection_name, review_id):
+    """Get a review by ID"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        review = collection.find_one({'_id': ObjectId(review_id)})
+
+        if review:
+            review['id'] = str(review['_id'])
+            del review['_id']
+
+        return review
+    except Exception as e:
+        logging.error(f"An error occurred while fetching review by ID: {e}")
+        return None
+    finally:
+        db.close_connection()
+
+
+def increment_review_helpful_count(db_name, collection_name, review_id):
+    """Increment the helpful count for a review"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(review_id)},
+            {'$inc': {'helpfulCount': 1}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while incrementing review helpful count: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def add_response_to_review(db_name, collection_name, review_id, response):
+    """Add a host response to a review"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {'_id': ObjectId(review_id)},
+            {'$set': {'response': response}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logging.error(f"An error occurred while adding response to review: {e}")
+        return False
+    finally:
+        db.close_connection()
+
+
+def get_reviews_by_user(db_name, collection_name, user_id):
+    """Get reviews written by a user"""
+    
+    try:
+        db.connect()
+        collection = db.get_collection(db_name, collection_name)
+        reviews = list(collection.find({'userId': user_id}).sort('date', DESCENDING))
+
+        # Convert ObjectIds to strings
+        for review in reviews:
+            review['id'] = str(review['_id'])
+            del review['_id']
+
+        return reviews
+    except Exception as e:
+        logging.error(f"An error occurred while fetching reviews by user: {e}")
+        return []
+    finally:
+        db.close_connection()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import threading
+import logging
+from bson import ObjectId
+from pymongo import UpdateMany
+import db
+import saved_listings
+
+logger = logging.getLogger(__name__)
+
+# Trips copy a few listing fields at booking time and saved listings copy the
+# card fields, so /trips and /saved-listings are single collection reads.
+# Listings change after re-crawls and re-extraction, so this job pushes the
+# current values back into the documents that copied them.
+
+TRIPS_COLLECTION = "trips"
+
+# Trip field -> function of the listing document
+TRIP_LISTING_FIELDS = {
+    "listingTitle": lambda listing: listing.get("title", ""),
+    "listingImage": lambda listing: listing.get("picture_url", ""),
+    "listingThumbnail": lambda listing: (listing.get("image") or {}).get("thumbnails", {}).get("320", ""),
+    "location": lambda listing: listing.get("location", ""),
+}
+LISTING_PROJECTION = {"title": 1, "picture_url": 1, "image.thumbnails": 1, "location": 1}
+
+# Refreshes waiting for the background job, per (db_name, listings_collection):
+# a set of listing ids, or None for every listing
+_pending = {}
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def trip_listing_snapshot(listing):
+    """The listing fields a trip keeps a copy of"""
+    return {field: value(listing) for field, value in TRIP_LISTING_FIELDS.items()}
+
+
+def _refresh_copies(db_name, listings_collection, copies_collection, fields, projection,
+                    listing_ids=None, batch_size=500):
+    """Copy current listing fields into the documents of copies_collection whose copies differ"""
+    copies = db.get_collection(db_name, copies_collection)
+    listings = db.get_collection(db_name, listings_collection)
+
+    query = {"listingId": {"$in": [str(listing_id) for listing_id in listing_ids]}} if listing_ids else {}
+    copied_ids = [listing_id for listing_id in copies.distinct("listingId", query) if ObjectId.is_valid(listing_id)]
+
+    updated = 0
+    for start in range(0, len(copied_ids), batch_size):
+        batch = [ObjectId(listing_id) for listing_id in copied_ids[start:start + batch_size]]
+        operations = []
+        for listing in listings.find({"_id": {"$in": batch}}, projection):
+            snapshot = {field: value(listing) for field, value in fields.items()}
+            # Matching only documents with a stale field keeps unchanged ones from being rewritten
+            operations.append(UpdateMany(
+                {"listingId": str(listing["_id"]),
+                 "$or": [{field: {"$ne": value}} for field, value in snapshot.items()]},
+                {"$set": snapshot}
+            ))
+        if operations:
+            updated += copies.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+def refresh_listing_copies(db_name, listings_collection, listing_ids=None, batch_size=500):
+    """Copy current listing fields into trips and saved listings whose copies differ
+
+    Only documents that actually changed are written. Returns the number of
+    trips and saved listings updated.
+    """
+    try:
+        counts = {
+            "trips": _refresh_copies(db_name, listings_collection, TRIPS_COLLECTION, TRIP_LISTING_FIELDS,
+                                     LISTING_PROJECTION, listing_ids, batch_size),
+            "saved_listings": _refresh_copies(db_name, listings_collection,
+                                              saved_listings.SAVED_LISTINGS_COLLECTION, saved_listings.CARD_FIELDS,
+                                              saved_listings.CARD_PROJECTION, listing_ids, batch_size),
+        }
+        logger.info(f"Refreshed listing details on {counts['trips']} trips "
+                    f"and {counts['saved_listings']} saved listings")
+        return counts
+    except Exception as e:
+        logger.error(f"Error refreshing listing copies: {str(e)}")
+        return {"trips": 0, "saved_listings": 0}
+
+
+def refresh_in_background(db_name, listings_collection, listing_ids=None):
+    """Run refresh_listing_copies on a daemon thread
+
+    Requests made while a refresh is running are merged and run when it
+    finishes; listing_ids=None refreshes every listing.
+    """
+    global _worker
+
+    def run():
+        global _worker
+        while True:
+            with _pending_lock:
+                if not _pending:
+                    _worker = None
+                    return
+                (job_db_name, job_collection), ids = _pending.popitem()
+            try:
+                refresh_listing_copies(job_db_name, job_collection, None if ids is None else list(ids))
+            except Exception as e:
+                logger.error(f"Error in background listing refresh: {str(e)}")
+
+    key = (db_name, listings_collection)
+    with _pending_lock:
+        if listing_ids is None or (key in _pending and _pending[key] is None):
+            _pending[key] = None
+        else:
+            _pending.setdefault(key, set()).update(listing_ids)
+        if _worker is None:
+            _worker = threading.Thread(target=run, name="trip-listing-refresh", daemon=True)
+            _worker.start()
+    return True
@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Recorded pages live here as <sha1>.html plus a manifest.json mapping
+# fixture keys to files, so the replay server can serve them offline
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MANIFEST_FILE = 'manifest.json'
+
+# Executable scripts would re-render (and re-fetch) the page on replay. JSON
+# payloads are kept because extractors read coordinates from them.
+SCRIPT_PATTERN = re.compile(
+    r'<script(?![^>]*type="application/(?:ld\+)?json")[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL)
+
+
+# Query parameters that select which results a search page shows. The rest are
+# dates, cursors and tracking values that change between runs.
+PAGE_PARAMS = ('items_offset', 'ne_lat', 'ne_lng', 'sw_lat', 'sw_lng')
+
+
+def fixture_key(url):
+    """Key for a URL: its path plus the query parameters that select the page"""
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    params = '&'.join(f"{name}={query[name][0]}" for name in PAGE_PARAMS if name in query)
+    return f"{parts.path}?{params}" if params else parts.path
+
+
+def strip_scripts(html):
+    return SCRIPT_PATTERN.sub('', html)
+
+
+class FixtureStore:
+    """Directory of recorded pages keyed by fixture_key"""
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.pages = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.pages = {fixture_key(page["url"]): page for page in json.load(f).values()}
+
+    def save(self, url, html, kind):
+        """Store a page; kind is 'search' or 'listing'"""
+        os.makedirs(self.directory, exist_ok=True)
+        key = fixture_key(url)
+        filename = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.html'
+        with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as f:
+            f.write(strip_scripts(html))
+
+        self.pages[key] = {"file": filename, "kind": kind, "url": url}
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.pages, f, indent=2)
+
+    def find(self, url):
+        """Filename recorded for a URL, or None"""
+        page = self.pages.get(fixture_key(url))
+        return page["file"] if page else None
+
+    def urls(self, kind):
+        return [page["url"] for page in self.pages.values() if page["kind"] == kind]
+
+    def read(self, filename):
+        with open(os.path.join(self.directory, filename), 'rb') as f:
+            return f.read()
+
+
+class ReplayServer:
+    """Local HTTP stand-in for the listing site, serving recorded pages"""
+
+    def __init__(self, store, host='127.0.0.1', port=0):
+        self.store = store
+        self.requests = 0
+        self.misses = []
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def local_url(self, url):
+        """Rewrite a recorded site URL to point at this server"""
+        parts = urlsplit(url)
+        return f"{self.url}{parts.path}?{parts.query}" if parts.query else self.url + parts.path
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                filename = server.store.find(self.path)
+                if filename is None:
+                    server.misses.append(self.path)
+                    logger.error(f"No fixture recorded for {self.path}")
+                    self.send_error(404)
+                    return
+
+                body = server.store.read(filename)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fixture-replay', daemon=True)
+        self.thread.start()
+        logger.info(f"Replaying {len(self.store.pages)} fixtures at {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RecordingBrowser:
+    """WebDriver wrapper that saves every page the scraper looks at
+
+    Extractors poll find_element(s) until the page has rendered, so the
+    snapshot of the current URL is refreshed on each lookup and the stored
+    copy is the most complete version of the page.
+    """
+
+    def __init__(self, browser, store, kind):
+        self._browser = browser
+        self._store = store
+        self.kind = kind
+
+    def _snapshot(self):
+        self._store.save(self._browser.current_url, self._browser.page_source, self.kind)
+
+    def get(self, url):
+        self._browser.get(url)
+        self._snapshot()
+
+    def find_element(self, *args, **kwargs):
+        self._snapshot()
+        return self._browser.find_element(*args, **kwargs)
+
+    def find_elements(self, *args, **kwargs):
+        self._snapshot()
+        return self._browser.find_elements(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+def record(location, max_listings=20, directory=FIXTURES_DIR):
+    """Crawl one search against the live site and save its pages as fixtures"""
+    import main
+
+    store = FixtureStore(directory)
+    browser = main.initialize_browser()
+    try:
+        recorder = RecordingBrowser(browser, store, 'search')
+        urls = main.get_place_urls(recorder, location)
+
+        recorder.kind = 'listing'
+        for url in urls[:max_listings]:
+            main.scrape_place_details(recorder, url)
+
+        logger.info(f"Recorded {len(store.pages)} pages into {directory}")
+        return store
+    finally:
+        browser.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record listing site pages for offline replay")
+    parser.add_argument('location', help='Search location, e.g. "Austin, Texas"')
+    parser.add_argument('--max-listings', type=int, default=20)
+    parser.add_argument('--dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    record(args.location, args.max_listings, args.dir)
@@ -0,0 +1,150 @@
+import re
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_METERS = 6378100
+
+# Legacy [lng, lat] pair inside the GeoJSON point, indexed 2d for map viewport searches
+GEO_POINT_FIELD = "geo.coordinates"
+
+# Listing pages embed the map pin in their bootstrap JSON, either as
+# "lat"/"lng" pairs or as "latitude"/"longitude" pairs
+COORDINATE_PATTERNS = [
+    re.compile(r'"lat"\s*:\s*(-?\d+(?:\.\d+)?)\s*,\s*"lng"\s*:\s*(-?\d+(?:\.\d+)?)'),
+    re.compile(r'"latitude"\s*:\s*(-?\d+(?:\.\d+)?)\s*,\s*"longitude"\s*:\s*(-?\d+(?:\.\d+)?)'),
+]
+
+
+def make_point(lat, lng):
+    """Build a GeoJSON point, or None if the coordinates are out of range"""
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    # GeoJSON stores longitude first
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def extract_coordinates(html):
+    """Find the listing coordinates in a page source and return a GeoJSON point"""
+    for pattern in COORDINATE_PATTERNS:
+        for match in pattern.finditer(html or ""):
+            point = make_point(float(match.group(1)), float(match.group(2)))
+            # Skip the 0,0 placeholders used before the map has loaded
+            if point and point["coordinates"] != [0.0, 0.0]:
+                return point
+    return None
+
+
+def wrap_longitude(lng):
+    """Longitude wrapped into [-180, 180)"""
+    return (lng + 180) % 360 - 180
+
+
+def parse_bbox(value):
+    """Parse a 'minLng,minLat,maxLng,maxLat' map viewport, raising ValueError if invalid
+
+    Latitudes are clamped to the poles and longitudes wrapped into
+    [-180, 180]; a viewport 360 degrees or wider covers every longitude.
+    The result has minLng > maxLng when the box crosses the antimeridian.
+    """
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise ValueError("bbox values must be numbers")
+    if len(parts) != 4:
+        raise ValueError("bbox must have four comma separated values")
+    if not all(math.isfinite(part) for part in parts):
+        raise ValueError("bbox values must be finite")
+
+    min_lng, min_lat, max_lng, max_lat = parts
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    if min_lat >= max_lat:
+        raise ValueError("bbox minLat must be below maxLat")
+    if min_lng == max_lng:
+        raise ValueError("bbox must have a width")
+
+    if max_lng - min_lng >= 360:
+        return -180.0, min_lat, 180.0, max_lat
+    min_lng, max_lng = wrap_longitude(min_lng), wrap_longitude(max_lng)
+    if min_lng == max_lng:
+        # A full turn given as an antimeridian crossing
+        return -180.0, min_lat, 180.0, max_lat
+    if max_lng == -180.0:
+        max_lng = 180.0
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_longitude_ranges(bbox):
+    """The (minLng, maxLng) ranges a parsed bbox covers, split at the antimeridian"""
+    min_lng, _, max_lng, _ = bbox
+    if min_lng <= max_lng:
+        return [(min_lng, max_lng)]
+    return [(min_lng, 180.0), (-180.0, max_lng)]
+
+
+def parse_radius(lat, lng, radius):
+    """Parse a radius search (radius in meters), raising ValueError if invalid"""
+    lat, lng, radius = float(lat), float(lng), float(radius)
+    if make_point(lat, lng) is None:
+        raise ValueError("radius center out of range")
+    if radius <= 0:
+        raise ValueError("radius must be positive")
+    return lat, lng, radius
+
+
+def bbox_query(bbox):
+    """Build a filter for a parsed bbox that the 2d index on GEO_POINT_FIELD can serve
+
+    Map viewports are rectangles in plain longitude/latitude, which $box
+    matches exactly; a GeoJSON polygon follows great circles instead and
+    can't span more than a hemisphere. Returns a filter to merge into the
+    query, an $or of two boxes when the bbox crosses the antimeridian.
+    """
+    _, min_lat, _, max_lat = bbox
+    boxes = [{GEO_POINT_FIELD: {"$geoWithin": {"$box": [[low, min_lat], [high, max_lat]]}}}
+             for low, high in bbox_longitude_ranges(bbox)]
+    return boxes[0] if len(boxes) == 1 else {"$or": boxes}
+
+
+def radius_query(lat, lng, radius):
+    """Build a $geoWithin filter for a circle around a point
+
+    $centerSphere is used instead of $near so that the filter also works with
+    count_documents for pagination totals.
+    """
+    return {"$geoWithin": {"$centerSphere": [[lng, lat], radius / EARTH_RADIUS_METERS]}}
+
+
+def cluster_cell_size(zoom):
+    """Grid cell size in degrees for a web map zoom level (roughly 64px cells)"""
+    zoom = max(0, min(int(zoom), 20))
+    return 360.0 / (2 ** zoom) / 4
+
+
+def cluster_pipeline(query, zoom):
+    """Aggregation pipeline that groups matching listings into grid clusters"""
+    cell = cluster_cell_size(zoom)
+    lng = {"$arrayElemAt": ["$geo.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$geo.coordinates", 1]}
+
+    return [
+        {"$match": query},
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$divide": [lng, cell]}},
+                "y": {"$floor": {"$divide": [lat, cell]}}
+            },
+            "count": {"$sum": 1},
+            "lng": {"$avg": lng},
+            "lat": {"$avg": lat},
+            "listingId": {"$first": "$_id"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "count": 1,
+            "coordinates": ["$lng", "$lat"],
+            # Single listing clusters can be rendered as a normal pin
+            "listingId": {"$cond": [{"$eq": ["$count", 1]}, {"$toString": "$listingId"}, None]}
+        }}
+    ]
@@ -0,0 +1,155 @@
+import asyncio
+import html
+import json
+import re
+import logging
+import httpx
+import geo
+
+logger = logging.getLogger(__name__)
+
+# Listing pages ship most of their data in the initial HTML: schema.org
+# ld+json, Open Graph tags and the JSON bootstrap the page renders from.
+# Parsing those takes milliseconds; fields that are still missing fall back
+# to the Selenium extractors in main.scrape_place_details.
+
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+JSON_SCRIPT_PATTERN = re.compile(
+    r'<script[^>]*type="application/(ld\+)?json"[^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+META_PATTERN = re.compile(r'<meta[^>]*property="og:(\w+)"[^>]*content="([^"]*)"', re.IGNORECASE)
+# Price keys in order of preference; originalPrice is the struck-through price of a discounted stay
+PRICE_KEYS = ("discountedPrice", "priceString", "price", "originalPrice")
+PRICE_PATTERNS = [re.compile(rf'"{key}"\s*:\s*"(\$[\d,.]+[^"]*)"') for key in PRICE_KEYS]
+HOUSE_DETAIL_PATTERN = re.compile(r'^\d+\+?\s+(guests?|bedrooms?|beds?|baths?|private baths?|shared baths?)$',
+                                  re.IGNORECASE)
+
+
+def iter_dicts(value):
+    """Yield every dict nested anywhere in a JSON value"""
+    if isinstance(value, dict):
+        yield value
+        for child in value.values():
+            yield from iter_dicts(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from iter_dicts(child)
+
+
+def iter_strings(value):
+    """Yield every string nested anywhere in a JSON value"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for child in value.values():
+            yield from iter_strings(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from iter_strings(child)
+
+
+def parse_place(page_html):
+    """Extract listing fields from a page's embedded data
+
+    Only fields that were found are returned, so the caller can tell which
+    ones still need the browser.
+    """
+    place = {}
+    linked_data = []
+    payloads = []
+    for match in JSON_SCRIPT_PATTERN.finditer(page_html):
+        try:
+            data = json.loads(html.unescape(match.group(2)))
+        except ValueError:
+            continue
+        (linked_data if match.group(1) else payloads).append(data)
+
+    meta = {name.lower(): html.unescape(content) for name, content in META_PATTERN.findall(page_html)}
+
+    # schema.org VacationRental / LodgingBusiness data
+    for item in (d for data in linked_data for d in iter_dicts(data)):
+        if "name" in item and "title" not in place:
+            place["title"] = item["name"]
+        if item.get("description") and "description" not in place:
+            place["description"] = item["description"]
+        if item.get("image") and "picture_url" not in place:
+            image = item["image"]
+            place["picture_url"] = image[0] if isinstance(image, list) else image
+        if isinstance(item.get("aggregateRating"), dict) and item["aggregateRating"].get("ratingValue") is not None \
+                and "rating" not in place:
+            rating = item["aggregateRating"]
+            place["rating"] = f"{rating.get('ratingValue')} · {rating.get('ratingCount') or rating.get('reviewCount') or 0} reviews"
+        if isinstance(item.get("address"), dict) and "location" not in place:
+            address = item["address"]
+            parts = [address.get(key) for key in ("addressLocality", "addressRegion", "addressCountry")]
+            place["location"] = ", ".join(part for part in parts if isinstance(part, str) and part)
+
+    if "title" not in place and meta.get("title"):
+        place["title"] = meta["title"]
+    if "picture_url" not in place and meta.get("image"):
+        place["picture_url"] = meta["image"]
+    if "description" not in place and meta.get("description"):
+        place["description"] = meta["description"]
+
+    point = geo.extract_coordinates(page_html)
+    if point:
+        place["geo"] = point
+
+    price = next((match for match in (pattern.search(page_html) for pattern in PRICE_PATTERNS) if match), None)
+    if price:
+        place["price"] = price.group(1)
+
+    # Amenities and overview items from the page bootstrap payload
+    features = []
+    for item in (d for data in payloads for d in iter_dicts(data)):
+        if item.get("__typename") == "Amenity" and item.get("available", True) and item.get("title"):
+            features.append(item["title"])
+    if features:
+        place["features"] = list(dict.fromkeys(features))
+
+    house_details = [text for data in payloads for text in iter_strings(data)
+                     if len(text) < 40 and HOUSE_DETAIL_PATTERN.match(text.strip())]
+    if house_details:
+        place["house_details"] = list(dict.fromkeys(house_details))
+
+    return {field: value for field, value in place.items() if value}
+
+
+async def _fetch_one(client, semaphore, url, on_page):
+    async with semaphore:
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            if on_page:
+                await asyncio.to_thread(on_page, url, response.text)
+            return url, parse_place(response.text)
+        except (httpx.HTTPError, UnicodeDecodeError) as e:
+            logger.warning(f"HTTP fetch failed for {url}: {e}")
+            return url, {}
+
+
+async def _fetch_all(urls, concurrency, timeout, on_page):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=timeout,
+                                 follow_redirects=True) as client:
+        return dict(await asyncio.gather(*(_fetch_one(client, semaphore, url, on_page) for url in urls)))
+
+
+def fetch_places(urls, concurrency=8, timeout=15, on_page=None):
+    """Fetch and parse listing pages over a pooled async HTTP client
+
+    Returns {url: partial place}; failed fetches map to an empty dict.
+    on_page(url, html) is called from a worker thread for every page fetched.
+    """
+    if not urls:
+        return {}
+    results = asyncio.run(_fetch_all(list(urls), concurrency, timeout, on_page))
+    complete = sum(1 for place in results.values() if place)
+    logger.info(f"Fetched {complete}/{len(results)} listings over HTTP")
+    return results
@@ -0,0 +1,175 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+import logging
+import httpx
+from PIL import Image, ImageOps
+from pymongo import UpdateOne
+import db
+from http_fetcher import HEADERS
+
+logger = logging.getLogger(__name__)
+
+# Listing pictures are downloaded once and stored as WebP thumbnails in a
+# content-addressed directory (named by the sha256 of the original bytes).
+# Listings get an "image" field with the thumbnail URLs and a tiny inline
+# JPEG placeholder that search cards show while the thumbnail loads.
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_store')
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_QUALITY = 75
+PLACEHOLDER_WIDTH = 16
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Listings waiting for the background image job, per (db_name, collection_name)
+_pending = {}
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def thumbnail_path(digest, width, directory=IMAGE_DIR):
+    return os.path.join(directory, digest[:2], f"{digest}-{width}.webp")
+
+
+def thumbnail_url(digest, width):
+    return f"/images/{digest}/{width}"
+
+
+def placeholder(image):
+    """Low quality inline preview as a JPEG data URI (a few hundred bytes)"""
+    preview = image.copy()
+    preview.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+    buffer = io.BytesIO()
+    preview.save(buffer, format='JPEG', quality=40)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def process_image(data, directory=IMAGE_DIR):
+    """Write thumbnails for an image and return its metadata for the listing"""
+    digest = hashlib.sha256(data).hexdigest()
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    width, height = image.size
+    thumbnails = {}
+    for thumbnail_width in THUMBNAIL_WIDTHS:
+        path = thumbnail_path(digest, thumbnail_width, directory)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            resized = image
+            if width > thumbnail_width:
+                resized = image.resize((thumbnail_width, round(height * thumbnail_width / width)),
+                                       Image.Resampling.LANCZOS)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            resized.save(temp_path, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+            os.replace(temp_path, path)
+        thumbnails[str(thumbnail_width)] = thumbnail_url(digest, thumbnail_width)
+
+    return {
+        "sha256": digest,
+        "width": width,
+        "height": height,
+        "bytes": len(data),
+        "thumbnails": thumbnails,
+        "placeholder": placeholder(image)
+    }
+
+
+async def _fetch_image(client, semaphore, listing_id, url, directory):
+    async with semaphore:
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            if len(response.content) > MAX_IMAGE_BYTES:
+                raise ValueError(f"image is {len(response.content)} bytes")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Image download failed for {url}: {e}")
+            return listing_id, None
+
+    try:
+        # Decoding and resizing are CPU bound; keep them off the event loop
+        return listing_id, await asyncio.to_thread(process_image, response.content, directory)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not process image {url}: {e}")
+        return listing_id, None
+
+
+async def _fetch_all(jobs, concurrency, timeout, directory):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=timeout,
+                                 follow_redirects=True) as client:
+        return await asyncio.gather(*(_fetch_image(client, semaphore, listing_id, url, directory)
+                                      for listing_id, url in jobs))
+
+
+def process_listing_images(db_name, collection_name, listing_ids=None, limit=0, concurrency=8,
+                           timeout=30, directory=IMAGE_DIR):
+    """Build thumbnails for listings whose picture hasn't been processed yet
+
+    listing_ids restricts the run to those listings; otherwise every listing
+    without an image entry for its current picture_url is processed.
+    Returns the number of listings updated.
+    """
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        query = {"picture_url": {"$nin": [None, ""]},
+                 "$expr": {"$ne": ["$image.source", "$picture_url"]}}
+        if listing_ids is not None:
+            query["_id"] = {"$in": listing_ids}
+
+        cursor = collection.find(query, {"picture_url": 1})
+        if limit > 0:
+            cursor = cursor.limit(limit)
+        listings = {listing["_id"]: listing["picture_url"] for listing in cursor}
+        if not listings:
+            return 0
+
+        results = asyncio.run(_fetch_all(list(listings.items()), concurrency, timeout, directory))
+        operations = [
+            UpdateOne({"_id": listing_id}, {"$set": {"image": dict(image, source=listings[listing_id])}})
+            for listing_id, image in results if image
+        ]
+        updated = collection.bulk_write(operations, ordered=False).modified_count if operations else 0
+        logger.info(f"Processed images for {updated}/{len(listings)} listings")
+        return updated
+    except Exception as e:
+        logger.error(f"Error processing listing images: {str(e)}")
+        return 0
+
+
+def process_in_background(db_name, collection_name, listing_ids, concurrency=8, on_processed=None):
+    """Run process_listing_images for listings on a daemon thread
+
+    Listings queued while a run is in progress are processed when it
+    finishes. on_processed is called with the ids of each batch that got
+    new images.
+    """
+    global _worker
+
+    def run():
+        global _worker
+        while True:
+            with _pending_lock:
+                if not _pending:
+                    _worker = None
+                    return
+                (job_db_name, job_collection), batch = _pending.popitem()
+            try:
+                if process_listing_images(job_db_name, job_collection, list(batch), concurrency=concurrency) \
+                        and on_processed:
+                    on_processed(list(batch))
+            except Exception as e:
+                logger.error(f"Error in background image processing: {str(e)}")
+
+    with _pending_lock:
+        _pending.setdefault((db_name, collection_name), set()).update(listing_ids)
+        if _worker is None:
+            _worker = threading.Thread(target=run, name="listing-images", daemon=True)
+            _worker.start()
+    return True
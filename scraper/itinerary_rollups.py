@@ -0,0 +1,104 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Itineraries keep activities, accommodations and transportation in separate
+# lists with string dates. These rollups are stored on the itinerary on every
+# write so clients get a ready-made day-by-day timeline and cost totals.
+
+COST_SECTIONS = ('activities', 'accommodations', 'transportation')
+
+
+def parse_cost(value):
+    """Cost as a float; numeric strings like "$1,200" are accepted, anything else counts as 0"""
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('$', '').replace(',', '').strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def day_of(value):
+    """The YYYY-MM-DD part of an ISO date or datetime string, or None"""
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    return value[:10]
+
+
+def timeline_events(itinerary):
+    """(date, event) pairs for every dated entry in an itinerary"""
+    for activity in itinerary.get('activities') or []:
+        yield day_of(activity.get('date')), {
+            'section': 'activities', 'id': activity.get('id'), 'kind': 'activity',
+            'title': activity.get('name', ''), 'time': activity.get('time', ''),
+            'location': activity.get('location', ''), 'cost': parse_cost(activity.get('cost')),
+            'booked': activity.get('booked', False)
+        }
+
+    for accommodation in itinerary.get('accommodations') or []:
+        # The stay's cost is counted on the check-in day
+        yield day_of(accommodation.get('checkIn')), {
+            'section': 'accommodations', 'id': accommodation.get('id'), 'kind': 'check-in',
+            'title': accommodation.get('name', ''), 'time': '',
+            'location': accommodation.get('location', ''), 'cost': parse_cost(accommodation.get('cost'))
+        }
+        yield day_of(accommodation.get('checkOut')), {
+            'section': 'accommodations', 'id': accommodation.get('id'), 'kind': 'check-out',
+            'title': accommodation.get('name', ''), 'time': '',
+            'location': accommodation.get('location', ''), 'cost': 0.0
+        }
+
+    for transportation in itinerary.get('transportation') or []:
+        title = f"{transportation.get('type', '')}: {transportation.get('from', '')} to {transportation.get('to', '')}"
+        departure_day = day_of(transportation.get('departureDate'))
+        yield departure_day, {
+            'section': 'transportation', 'id': transportation.get('id'), 'kind': 'departure',
+            'title': title, 'time': transportation.get('departureTime', ''),
+            'location': transportation.get('from', ''), 'cost': parse_cost(transportation.get('cost'))
+        }
+        arrival_day = day_of(transportation.get('arrivalDate'))
+        if arrival_day and arrival_day != departure_day:
+            yield arrival_day, {
+                'section': 'transportation', 'id': transportation.get('id'), 'kind': 'arrival',
+                'title': title, 'time': transportation.get('arrivalTime', ''),
+                'location': transportation.get('to', ''), 'cost': 0.0
+            }
+
+
+def itinerary_rollups(itinerary):
+    """Per-day timeline and cost summary for an itinerary
+
+    Entries without a usable date are left out of the timeline but still
+    counted in the cost totals.
+    """
+    days = {}
+    for day, event in timeline_events(itinerary):
+        if day:
+            days.setdefault(day, []).append(event)
+
+    timeline = []
+    for day in sorted(days):
+        # Untimed events (check-ins, all-day activities) sort before timed ones
+        events = sorted(days[day], key=lambda event: (event['time'] or '', event['kind']))
+        timeline.append({'date': day, 'events': events, 'cost': sum(event['cost'] for event in events)})
+
+    costs = {section: sum(parse_cost(entry.get('cost')) for entry in itinerary.get(section) or [])
+             for section in COST_SECTIONS}
+    total = sum(costs.values())
+    budget = parse_cost(itinerary.get('totalBudget'))
+
+    return {
+        'timeline': timeline,
+        'costSummary': dict(costs, total=total, budget=budget,
+                            remaining=budget - total, overBudget=bool(budget) and total > budget),
+        # The write these rollups reflect; see is_current
+        'rollupsUpdatedAt': itinerary.get('updatedAt')
+    }
+
+
+def is_current(itinerary):
+    """Whether an itinerary's stored rollups reflect its latest write"""
+    return 'timeline' in itinerary and itinerary.get('rollupsUpdatedAt') == itinerary.get('updatedAt')
@@ -0,0 +1,100 @@
+import re
+import logging
+from pymongo import UpdateOne
+import db
+
+logger = logging.getLogger(__name__)
+
+# Scraped listing fields are display strings ("$1,234 night", "4.92 · 120 reviews",
+# "4 guests"); these helpers turn them into numbers for filtering and sorting
+
+PRICE_PATTERN = re.compile(r'\$\s*([\d,]+(?:\.\d+)?)')
+# Discounted listings show the struck-through original first: "$180 $150 night", "Originally $180, now $150"
+NIGHTLY_PRICE_PATTERN = re.compile(r'\$\s*([\d,]+(?:\.\d+)?)\s*(?:/\s*|per\s+|a\s+)?night', re.IGNORECASE)
+ORIGINAL_PRICE_PATTERN = re.compile(r'\b(?:originally|was|before):?\s*\$\s*[\d,]+(?:\.\d+)?', re.IGNORECASE)
+# A standalone 0-5 number, not part of a larger number and not the review count
+RATING_PATTERN = re.compile(r'(?<![\d.,])([0-5](?:\.\d+)?)(?![\d]|[.,]\d|\s*reviews?)', re.IGNORECASE)
+REVIEW_COUNT_PATTERN = re.compile(r'([\d,]+)\s+reviews?', re.IGNORECASE)
+GUESTS_PATTERN = re.compile(r'(\d+)\+?\s+guests?', re.IGNORECASE)
+
+# Display field each numeric field is parsed from
+NUMERIC_SOURCES = {
+    "priceValue": "price",
+    "ratingValue": "rating",
+    "reviewCountValue": "rating",
+    "guestsValue": "house_details",
+}
+
+
+def parse_price(value):
+    """Parse the current nightly price from a price string, or None
+
+    The amount labelled as nightly wins; otherwise the first amount that
+    isn't marked as the original price.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value or ""
+    match = NIGHTLY_PRICE_PATTERN.search(value) or PRICE_PATTERN.search(ORIGINAL_PRICE_PATTERN.sub("", value))
+    return float(match.group(1).replace(',', '')) if match else None
+
+
+def parse_rating(value):
+    """Parse a 0-5 star rating from a rating string, or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    for match in RATING_PATTERN.finditer(value or ""):
+        rating = float(match.group(1))
+        if 0 <= rating <= 5:
+            return rating
+    return None
+
+
+def parse_review_count(value):
+    """Parse the review count from a rating string, or 0"""
+    if isinstance(value, int):
+        return value
+    match = REVIEW_COUNT_PATTERN.search(value or "")
+    return int(match.group(1).replace(',', '')) if match else 0
+
+
+def parse_guests(house_details):
+    """Parse the guest capacity from the house details list, or None"""
+    for detail in house_details or []:
+        match = GUESTS_PATTERN.search(detail or "")
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def numeric_fields(listing):
+    """Parsed numeric copies of a listing's display fields, used for sorting and range filters"""
+    return {
+        "priceValue": parse_price(listing.get("price")),
+        "ratingValue": parse_rating(listing.get("rating")),
+        "reviewCountValue": parse_review_count(listing.get("rating")),
+        "guestsValue": parse_guests(listing.get("house_details"))
+    }
+
+
+def backfill_numeric_fields(db_name, collection_name, batch_size=1000):
+    """Recompute numeric fields for every listing with bulk writes"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        projection = {"price": 1, "rating": 1, "house_details": 1}
+
+        updated = 0
+        operations = []
+        for listing in collection.find({}, projection):
+            operations.append(UpdateOne({"_id": listing["_id"]}, {"$set": numeric_fields(listing)}))
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        logger.info(f"Backfilled numeric fields for {updated} listings")
+        return updated
+    except Exception as e:
+        logger.error(f"Error backfilling numeric fields: {str(e)}")
+        return 0
@@ -0,0 +1,1069 @@
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import quote, urlsplit
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+import db
+import logging
+from flask import Flask, Response, request, jsonify, send_file
+from bson.json_util import dumps
+from bson import ObjectId
+import json
+from flask_cors import CORS
+import re
+import os
+from waitress import serve
+from config import config
+
+# Import new routes
+from auth_routes import auth_bp
+from user_routes import user_bp
+from trip_routes import trip_bp
+from review_routes import review_bp
+
+# Import database extensions
+import db_extensions
+import geo
+import availability
+import amenity_index
+import listing_fields
+import http_fetcher
+import browser_profiles
+import tiling
+import metrics
+import selector_registry
+import page_archive
+import images
+import crawl_dedup
+import denormalize
+import trip_status
+import saved_listings
+import recommendations
+import personalization
+import market_stats
+from search_engine import SearchEngine, SORT_MODES, mongo_filter, mongo_search
+
+# Configure logging
+log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+os.makedirs(log_dir, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'app.log')),
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+# List of Canadian provinces and territories
+CANADIAN_PROVINCES = [
+    # "Alberta", "British Columbia", "Manitoba", "New Brunswick", "Newfoundland and Labrador",
+    # "Northwest Territories", "Nova Scotia", "Nunavut", "Ontario", "Prince Edward Island",
+    # "Quebec", "Saskatchewan", "Yukon"
+]
+
+# List of US states
+US_STATES = [
+    # "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware", "Florida",
+    "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine",
+    "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska",
+    "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio",
+    "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas",
+    "Utah", "Vermont", "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming"
+]
+
+# Initialize Flask app
+app = Flask(__name__)
+
+# Configure CORS to allow specific origins
+CORS(app,
+     resources={r"/*": {"origins": ["http://localhost:6969", "http://localhost:4200"]}},
+     supports_credentials=True,
+     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+     allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Origin",
+                    "Access-Control-Allow-Headers", "Access-Control-Allow-Methods"])
+
+# Instead of using flask_cors, let's manually handle CORS
+@app.after_request
+def add_cors_headers(response):
+    # Set a SINGLE Access-Control-Allow-Origin header
+    response.headers.set('Access-Control-Allow-Origin', 'http://localhost:6969')
+    response.headers.set('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.set('Access-Control-Allow-Methods', 'GET,POST,PUT,DELETE,OPTIONS')
+    response.headers.set('Access-Control-Allow-Credentials', 'true')
+    return response
+
+# Handle OPTIONS requests globally
+@app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
+@app.route('/<path:path>', methods=['OPTIONS'])
+def options_handler(path):
+    response = make_response()
+    response.headers.set('Access-Control-Allow-Origin', 'http://localhost:6969')
+    response.headers.set('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.set('Access-Control-Allow-Methods', 'GET,POST,PUT,DELETE,OPTIONS')
+    response.headers.set('Access-Control-Allow-Credentials', 'true')
+    return response
+
+# Now import blueprints AFTER setting up CORS handlers
+from auth_routes import auth_bp, optional_user_id
+
+# Import database extensions and other modules
+import db_extensions
+
+# Database configuration
+DB_NAME = "airbnb"
+COLLECTION_NAME = "listings"
+
+# Site the scraper crawls; benchmarks point this at a local fixture server
+AIRBNB_URL = "https://www.airbnb.com"
+
+# Search results come in pages of SEARCH_PAGE_SIZE, and the site stops at MAX_SEARCH_PAGES
+SEARCH_PAGE_SIZE = 18
+MAX_SEARCH_PAGES = 15
+
+# Optional in-memory search engine, loaded at startup
+search_engine = SearchEngine(DB_NAME, COLLECTION_NAME) if config.SEARCH_ENGINE_ENABLED else None
+
+# Now import blueprints but don't register them yet
+from auth_routes import auth_bp
+from user_routes import user_bp
+from trip_routes import trip_bp
+from review_routes import review_bp
+
+
+# Create a global before_request handler for JWT verification
+# We'll attach this to specific blueprints that need authentication
+def jwt_required_except(exempt_endpoints=[]):
+    def decorator(bp):
+        @bp.before_request
+        def verify_jwt():
+            # Skip JWT verification for exempted endpoints or OPTIONS requests
+            if request.endpoint in exempt_endpoints or request.method == 'OPTIONS':
+                logger.debug(f"Skipping JWT verification for {request.endpoint}")
+                return None
+
+            logger.debug(f"Verifying JWT for {request.endpoint}")
+
+            # Get the token from Authorization header
+            auth_header = request.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer '):
+                logger.warning("No valid Authorization header found")
+                return jsonify({'message': 'Token is missing'}), 401
+
+            token = auth_header.split(' ')[1]
+
+            # Token validation would normally go here
+            # For now, just log that we would validate it
+            logger.debug(f"Would validate token: {token[:10]}...")
+
+            # In a real app, you would validate the token and set user info
+            # For this example, we're just demonstrating the pattern
+
+            return None  # Continue with the request
+
+        return bp
+
+    return decorator
+
+
+# Add explicit exemptions for auth endpoints that shouldn't require auth
+auth_exempt_endpoints = ['auth.signup', 'auth.login']
+jwt_required_except(auth_exempt_endpoints)(auth_bp)
+
+# Apply JWT verification to other blueprints that need authentication
+jwt_required_except([])(user_bp)  # No exemptions for user routes
+jwt_required_except([])(trip_bp)  # No exemptions for trip routes
+jwt_required_except([])(review_bp)  # No exemptions for review routes
+
+# Now register all blueprints
+app.register_blueprint(auth_bp, url_prefix='/auth')
+app.register_blueprint(user_bp, url_prefix='/user')
+app.register_blueprint(trip_bp, url_prefix='/trips')
+app.register_blueprint(review_bp, url_prefix='/reviews')
+
+
+# Your existing helper functions
+def initialize_browser(profile=None):
+    browser = browser_profiles.create_browser(profile or config.BROWSER_PROFILE)
+    return browser
+
+
+def get_text_or_empty(browser, field):
+    try:
+        return selector_registry.find_one(browser, field).text
+    except (TimeoutException, NoSuchElementException):
+        metrics.selector_timeout()
+        return ""
+
+
+def get_price(browser, field):
+    try:
+        elements = selector_registry.find_all(browser, field)
+
+        for element in elements:
+            if '$' in element.text:
+                return element.text.strip()
+
+        return ""  # Return empty string if no element with '$' is found
+    except (TimeoutException, NoSuchElementException):
+        metrics.selector_timeout()
+        logging.error(f"Error finding price elements for {field}")
+        return ""
+
+
+def get_attribute_or_empty(browser, field, attribute):
+    try:
+        return selector_registry.find_one(browser, field).get_attribute(attribute)
+    except (TimeoutException, NoSuchElementException):
+        metrics.selector_timeout()
+        return ""
+
+
+def search_page_urls(location, site_url=AIRBNB_URL, pages=MAX_SEARCH_PAGES, tile=None):
+    # Result pages are addressed by item offset, so every page URL is known up front
+    base_url = f'{site_url}/s/{location}/homes?tab_id=home_tab&refinement_paths%5B%5D=%2Fhomes&flexible_trip_lengths%5B%5D=one_week&monthly_start_date=2024-12-01&monthly_length=12&monthly_end_date=2026-12-01&price_filter_input_type=0&channel=EXPLORE&date_picker_type=flexible_dates&source=structured_search_input_header&adults=3&search_type=autocomplete_click&query={location}'
+    if tile:
+        base_url += tiling.tile_query(tile)
+
+    page_urls = [base_url]
+    for page in range(1, pages):
+        offset = page * SEARCH_PAGE_SIZE
+        cursor = base64.b64encode(json.dumps(
+            {"section_offset": 0, "items_offset": offset, "version": 1}).encode()).decode()
+        page_urls.append(f'{base_url}&pagination_search=true&items_offset={offset}&cursor={quote(cursor)}')
+    return page_urls
+
+
+def canonical_listing_url(url):
+    # Result links carry per-page tracking parameters; the listing is identified by its path
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}{parts.path}'
+
+
+def collect_place_urls(browser):
+    try:
+        places_to_stay = selector_registry.find_all(browser, "search_results")
+    except Exception as e:
+        logging.error(f"Failed to get places to stay")
+        return set()
+
+    return {canonical_listing_url(url) for url in (place.get_attribute('href') for place in places_to_stay) if url}
+
+
+def crawl_search_pages(browser, page_urls):
+    """Walk result pages in order; returns (urls, capped)
+
+    capped is True when every page had new results, meaning the search was
+    cut off by the page limit rather than running out of listings.
+    """
+    urls = set()
+    for page, page_url in enumerate(page_urls):
+        with metrics.stage("search_page"):
+            browser.get(page_url)
+        found = collect_place_urls(browser)
+        if not found - urls:
+            logging.info(f"Reached the last page or no more results at page {page + 1}")
+            return urls, False
+        urls |= found
+        logging.info(f"Found {len(urls)} unique places so far")
+    return urls, True
+
+
+def worker_browser_pool(browser, profile=None):
+    """Per-thread browsers for worker pools; returns (get_browser, close)
+
+    The caller's browser is lent to the first worker, the others start their
+    own, and close quits only the browsers the pool started.
+    """
+    lock = threading.Lock()
+    spare_browsers = [browser]
+    started_browsers = []
+    local = threading.local()
+
+    def get_browser():
+        with lock:
+            if not hasattr(local, 'browser'):
+                local.browser = spare_browsers.pop() if spare_browsers else None
+        if local.browser is None:
+            local.browser = initialize_browser(profile)
+            with lock:
+                started_browsers.append(local.browser)
+        return local.browser
+
+    def close():
+        for worker_browser in started_browsers:
+            worker_browser.quit()
+
+    return get_browser, close
+
+
+def get_place_urls(browser, location, site_url=AIRBNB_URL, workers=1, profile=None):
+    page_urls = search_page_urls(location, site_url)
+
+    if workers <= 1:
+        return list(crawl_search_pages(browser, page_urls)[0])
+
+    # Each worker thread drives its own browser
+    lock = threading.Lock()
+    last_page = [len(page_urls)]
+    urls = set()
+    get_browser, close_browsers = worker_browser_pool(browser, profile)
+
+    def fetch_page(page):
+        with lock:
+            if page >= last_page[0]:
+                return
+        worker_browser = get_browser()
+        with metrics.stage("search_page"):
+            worker_browser.get(page_urls[page])
+        found = collect_place_urls(worker_browser)
+        with lock:
+            if not found:
+                # Pages past the end of the results come back empty; skip the rest
+                last_page[0] = min(last_page[0], page)
+            urls.update(found)
+            logging.info(f"Found {len(urls)} unique places so far (page {page + 1})")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search-page') as executor:
+            list(executor.map(fetch_page, range(len(page_urls))))
+    finally:
+        close_browsers()
+
+    return list(urls)
+
+
+def get_place_urls_tiled(browser, location, bbox, site_url=AIRBNB_URL, workers=1, profile=None):
+    """Collect listing URLs for a region by searching map tiles
+
+    Tiles that hit the result cap are split into quadrants and searched
+    again; tiles are spread over the worker pool as they are produced.
+    """
+    urls = set()
+    get_browser, close_browsers = worker_browser_pool(browser, profile)
+
+    def crawl_tile(tile):
+        try:
+            found, capped = crawl_search_pages(get_browser(), search_page_urls(location, site_url, tile=tile))
+            return tile, found, capped
+        except Exception as e:
+            logging.error(f"Error crawling tile {tile}: {str(e)}")
+            return tile, set(), False
+
+    tiles_searched = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='search-tile') as executor:
+            pending = {executor.submit(crawl_tile, tile) for tile in tiling.grid_tiles(bbox)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile, found, capped = future.result()
+                    tiles_searched += 1
+                    urls |= found
+                    if capped and tiling.can_split(tile):
+                        pending |= {executor.submit(crawl_tile, child) for child in tiling.split_tile(tile)}
+                    elif capped:
+                        logging.warning(f"Tile {tile} still hits the result cap at the minimum tile size")
+                logging.info(f"Found {len(urls)} unique places over {tiles_searched} tiles, {len(pending)} queued")
+    finally:
+        close_browsers()
+
+    return list(urls)
+
+
+def close_modal(browser):
+    try:
+        close_button = WebDriverWait(browser, 5).until(
+            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Close']"))
+        )
+        close_button.click()
+        time.sleep(1)
+        logging.info("Successfully closed modal")
+    except (TimeoutException, NoSuchElementException):
+        logging.info("No modal found to close")
+
+
+def click_show_all_amenities(browser):
+    try:
+        # Close any open modals first
+        with metrics.stage("close_modal"):
+            close_modal(browser)
+
+        # Wait for the button to be clickable
+        button = WebDriverWait(browser, 10).until(
+            EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Show all') and contains(., 'amenities')]"))
+        )
+        # Scroll the button into view
+        browser.execute_script("arguments[0].scrollIntoView(true);", button)
+        # Wait a bit for any animations to finish
+        time.sleep(1)
+        # Try to click the button using JavaScript
+        browser.execute_script("arguments[0].click();", button)
+        # Wait for the modal to appear
+        WebDriverWait(browser, 10).until(
+            EC.presence_of_element_located((By.CLASS_NAME, "twad414"))
+        )
+        logging.info("Successfully clicked 'Show all amenities' button")
+        return True
+    except (TimeoutException, NoSuchElementException, ElementClickInterceptedException) as e:
+        logging.warning(f"Failed to click 'Show all amenities' button: {e}")
+        metrics.STAGE_ERRORS.inc(stage="show_amenities")
+        return False
+
+
+def scrape_features(browser):
+    # Try to click the "Show all amenities" button
+    with metrics.stage("show_amenities"):
+        clicked = click_show_all_amenities(browser)
+    if clicked:
+        # If successful, scrape features from the modal
+        return [feature.text for feature in browser.find_elements(By.CLASS_NAME, "twad414")]
+    else:
+        # If unsuccessful, try to scrape features from the main page
+        return [feature.text for feature in
+                browser.find_elements(By.XPATH, "//div[contains(@class, 'amenities')]//div[contains(@class, 'title')]")]
+
+
+def scrape_house_details(browser):
+    logging.info(f"Scraped the details about the AirBnB.")
+    try:
+        # The overview renders with the page, so a single check is enough
+        return [details.text for details in selector_registry.find_all(browser, "house_details", timeout=0)]
+    except TimeoutException:
+        return []
+
+
+# Field extractors for listing pages, run in order by scrape_place_details
+PLACE_FIELD_EXTRACTORS = {
+    "title": lambda browser: get_text_or_empty(browser, "title"),
+    "picture_url": lambda browser: get_attribute_or_empty(browser, "picture_url", "src"),
+    "description": lambda browser: get_text_or_empty(browser, "description"),
+    "price": lambda browser: get_price(browser, "price"),
+    "rating": lambda browser: get_text_or_empty(browser, "rating"),
+    "location": lambda browser: get_text_or_empty(browser, "location"),
+    "geo": lambda browser: geo.extract_coordinates(browser.page_source),
+    "features": scrape_features,
+    "house_details": scrape_house_details,
+}
+
+
+def scrape_place_details(browser, url, page_load_wait=5, prefetched=None):
+    # Fields already parsed from the HTTP fetch skip the browser entirely
+    place = {"url": url}
+    place.update(prefetched or {})
+    missing = [field for field in PLACE_FIELD_EXTRACTORS if not place.get(field)]
+
+    if missing:
+        with metrics.stage("page_load"):
+            browser.get(url)
+        time.sleep(page_load_wait)  # Wait for page to load
+
+        for field in missing:
+            place[field] = metrics.observe_field(field, lambda: PLACE_FIELD_EXTRACTORS[field](browser))
+
+        if config.PAGE_ARCHIVE_ENABLED:
+            # Snapshot after extraction so lazy-loaded sections and the amenities modal are included
+            with metrics.stage("archive"):
+                page_archive.archive_page(DB_NAME, url, browser.page_source, "browser")
+
+    logging.info(f"Scraped details for: {place['title']} ({len(missing)} fields from browser)")
+    return place
+
+
+def archive_http_page(url, html):
+    page_archive.archive_page(DB_NAME, url, html, "http")
+
+
+def prefetch_places(urls):
+    """Parse listing pages over HTTP when HTTP-first fetching is enabled"""
+    if not config.HTTP_FETCH_ENABLED:
+        return {}
+    with metrics.stage("http_prefetch"):
+        return http_fetcher.fetch_places(urls, concurrency=config.HTTP_FETCH_CONCURRENCY,
+                                         on_page=archive_http_page if config.PAGE_ARCHIVE_ENABLED else None)
+
+
+def images_processed(listing_ids):
+    # Thumbnails are copied into search cards, trips and saved listings
+    if search_engine:
+        search_engine.refresh_ids(listing_ids)
+    denormalize.refresh_in_background(DB_NAME, COLLECTION_NAME, listing_ids)
+
+
+def process_images_in_background(listing_ids):
+    """Build thumbnails for freshly scraped listings without holding up the scrape"""
+    images.process_in_background(DB_NAME, COLLECTION_NAME, listing_ids,
+                                 concurrency=config.HTTP_FETCH_CONCURRENCY, on_processed=images_processed)
+
+
+def scrape_region(browser, region, country, profile=None, seen=None):
+    logging.info(f"Scraping listings for {region}, {country}")
+    location = f"{region}, {country}"
+    bounds = tiling.region_bounds(region) if config.TILED_SEARCH_ENABLED else None
+    if bounds:
+        place_urls = get_place_urls_tiled(browser, location, bounds, workers=config.SEARCH_WORKERS, profile=profile)
+    else:
+        place_urls = get_place_urls(browser, location, workers=config.SEARCH_WORKERS, profile=profile)
+    if seen:
+        # Border listings also appear in neighbouring regions' results
+        new_urls = seen.filter_new(place_urls)
+        metrics.DUPLICATE_URLS.inc(len(place_urls) - len(new_urls))
+        place_urls = new_urls
+    prefetched = prefetch_places(place_urls)
+    region_listings = []
+    for url in place_urls:
+        details = scrape_place_details(browser, url, prefetched=prefetched.get(url))
+        details['region'] = region
+        details['country'] = country
+        details.update(listing_fields.numeric_fields(details))
+        amenity_index.encode_listing(DB_NAME, details)
+        region_listings.append(details)
+
+    # Write the listings for this region to the database; re-crawled listings keep their _id
+    with metrics.stage("db_write"):
+        listing_ids = db.upsert_listings_by_url(DB_NAME, COLLECTION_NAME, region_listings)
+    metrics.LISTINGS_SCRAPED.inc(len(listing_ids))
+    logging.info(f"Saved {len(listing_ids)} listings for {region}, {country}")
+
+    if config.IMAGE_PIPELINE_ENABLED:
+        process_images_in_background(listing_ids)
+
+    if search_engine:
+        search_engine.refresh_ids(listing_ids)
+
+    # Only listings that made it into the database count as seen
+    if seen and listing_ids:
+        seen.mark_seen([listing["url"] for listing in region_listings])
+        seen.save()
+
+    return len(listing_ids)
+
+
+# Route handlers
+@app.route('/scrape-north-america', methods=['GET'])
+def scrape_north_america():
+    profile = request.args.get('profile', config.BROWSER_PROFILE)
+    if profile not in browser_profiles.BROWSER_PROFILES:
+        return jsonify({"error": f"Unknown browser profile: {profile}"}), 400
+
+    try:
+        seen = crawl_dedup.SeenUrls(request.args.get('generation') or crawl_dedup.new_generation())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    browser = initialize_browser(profile)
+    job = metrics.JobSummary("scrape-north-america")
+    try:
+        total_listings = 0
+        canada_listings = 0
+        us_listings = 0
+
+        # Scrape Canadian provinces
+        for province in CANADIAN_PROVINCES:
+            canada_listings += scrape_region(browser, province, "Canada", profile, seen)
+            total_listings += canada_listings
+
+        # Scrape US states
+        for state in US_STATES:
+            us_listings += scrape_region(browser, state, "USA", profile, seen)
+            total_listings += us_listings
+
+        # Push refreshed listing details into existing trips and recompute market stats
+        # without holding up the response
+        denormalize.refresh_in_background(DB_NAME, COLLECTION_NAME)
+        market_stats.rebuild_in_background(DB_NAME, COLLECTION_NAME)
+
+        return jsonify({
+            "message": "Scraping completed",
+            "total_listings": total_listings,
+            "canada_listings": canada_listings,
+            "us_listings": us_listings,
+            "generation": seen.generation,
+            "duplicates_skipped": seen.skipped,
+            "metrics": job.finish()
+        })
+    except Exception as e:
+        logger.error(f"An error occurred while scraping: {e}")
+        return jsonify({"error": "Failed to scrape listings"}), 500
+    finally:
+        browser.quit()
+
+
+@app.route('/scrape-city-data', methods=['GET'])
+def get_city_data():
+    city = request.args.get('city')
+    if not city:
+        return jsonify({"error": "City parameter is required"}), 400
+
+    profile = request.args.get('profile', config.BROWSER_PROFILE)
+    if profile not in browser_profiles.BROWSER_PROFILES:
+        return jsonify({"error": f"Unknown browser profile: {profile}"}), 400
+
+    browser = initialize_browser(profile)
+    job = metrics.JobSummary(f"scrape-city-data: {city}")
+    try:
+        place_urls = get_place_urls(browser, city, workers=config.SEARCH_WORKERS, profile=profile)
+        prefetched = prefetch_places(place_urls)
+        place_details = []
+        for url in place_urls:
+            logging.info(f"Getting details for: {url}")
+
+            details = scrape_place_details(browser, url, prefetched=prefetched.get(url))
+            details.update(listing_fields.numeric_fields(details))
+            amenity_index.encode_listing(DB_NAME, details)
+            place_details.append(details)
+
+        with metrics.stage("db_write"):
+            listing_ids = db.upsert_listings_by_url(DB_NAME, COLLECTION_NAME, place_details)
+        metrics.LISTINGS_SCRAPED.inc(len(listing_ids))
+
+        if config.IMAGE_PIPELINE_ENABLED:
+            process_images_in_background(listing_ids)
+
+        if search_engine:
+            search_engine.refresh_ids(listing_ids)
+
+        denormalize.refresh_in_background(DB_NAME, COLLECTION_NAME, listing_ids)
+        market_stats.rebuild_in_background(DB_NAME, COLLECTION_NAME)
+
+        return jsonify({
+            "city": city,
+            "places": json.loads(dumps(place_details)),
+            "inserted_ids": [str(listing_id) for listing_id in listing_ids],
+            "metrics": job.finish()
+        })
+    finally:
+        browser.quit()
+
+
+@app.route('/rebuild-amenities', methods=['GET'])
+def rebuild_amenities():
+    # Re-encode amenity bitmasks for every listing, e.g. after normalization changes
+    result = amenity_index.rebuild_amenity_index(DB_NAME, COLLECTION_NAME)
+    if search_engine:
+        search_engine.refresh()
+    return jsonify({
+        "message": "Amenity index rebuilt",
+        "amenities": result["amenities"],
+        "updated_listings": result["updated_listings"]
+    })
+
+
+@app.route('/rebuild-listing-fields', methods=['GET'])
+def rebuild_listing_fields():
+    # Recompute the numeric price/rating/review fields used for sorting
+    updated = listing_fields.backfill_numeric_fields(DB_NAME, COLLECTION_NAME)
+    return jsonify({
+        "message": "Listing fields rebuilt",
+        "updated_listings": updated
+    })
+
+
+@app.route('/rebuild-images', methods=['GET'])
+def rebuild_images():
+    # Build thumbnails for listings scraped before the image pipeline, or whose picture changed
+    try:
+        limit = int(request.args.get('limit', 0))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    updated = images.process_listing_images(DB_NAME, COLLECTION_NAME, limit=limit,
+                                            concurrency=config.HTTP_FETCH_CONCURRENCY)
+    if search_engine and updated:
+        search_engine.refresh()
+    return jsonify({
+        "message": "Listing images processed",
+        "updated_listings": updated
+    })
+
+
+@app.route('/rebuild-recommendations', methods=['GET'])
+def rebuild_recommendations():
+    # Recompute the similar listings table; also runnable offline with `python recommendations.py`
+    updated = recommendations.build_neighbors(DB_NAME, COLLECTION_NAME)
+    return jsonify({
+        "message": "Similar listings rebuilt",
+        "updated_listings": updated
+    })
+
+
+@app.route('/rebuild-market-stats', methods=['GET'])
+def rebuild_market_stats():
+    # Recompute the per-region and per-city rollups; also runs after every crawl
+    groups = market_stats.rebuild_market_stats(DB_NAME, COLLECTION_NAME)
+    return jsonify({
+        "message": "Market stats rebuilt",
+        "groups": groups
+    })
+
+
+@app.route('/market-stats', methods=['GET'])
+def get_market_stats():
+    # Precomputed price, rating and amenity statistics; never touches the listings collection
+    scope = request.args.get('scope', 'region')
+    if scope not in ('all', 'region', 'city'):
+        return jsonify({"error": "scope must be all, region or city"}), 400
+    try:
+        limit = min(500, max(1, int(request.args.get('limit', 100))))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    stats = market_stats.get_market_stats(DB_NAME, scope, request.args.get('region'), request.args.get('city'), limit)
+    return jsonify({"scope": scope, "markets": stats})
+
+
+@app.route('/rebuild-user-profiles', methods=['GET'])
+def rebuild_user_profiles():
+    # Backfill personalization profiles from existing saved listings, trips and reviews
+    profiles = personalization.rebuild_profiles(DB_NAME, COLLECTION_NAME, saved_listings.SAVED_LISTINGS_COLLECTION,
+                                                "trips", "reviews")
+    return jsonify({
+        "message": "User profiles rebuilt",
+        "profiles": profiles
+    })
+
+
+@app.route('/refresh-trip-listings', methods=['GET'])
+def refresh_trip_listings():
+    # Copy current listing details into booked trips and saved listing cards
+    updated = denormalize.refresh_listing_copies(DB_NAME, COLLECTION_NAME)
+    return jsonify({
+        "message": "Trip listing details refreshed",
+        "updated_trips": updated["trips"],
+        "updated_saved_listings": updated["saved_listings"]
+    })
+
+
+@app.route('/images/<digest>/<int:width>', methods=['GET'])
+def get_image(digest, width):
+    if not images.DIGEST_PATTERN.match(digest) or width not in images.THUMBNAIL_WIDTHS:
+        return jsonify({"error": "Image not found"}), 404
+
+    path = images.thumbnail_path(digest, width)
+    if not os.path.exists(path):
+        return jsonify({"error": "Image not found"}), 404
+
+    # Thumbnails are named by content, so they never change and can be cached forever
+    response = send_file(path, mimetype='image/webp', etag=f"{digest}-{width}", conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# Route handlers with fixes
+@app.route('/get-listings', methods=['GET'])
+def get_listings():
+    city = request.args.get('city')
+    limit = int(request.args.get('limit', 0))
+
+    query = {}
+    if city:
+        query["location"] = {"$regex": city, "$options": "i"}
+
+    try:
+        # Get listings from database
+        listings = db.get_listings(DB_NAME, COLLECTION_NAME, query, limit)
+
+        # Convert to JSON using bson dumps to handle ObjectId correctly
+        listings_json = json.loads(dumps(listings))
+
+        return jsonify(listings_json)
+    except Exception as e:
+        logger.error(f"An error occurred while fetching listings: {e}")
+        return jsonify({"error": "Failed to fetch listings"}), 500
+
+
+@app.route('/filters', methods=['GET'])
+def get_filters():
+    search_term = request.args.get('search', '')
+    features = request.args.get('features', '').split(',') if request.args.get('features') else []
+    limit = int(request.args.get('limit', 10))
+
+    query = {}
+    if search_term:
+        query["location"] = {"$regex": search_term, "$options": "i"}
+    if features:
+        query.update(amenity_index.amenity_filter(DB_NAME, features) or {"features": {"$all": features}})
+
+    try:
+        filters_result = db.get_filters(DB_NAME, COLLECTION_NAME, query, limit)
+        filters_result["amenities"] = amenity_index.amenity_facets(DB_NAME, COLLECTION_NAME, query)
+        # Convert to JSON properly
+        filters_json = json.loads(dumps(filters_result))
+        return jsonify(filters_json)
+    except Exception as e:
+        logger.error(f"An error occurred while fetching filters: {e}")
+        return jsonify({"error": "Failed to fetch filters"}), 500
+
+
+@app.route('/get-listing/<listing_id>', methods=['GET'])
+def get_listing(listing_id):
+    try:
+        listing = db.get_listing_by_id(DB_NAME, COLLECTION_NAME, listing_id)
+        if listing:
+            # Convert to JSON properly
+            listing_json = json.loads(dumps(listing))
+            return jsonify(listing_json)
+        else:
+            return jsonify({"error": "Listing not found"}), 404
+    except Exception as e:
+        logger.error(f"An error occurred while fetching the listing: {e}")
+        return jsonify({"error": "Failed to fetch the listing"}), 500
+
+
+@app.route('/get-listing/<listing_id>/similar', methods=['GET'])
+def get_similar_listings(listing_id):
+    try:
+        limit = min(recommendations.DEFAULT_K, max(1, int(request.args.get('limit', recommendations.DEFAULT_K))))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    # Precomputed by recommendations.build_neighbors, so this is one document read
+    similar = recommendations.get_similar_listings(DB_NAME, listing_id, limit)
+    if similar is None:
+        return jsonify({"error": "No similar listings for this listing"}), 404
+    return jsonify({"listingId": listing_id, "similar": similar})
+
+
+# Enhanced search API
+@app.route('/search', methods=['GET'])
+def search_listings():
+    # Extract search parameters
+    location = request.args.get('location', '')
+    check_in = request.args.get('checkIn', '')
+    check_out = request.args.get('checkOut', '')
+    guests = request.args.get('guests', '')
+    price_min = request.args.get('priceMin', '')
+    price_max = request.args.get('priceMax', '')
+    property_type = request.args.getlist('propertyType')
+    amenities = request.args.getlist('amenities')
+    region = request.args.get('region', '')
+    sort = request.args.get('sort', '')
+    limit = request.args.get('limit', '')
+    bbox = request.args.get('bbox', '')
+    lat = request.args.get('lat', '')
+    lng = request.args.get('lng', '')
+    radius = request.args.get('radius', '')
+
+    # Parse numeric parameters
+    try:
+        guests = int(guests) if guests else None
+        price_min = float(price_min) if price_min else None
+        price_max = float(price_max) if price_max else None
+        limit_num = int(limit) if limit else None
+    except ValueError:
+        return jsonify({"error": "Invalid numeric parameter"}), 400
+
+    if sort and sort not in SORT_MODES:
+        return jsonify({"error": f"Invalid sort, expected one of: {', '.join(SORT_MODES)}"}), 400
+
+    # Map searches: bounding box (map viewport) or radius in meters around a point
+    bbox_value = radius_value = None
+    try:
+        if bbox:
+            bbox_value = geo.parse_bbox(bbox)
+        elif lat and lng and radius:
+            radius_value = geo.parse_radius(lat, lng, radius)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid map parameter: {str(e)}"}), 400
+
+    # Date filter: exclude listings with any booked night in the stay
+    unavailable_ids = []
+    if check_in and check_out:
+        try:
+            nights = availability.nights_between(check_in, check_out)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid dates: {str(e)}"}), 400
+
+        unavailable_ids = availability.get_unavailable_listing_ids(
+            DB_NAME, availability.AVAILABILITY_COLLECTION, nights)
+
+    # The filters the in-memory engine applies, for the MongoDB path
+    query = mongo_filter(location=location, region=region or None, price_min=price_min, price_max=price_max,
+                         guests=guests, bbox=bbox_value, radius=radius_value, exclude_ids=unavailable_ids)
+
+    # Property type filter
+    if property_type:
+        query["property_type"] = {"$in": property_type}
+
+    # Amenities filter: bitmask test, or raw feature strings for amenities not in the dictionary
+    amenity_ids = amenity_index.lookup_amenity_ids(DB_NAME, amenities) if amenities else []
+    if amenities:
+        query.update(amenity_index.amenity_filter(DB_NAME, amenities) or {"features": {"$all": amenities}})
+
+    # Pagination parameters
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('pageSize', 20))
+    per_page_limit = limit_num if limit_num and limit_num < per_page else per_page
+
+    # Optional personalized re-ranking of the leading results for signed-in users
+    profile = None
+    if request.args.get('personalize', '').lower() == 'true':
+        user_id = optional_user_id()
+        profile = personalization.get_profile(DB_NAME, user_id) if user_id else None
+    skip = (page - 1) * per_page_limit
+    rerank = profile is not None and skip < personalization.RERANK_WINDOW
+    candidate_count = max(personalization.RERANK_WINDOW, skip + per_page_limit)
+
+    # Answer from the in-memory engine when it is loaded and supports every filter
+    if search_engine and search_engine.ready and not property_type and amenity_ids is not None:
+        listings, total_count = search_engine.search(
+            location=location,
+            region=region or None,
+            price_min=price_min,
+            price_max=price_max,
+            guests=guests,
+            amenity_ids=amenity_ids,
+            bbox=bbox_value,
+            radius=radius_value,
+            exclude_ids=unavailable_ids,
+            sort=sort or None,
+            page=1 if rerank else page,
+            per_page=candidate_count if rerank else per_page_limit
+        )
+        if rerank:
+            listings = personalization.rerank_page(profile, listings, skip, per_page_limit)
+        return jsonify({
+            "listings": listings,
+            "totalCount": total_count,
+            "pageCount": (total_count + per_page_limit - 1) // per_page_limit,
+            "currentPage": page,
+            "personalized": rerank
+        })
+
+    try:
+        # If db_extensions is causing issues, use the regular db module
+        # Get total count - simple approach
+        collection = db.get_collection(DB_NAME, COLLECTION_NAME)
+        total_count = collection.count_documents(query)
+
+        # Calculate pagination
+        total_pages = (total_count + per_page_limit - 1) // per_page_limit
+
+        # Get listings with pagination, in the same order as the engine
+        if rerank:
+            candidates = mongo_search(collection, query, sort, location, 0, candidate_count)
+            listings = personalization.rerank_page(profile, candidates, skip, per_page_limit)
+        else:
+            listings = mongo_search(collection, query, sort, location, skip, per_page_limit)
+
+        # Format response - use dumps to handle ObjectId serialization
+        response = {
+            "listings": json.loads(dumps(listings)),
+            "totalCount": total_count,
+            "pageCount": total_pages,
+            "currentPage": page,
+            "personalized": rerank
+        }
+
+        return jsonify(response)
+    except Exception as e:
+        logger.error(f"An error occurred during search: {e}")
+        return jsonify({"error": f"Failed to perform search: {str(e)}"}), 500
+
+
+@app.route('/search/clusters', methods=['GET'])
+def search_clusters():
+    # Zoomed-out map views get grid clusters instead of individual listings
+    bbox = request.args.get('bbox', '')
+    location = request.args.get('location', '')
+
+    try:
+        zoom = int(request.args.get('zoom', 4))
+        query = geo.bbox_query(geo.parse_bbox(bbox))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid map parameter: {str(e)}"}), 400
+
+    if location:
+        query["location"] = {"$regex": re.escape(location), "$options": "i"}
+
+    try:
+        collection = db.get_collection(DB_NAME, COLLECTION_NAME)
+        clusters = list(collection.aggregate(geo.cluster_pipeline(query, zoom)))
+
+        return jsonify({
+            "clusters": clusters,
+            "zoom": zoom
+        })
+    except Exception as e:
+        logger.error(f"An error occurred during cluster search: {e}")
+        return jsonify({"error": "Failed to cluster listings"}), 500
+
+
+# Add an info endpoint to check configuration
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/jobs', methods=['GET'])
+def get_job_metrics():
+    return jsonify({"jobs": list(metrics.RECENT_JOBS)})
+
+
+@app.route('/metrics/selectors', methods=['GET'])
+def get_selector_metrics():
+    return jsonify(selector_registry.registry.report())
+
+
+@app.route('/info', methods=['GET'])
+def get_info():
+    if config.ENV == 'development':
+        return jsonify({
+            "environment": config.ENV,
+            "host": config.HOST,
+            "port": config.PORT,
+            "cors_origins": config.CORS_ORIGINS
+        })
+    return jsonify({
+        "environment": config.ENV,
+        "status": "running"
+    })
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        "status": "healthy",
+        "environment": config.ENV
+    }), 200
+
+
+if __name__ == "__main__":
+    logger.info(f"Starting {config.ENV} server on {config.HOST}:{config.PORT}")
+    logger.info(f"CORS origins: {config.CORS_ORIGINS}")
+
+    db.ensure_listing_indexes(DB_NAME, COLLECTION_NAME)
+    availability.ensure_availability_indexes(DB_NAME)
+    availability.backfill_trip_nights(DB_NAME, trip_status.TRIPS_COLLECTION)
+    amenity_index.ensure_amenity_indexes(DB_NAME, COLLECTION_NAME)
+    page_archive.ensure_archive_indexes(DB_NAME)
+    trip_status.ensure_trip_indexes(DB_NAME)
+    db_extensions.ensure_payment_method_indexes(DB_NAME, "payment_methods")
+    db_extensions.backfill_user_payment_methods(DB_NAME, "users", "payment_methods")
+    saved_listings.ensure_saved_listing_indexes(DB_NAME)
+    recommendations.ensure_neighbor_indexes(DB_NAME)
+    market_stats.ensure_market_stats_indexes(DB_NAME)
+    saved_listings.migrate_user_saved_listings(DB_NAME, "users", COLLECTION_NAME)
+
+    # With the debug reloader this module runs in a file watcher and again in the
+    # child that serves requests; only the child should run background work
+    use_reloader = config.ENV == 'development' and config.DEBUG
+    if not use_reloader or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        trip_status.start_sweeper(DB_NAME, config.TRIP_STATUS_SWEEP_SECONDS)
+        if search_engine:
+            search_engine.refresh()
+            search_engine.start_change_stream()
+
+    if config.ENV == 'development':
+        # Use Flask's development server
+        app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
+    else:
+        # Use waitress for production
+        serve(app, host=config.HOST, port=config.PORT, threads=6)
\ No newline at end of file
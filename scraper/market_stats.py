@@ -0,0 +1,195 @@
+import datetime
+import threading
+import logging
+import numpy as np
+import pymongo
+from pymongo import ReplaceOne
+import db
+import amenity_index
+import listing_fields
+
+logger = logging.getLogger(__name__)
+
+# Market statistics per region and per city, precomputed into market_stats
+# after each crawl so dashboards read a handful of small documents instead of
+# scanning listings. Listings are parsed into NumPy columns once; each group
+# is a contiguous slice of the rows sorted by group, so percentiles, rating
+# histograms and amenity prevalence are array operations on that slice.
+
+MARKET_STATS_COLLECTION = "market_stats"
+PRICE_PERCENTILES = (10, 25, 50, 75, 90)
+# Rating histogram bucket edges; the last bucket includes 5.0
+RATING_BINS = (0, 3, 3.5, 4, 4.5, 4.8, 5)
+TOP_AMENITIES = 25
+# Cities with fewer listings are left out; their listings still count towards the region
+MIN_CITY_LISTINGS = 5
+WRITE_BATCH_SIZE = 500
+
+SOURCE_PROJECTION = {"price": 1, "rating": 1, "region": 1, "location": 1, "amenityIds": 1}
+
+_rollup_lock = threading.Lock()
+
+
+def city_of(listing):
+    """City part of a "City, Region, Country" location string"""
+    return (listing.get("location") or "").split(",")[0].strip()
+
+
+def _columns(listings):
+    """Parsed numeric columns and the amenity matrix for a list of listings"""
+    n = len(listings)
+    price = np.full(n, np.nan)
+    rating = np.full(n, np.nan)
+    reviews = np.zeros(n, dtype=np.int64)
+    for row, listing in enumerate(listings):
+        value = listing_fields.parse_price(listing.get("price"))
+        if value is not None and value > 0:
+            price[row] = value
+        value = listing_fields.parse_rating(listing.get("rating"))
+        if value is not None:
+            rating[row] = value
+        reviews[row] = listing_fields.parse_review_count(listing.get("rating"))
+
+    amenity_ids = [listing.get("amenityIds") or [] for listing in listings]
+    width = max([max(ids) + 1 for ids in amenity_ids if ids] or [1])
+    amenities = np.zeros((n, width), dtype=bool)
+    rows = np.repeat(np.arange(n), [len(ids) for ids in amenity_ids])
+    amenities[rows, np.array([amenity_id for ids in amenity_ids for amenity_id in ids], dtype=np.intp)] = True
+    return price, rating, reviews, amenities
+
+
+def group_stats(price, rating, reviews, amenities, amenity_names):
+    """Statistics for one group of listings, given its column slices"""
+    priced = price[~np.isnan(price)]
+    rated = rating[~np.isnan(rating)]
+
+    price_stats = {"count": int(len(priced))}
+    if len(priced):
+        percentiles = np.percentile(priced, PRICE_PERCENTILES)
+        price_stats.update(mean=round(float(priced.mean()), 2), min=float(priced.min()), max=float(priced.max()),
+                           **{f"p{p}": round(float(value), 2) for p, value in zip(PRICE_PERCENTILES, percentiles)})
+        price_stats["median"] = price_stats["p50"]
+
+    counts, _ = np.histogram(rated, bins=RATING_BINS)
+    rating_stats = {
+        "count": int(len(rated)),
+        "mean": round(float(rated.mean()), 3) if len(rated) else None,
+        "median": round(float(np.median(rated)), 3) if len(rated) else None,
+        "distribution": [{"min": low, "max": high, "count": int(count)}
+                         for low, high, count in zip(RATING_BINS, RATING_BINS[1:], counts)],
+    }
+
+    prevalence = amenities.mean(axis=0) if len(amenities) else np.zeros(amenities.shape[1])
+    top = [amenity_id for amenity_id in np.argsort(-prevalence, kind="stable")[:TOP_AMENITIES]
+           if prevalence[amenity_id] > 0]
+    return {
+        "listings": int(len(price)),
+        "price": price_stats,
+        "rating": rating_stats,
+        "reviews": {"total": int(reviews.sum()), "median": float(np.median(reviews)) if len(reviews) else 0.0},
+        "amenities": [{"name": amenity_names.get(int(amenity_id), str(amenity_id)),
+                       "share": round(float(prevalence[amenity_id]), 4)} for amenity_id in top],
+    }
+
+
+def _grouped(keys):
+    """(key, row indices) for each distinct key, rows taken from one stable sort"""
+    order = np.argsort(keys, kind="stable")
+    values, starts = np.unique(keys[order], return_index=True)
+    return zip(values, np.split(order, starts[1:]))
+
+
+def compute_market_stats(listings, amenity_names):
+    """Market stats documents for all listings, each region and each city"""
+    price, rating, reviews, amenities = _columns(listings)
+    computed_at = datetime.datetime.utcnow().isoformat()
+
+    def document(_id, scope, rows, **labels):
+        stats = group_stats(price[rows], rating[rows], reviews[rows], amenities[rows], amenity_names)
+        return dict(stats, _id=_id, scope=scope, computedAt=computed_at, **labels)
+
+    documents = [document("all", "all", np.arange(len(listings)))]
+
+    regions = np.array([listing.get("region") or "" for listing in listings])
+    for region, rows in _grouped(regions):
+        if region:
+            documents.append(document(f"region:{region}", "region", rows, region=str(region)))
+
+    cities = np.array([f"{listing.get('region') or ''}\x00{city_of(listing)}" for listing in listings])
+    for key, rows in _grouped(cities):
+        region, city = str(key).split("\x00")
+        if city and len(rows) >= MIN_CITY_LISTINGS:
+            documents.append(document(f"city:{region}/{city}", "city", rows, region=region, city=city))
+
+    return documents, computed_at
+
+
+def ensure_market_stats_indexes(db_name):
+    """Create the market stats indexes"""
+    try:
+        collection = db.get_collection(db_name, MARKET_STATS_COLLECTION)
+        collection.create_index([("scope", pymongo.ASCENDING), ("region", pymongo.ASCENDING),
+                                 ("listings", pymongo.DESCENDING)])
+        collection.create_index([("computedAt", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating market stats indexes: {str(e)}")
+        return False
+
+
+def rebuild_market_stats(db_name, listings_collection):
+    """Recompute every market stats document, returning how many were written"""
+    try:
+        listings = list(db.get_collection(db_name, listings_collection).find({}, SOURCE_PROJECTION))
+        amenity_names = {amenity_id: name for name, amenity_id in amenity_index.load_dictionary(db_name).items()}
+        documents, computed_at = compute_market_stats(listings, amenity_names)
+
+        collection = db.get_collection(db_name, MARKET_STATS_COLLECTION)
+        for start in range(0, len(documents), WRITE_BATCH_SIZE):
+            collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+                                   for doc in documents[start:start + WRITE_BATCH_SIZE]], ordered=False)
+        # Groups that no longer have listings
+        collection.delete_many({"computedAt": {"$lt": computed_at}})
+
+        logger.info(f"Computed market stats for {len(documents)} groups from {len(listings)} listings")
+        return len(documents)
+    except Exception as e:
+        logger.error(f"Error computing market stats: {str(e)}")
+        return 0
+
+
+def rebuild_in_background(db_name, listings_collection):
+    """Run rebuild_market_stats on a daemon thread, skipping if one is already running"""
+    def run():
+        try:
+            rebuild_market_stats(db_name, listings_collection)
+        finally:
+            _rollup_lock.release()
+
+    if not _rollup_lock.acquire(blocking=False):
+        logger.info("Market stats rollup already running")
+        return False
+    threading.Thread(target=run, name="market-stats-rollup", daemon=True).start()
+    return True
+
+
+def get_market_stats(db_name, scope="region", region=None, city=None, limit=100):
+    """Stored market stats documents, largest markets first"""
+    try:
+        query = {"scope": scope}
+        if region:
+            query["region"] = region
+        if city:
+            query["city"] = city
+        collection = db.get_collection(db_name, MARKET_STATS_COLLECTION)
+        return list(collection.find(query, {"_id": 0}).sort("listings", pymongo.DESCENDING).limit(limit))
+    except Exception as e:
+        logger.error(f"Error getting market stats: {str(e)}")
+        return []
+
+
+if __name__ == "__main__":
+    from config import config
+
+    logging.basicConfig(level=logging.INFO)
+    print(rebuild_market_stats(config.DB_NAME, config.COLLECTION_NAME))
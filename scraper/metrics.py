@@ -0,0 +1,234 @@
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# In-process scraper metrics rendered in the Prometheus text format at
+# /metrics. Every scrape stage is timed into a histogram, and field
+# extractors also count their outcome (ok, empty or selector timeout).
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _label_key(label_names, labels):
+    return tuple(str(labels.get(name, "")) for name in label_names)
+
+
+def _format_labels(label_names, key, extra=()):
+    pairs = list(zip(label_names, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.label_names, labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        with _lock:
+            return dict(self.values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., count, sum]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.label_names, labels)
+        with _lock:
+            series = self.values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """{label key: (count, sum)}"""
+        with _lock:
+            return {key: (series[-2], series[-1]) for key, series in self.values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            values = {key: list(series) for key, series in self.values.items()}
+        for key, series in sorted(values.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.label_names, key, [("le", f"{bound:g}")])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', '+Inf')])} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]:.6f}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds", "Time spent in each scrape stage", ["stage"])
+STAGE_ERRORS = Counter(
+    "scraper_stage_errors_total", "Scrape stages that raised or gave up", ["stage"])
+FIELD_SECONDS = Histogram(
+    "scraper_field_seconds", "Time spent in each listing field extractor", ["field"])
+FIELD_RESULTS = Counter(
+    "scraper_field_results_total", "Field extractor outcomes: ok, empty or timeout", ["field", "outcome"])
+LISTINGS_SCRAPED = Counter(
+    "scraper_listings_scraped_total", "Listings scraped and written to the database")
+DUPLICATE_URLS = Counter(
+    "scraper_duplicate_urls_total", "Listing URLs skipped because the crawl had already scraped them")
+
+REGISTRY = [STAGE_SECONDS, STAGE_ERRORS, FIELD_SECONDS, FIELD_RESULTS, LISTINGS_SCRAPED, DUPLICATE_URLS]
+
+# Summaries of the most recent scrape jobs, newest last
+RECENT_JOBS = deque(maxlen=20)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a scrape stage, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def selector_timeout():
+    """Note that a selector wait timed out inside the current field extractor"""
+    _local.timeouts = getattr(_local, 'timeouts', 0) + 1
+
+
+def observe_field(field, extract):
+    """Run a field extractor, recording its duration and outcome"""
+    _local.timeouts = 0
+    start = time.perf_counter()
+    try:
+        value = extract()
+    except Exception:
+        FIELD_RESULTS.inc(field=field, outcome="error")
+        raise
+    finally:
+        FIELD_SECONDS.observe(time.perf_counter() - start, field=field)
+
+    if value:
+        outcome = "ok"
+    else:
+        outcome = "timeout" if _local.timeouts else "empty"
+    FIELD_RESULTS.inc(field=field, outcome=outcome)
+    return value
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class JobSummary:
+    """Per-job view of the metrics, taken as the difference from when the job started
+
+    The registry is process wide, so jobs running at the same time show up in
+    each other's figures.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._stages = STAGE_SECONDS.snapshot()
+        self._fields = FIELD_SECONDS.snapshot()
+        self._results = FIELD_RESULTS.snapshot()
+        self._errors = STAGE_ERRORS.snapshot()
+
+    def finish(self):
+        seconds = time.perf_counter() - self._start
+        stages = _diff_timings(self._stages, STAGE_SECONDS.snapshot())
+        errors = _diff_counts(self._errors, STAGE_ERRORS.snapshot())
+        fields = _diff_timings(self._fields, FIELD_SECONDS.snapshot())
+        results = _diff_counts(self._results, FIELD_RESULTS.snapshot())
+
+        summary = {
+            "job": self.name,
+            "started_at": self.started_at,
+            "seconds": round(seconds, 3),
+            "stages": {
+                stage_name: {
+                    "count": count,
+                    "seconds": round(total, 3),
+                    "errors": errors.get((stage_name,), 0),
+                    "share": round(total / seconds, 3) if seconds else 0.0,
+                }
+                for (stage_name,), (count, total) in stages.items()
+            },
+            "fields": {},
+        }
+        for (field,), (count, total) in fields.items():
+            timeouts = results.get((field, "timeout"), 0)
+            summary["fields"][field] = {
+                "count": count,
+                "seconds": round(total, 3),
+                "empty": results.get((field, "empty"), 0),
+                "timeouts": timeouts,
+                "timeout_rate": round(timeouts / count, 3) if count else 0.0,
+            }
+
+        RECENT_JOBS.append(summary)
+        logger.info(f"Job {self.name} finished in {seconds:.1f}s: " + ", ".join(
+            f"{name} {stats['seconds']:.1f}s" for name, stats in
+            sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"])))
+        return summary
+
+
+def _diff_timings(before, after):
+    diff = {}
+    for key, (count, total) in after.items():
+        start_count, start_total = before.get(key, (0, 0.0))
+        if count > start_count:
+            diff[key] = (count - start_count, total - start_total)
+    return diff
+
+
+def _diff_counts(before, after):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value > before.get(key, 0)}
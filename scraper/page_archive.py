@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import zstandard
+from pymongo import ASCENDING, UpdateMany
+import db
+import http_fetcher
+import listing_fields
+import amenity_index
+
+logger = logging.getLogger(__name__)
+
+# Raw listing pages are kept as zstd-compressed blobs named by the sha256 of
+# their HTML, so identical pages are stored once. The page_archive collection
+# maps each URL to its latest snapshot. When an extractor is fixed, the
+# archived pages are parsed again instead of being crawled again.
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'page_archive')
+ARCHIVE_COLLECTION = "page_archive"
+COMPRESSION_LEVEL = 10
+
+
+def blob_path(digest, directory=ARCHIVE_DIR):
+    # Two-character fan-out keeps directories small
+    return os.path.join(directory, digest[:2], f"{digest}.html.zst")
+
+
+def ensure_archive_indexes(db_name):
+    """Create the unique URL index for the archive collection"""
+    try:
+        collection = db.get_collection(db_name, ARCHIVE_COLLECTION)
+        collection.create_index([("url", ASCENDING)], unique=True)
+        collection.create_index([("archivedAt", ASCENDING)])
+    except Exception as e:
+        logger.error(f"Error creating page archive indexes: {str(e)}")
+
+
+def write_blob(html, directory=ARCHIVE_DIR):
+    """Compress and store a page, returning its digest and compressed size"""
+    data = html.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest, directory)
+    if os.path.exists(path):
+        return digest, os.path.getsize(path)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(data)
+    # Write to a temp file first so readers never see a partial blob
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(compressed)
+    os.replace(temp_path, path)
+    return digest, len(compressed)
+
+
+def read_blob(digest, directory=ARCHIVE_DIR):
+    with open(blob_path(digest, directory), 'rb') as f:
+        return zstandard.ZstdDecompressor().decompress(f.read()).decode('utf-8')
+
+
+def archive_page(db_name, url, html, source, directory=ARCHIVE_DIR):
+    """Store a page snapshot and point the URL's archive entry at it; returns the digest or None"""
+    if not html:
+        return None
+    try:
+        digest, size = write_blob(html, directory)
+        collection = db.get_collection(db_name, ARCHIVE_COLLECTION)
+        collection.update_one(
+            {"url": url},
+            {"$set": {"sha256": digest, "source": source, "size": size, "archivedAt": time.time()},
+             "$inc": {"snapshots": 1}},
+            upsert=True
+        )
+        return digest
+    except Exception as e:
+        logger.error(f"Error archiving page {url}: {str(e)}")
+        return None
+
+
+def _extract(job):
+    """Process pool worker: parse one archived page"""
+    url, digest, directory = job
+    try:
+        return url, http_fetcher.parse_place(read_blob(digest, directory))
+    except Exception as e:
+        return url, {"error": str(e)}
+
+
+def reextract(db_name, collection_name, fields=None, workers=None, since=None,
+              batch_size=500, dry_run=False, directory=ARCHIVE_DIR):
+    """Re-run the HTML parsers over archived pages and update the listings
+
+    Only fields the parsers found are written, restricted to `fields` when
+    given. Returns counts of pages parsed, listings updated and failures.
+    """
+    archive = db.get_collection(db_name, ARCHIVE_COLLECTION)
+    listings = db.get_collection(db_name, collection_name)
+    query = {"archivedAt": {"$gte": since}} if since else {}
+    jobs = ((entry["url"], entry["sha256"], directory)
+            for entry in archive.find(query, {"url": 1, "sha256": 1}))
+
+    counts = {"pages": 0, "updated": 0, "failed": 0}
+    operations = []
+    start = time.perf_counter()
+
+    def flush():
+        if operations and not dry_run:
+            counts["updated"] += listings.bulk_write(operations, ordered=False).modified_count
+        operations.clear()
+
+    # Spawned rather than forked workers, so they don't inherit the open MongoDB client
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for url, place in executor.map(_extract, jobs, chunksize=16):
+            counts["pages"] += 1
+            if "error" in place:
+                counts["failed"] += 1
+                logger.warning(f"Could not re-extract {url}: {place['error']}")
+                continue
+
+            update = {field: value for field, value in place.items() if fields is None or field in fields}
+            if not update:
+                continue
+            # Only refresh numeric copies whose display field was parsed again
+            update.update({name: value for name, value in listing_fields.numeric_fields(update).items()
+                           if listing_fields.NUMERIC_SOURCES[name] in update})
+            if "features" in update and not dry_run:
+                amenity_index.encode_listing(db_name, update)
+            # Older crawls stored some urls more than once; every copy gets the new fields
+            operations.append(UpdateMany({"url": url}, {"$set": update}))
+            if len(operations) >= batch_size:
+                flush()
+        flush()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Re-extracted {counts['pages']} pages in {elapsed:.1f}s "
+                f"({counts['updated']} listings updated, {counts['failed']} failed)")
+    return counts
+
+
+def archive_stats(db_name, directory=ARCHIVE_DIR):
+    """Number of archived URLs, stored blobs and their size on disk"""
+    blobs = 0
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith('.html.zst'):
+                blobs += 1
+                size += os.path.getsize(os.path.join(root, name))
+    urls = db.get_collection(db_name, ARCHIVE_COLLECTION).estimated_document_count()
+    return {"urls": urls, "blobs": blobs, "megabytes": round(size / 2 ** 20, 1)}
+
+
+if __name__ == "__main__":
+    from config import config
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Archived listing pages")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reextract_parser = subparsers.add_parser('reextract', help='Parse archived pages again and update listings')
+    reextract_parser.add_argument('--field', action='append', dest='fields',
+                                  help='Only update this field; repeat for several (default: all found)')
+    reextract_parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    reextract_parser.add_argument('--since', type=float, help='Only pages archived after this UNIX time')
+    reextract_parser.add_argument('--dry-run', action='store_true', help='Parse without writing to the database')
+
+    subparsers.add_parser('stats', help='Show archive size')
+    args = parser.parse_args()
+
+    if args.command == 'reextract':
+        print(reextract(config.DB_NAME, config.COLLECTION_NAME, args.fields, args.workers,
+                        args.since, dry_run=args.dry_run))
+        if not args.dry_run:
+            import denormalize
+            # Re-extracted titles and locations also need to reach the trips that copied them
+            denormalize.refresh_listing_copies(config.DB_NAME, config.COLLECTION_NAME)
+    else:
+        print(archive_stats(config.DB_NAME))
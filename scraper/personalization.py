@@ -0,0 +1,218 @@
+import math
+import time
+import threading
+import logging
+import numpy as np
+from bson import ObjectId
+import db
+import listing_fields
+
+logger = logging.getLogger(__name__)
+
+# Per-user preference profiles for personalized /search ranking. A profile is
+# one document per user holding weighted sums over the listings they
+# interacted with: per-amenity and per-region weights, and the moments of
+# their log nightly prices. Every save, booking and review $incs it in place,
+# so the profile never has to be rebuilt from history; undoing an action
+# (unsaving, cancelling) applies the same increments with the opposite sign,
+# from a snapshot of the listing values kept on the saved listing or trip.
+
+PROFILES_COLLECTION = "user_profiles"
+
+# Weight of each interaction; reviews scale from -1 (1 star) to +1 (5 stars) times REVIEW_WEIGHT
+SAVE_WEIGHT = 1.0
+BOOKING_WEIGHT = 2.0
+REVIEW_WEIGHT = 1.5
+
+PROFILE_TTL = 300  # seconds
+# Leading candidates re-ranked per personalized search; later pages keep the base order
+RERANK_WINDOW = 200
+# Personal score's share next to the base rank score
+PERSONAL_WEIGHT = 0.5
+# Personal score components: amenity affinity, price fit and region affinity
+SCORE_WEIGHTS = (0.5, 0.3, 0.2)
+
+PROFILE_PROJECTION = {"amenityIds": 1, "region": 1, "price": 1}
+# Field of saved listings and trips holding the listing values their interaction added
+SNAPSHOT_FIELD = "profileSnapshot"
+
+_profile_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _region_key(region):
+    # Field names can't contain dots or start with $
+    return (region or "").replace(".", "_").lstrip("$")
+
+
+def review_weight(rating):
+    """Interaction weight of a 1-5 star review"""
+    return (rating - 3) / 2 * REVIEW_WEIGHT
+
+
+def interaction_snapshot(listing):
+    """The listing values an interaction adds to a profile, for undoing it later"""
+    return {"amenityIds": list(listing.get("amenityIds") or []), "region": listing.get("region"),
+            "price": listing_fields.parse_price(listing.get("price"))}
+
+
+def record_interaction(db_name, user_id, listing, weight, include_price=True, undo=False):
+    """Fold one interaction with a listing into the user's profile
+
+    include_price=False leaves the price band alone, for negative signals
+    that say nothing about what the user is willing to pay. undo=True takes
+    back an earlier interaction: pass its snapshot and the negated weight.
+    """
+    if not listing or not weight:
+        return False
+    try:
+        increments = {f"amenities.{amenity_id}": weight for amenity_id in listing.get("amenityIds") or []}
+        region = _region_key(listing.get("region"))
+        if region:
+            increments[f"regions.{region}"] = weight
+
+        price = listing_fields.parse_price(listing.get("price"))
+        if include_price and price and price > 0:
+            log_price = math.log(price)
+            increments.update({"price.weight": weight, "price.sum": weight * log_price,
+                               "price.squares": weight * log_price * log_price})
+        increments["interactions"] = -1 if undo else 1
+
+        db.get_collection(db_name, PROFILES_COLLECTION).update_one(
+            {"_id": user_id}, {"$inc": increments, "$set": {"updatedAt": time.time()}}, upsert=True)
+        with _cache_lock:
+            _profile_cache.pop(user_id, None)
+        return True
+    except Exception as e:
+        logger.error(f"Error recording interaction for user profile: {str(e)}")
+        return False
+
+
+def undo_interaction(db_name, listings_collection, user_id, document, weight):
+    """Take back the interaction recorded for a saved listing or trip document
+
+    Documents from before snapshots were kept fall back to the listing's
+    current values.
+    """
+    snapshot = document.get(SNAPSHOT_FIELD)
+    if snapshot is None:
+        if not ObjectId.is_valid(document.get("listingId")):
+            return False
+        snapshot = db.get_collection(db_name, listings_collection).find_one(
+            {"_id": ObjectId(document["listingId"])}, PROFILE_PROJECTION)
+    return record_interaction(db_name, user_id, snapshot, -weight, undo=True)
+
+
+def get_profile(db_name, user_id):
+    """A user's profile, cached for PROFILE_TTL seconds; None if they have no interactions"""
+    with _cache_lock:
+        cached = _profile_cache.get(user_id)
+    if cached and time.time() - cached[0] < PROFILE_TTL:
+        return cached[1]
+
+    try:
+        profile = db.get_collection(db_name, PROFILES_COLLECTION).find_one({"_id": user_id})
+    except Exception as e:
+        logger.error(f"Error loading user profile: {str(e)}")
+        return cached[1] if cached else None
+
+    if profile and profile.get("interactions", 0) <= 0:
+        profile = None
+    with _cache_lock:
+        _profile_cache[user_id] = (time.time(), profile)
+    return profile
+
+
+def rebuild_profiles(db_name, listings_collection, saved_collection, trips_collection, reviews_collection):
+    """Recompute every profile from saved listings, trips and reviews
+
+    Only needed to backfill profiles for activity from before they existed.
+    Returns the number of users with a profile.
+    """
+    try:
+        # Saves and bookings use the snapshot that a later undo subtracts
+        interactions = {}
+        projection = {"userId": 1, "listingId": 1, SNAPSHOT_FIELD: 1}
+        for saved in db.get_collection(db_name, saved_collection).find({}, projection):
+            interactions.setdefault(saved["userId"], []).append(
+                (saved["listingId"], saved.get(SNAPSHOT_FIELD), SAVE_WEIGHT, True))
+        for trip in db.get_collection(db_name, trips_collection).find({"status": {"$ne": "cancelled"}}, projection):
+            interactions.setdefault(trip["userId"], []).append(
+                (trip["listingId"], trip.get(SNAPSHOT_FIELD), BOOKING_WEIGHT, True))
+        for review in db.get_collection(db_name, reviews_collection).find(
+                {}, {"userId": 1, "listingId": 1, "rating": 1}):
+            weight = review_weight(review.get("rating", 3))
+            interactions.setdefault(review["userId"], []).append((review["listingId"], None, weight, weight > 0))
+
+        listing_ids = {ObjectId(listing_id) for events in interactions.values()
+                       for listing_id, snapshot, _, _ in events if snapshot is None and ObjectId.is_valid(listing_id)}
+        listings = {str(listing["_id"]): listing for listing in db.get_collection(
+            db_name, listings_collection).find({"_id": {"$in": list(listing_ids)}}, PROFILE_PROJECTION)}
+
+        profiles = db.get_collection(db_name, PROFILES_COLLECTION)
+        profiles.delete_many({})
+        with _cache_lock:
+            _profile_cache.clear()
+        for user_id, events in interactions.items():
+            for listing_id, snapshot, weight, include_price in events:
+                record_interaction(db_name, user_id, snapshot or listings.get(listing_id), weight, include_price)
+        return profiles.count_documents({})
+    except Exception as e:
+        logger.error(f"Error rebuilding user profiles: {str(e)}")
+        return 0
+
+
+def personal_scores(profile, listings):
+    """Score in roughly [-1, 1] of how well each listing matches a profile"""
+    n = len(listings)
+    amenity_weights = {int(amenity_id): weight for amenity_id, weight in (profile.get("amenities") or {}).items()}
+    amenity_score = np.zeros(n)
+    if amenity_weights:
+        weights = np.zeros(max(amenity_weights) + 1)
+        weights[list(amenity_weights)] = list(amenity_weights.values())
+        weights /= np.abs(weights).max() or 1.0
+        amenity_ids = [[amenity_id for amenity_id in listing.get("amenityIds") or [] if amenity_id < len(weights)]
+                       for listing in listings]
+        counts = np.array([len(ids) for ids in amenity_ids])
+        rows = np.repeat(np.arange(n), counts)
+        columns = np.array([amenity_id for ids in amenity_ids for amenity_id in ids], dtype=np.intp)
+        # Sum of matched amenity weights, damped so long amenity lists don't dominate
+        amenity_score = np.bincount(rows, weights=weights[columns], minlength=n) / np.sqrt(np.maximum(counts, 1))
+
+    price_score = np.zeros(n)
+    price = profile.get("price") or {}
+    if price.get("weight", 0) > 0:
+        mean = price["sum"] / price["weight"]
+        # Floor the spread so a user with one booking still gets a usable band
+        spread = math.sqrt(max(price["squares"] / price["weight"] - mean * mean, 0.0) + 0.25 ** 2)
+        prices = np.array([listing_fields.parse_price(listing.get("price")) or np.nan for listing in listings])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distance = (np.log(prices) - mean) / spread
+        price_score = np.nan_to_num(np.exp(-0.5 * distance * distance))
+
+    region_score = np.zeros(n)
+    regions = profile.get("regions") or {}
+    if regions:
+        scale = max(abs(weight) for weight in regions.values()) or 1.0
+        region_score = np.array([regions.get(_region_key(listing.get("region")), 0.0) for listing in listings]) / scale
+
+    amenity_weight, price_weight, region_weight = SCORE_WEIGHTS
+    return amenity_weight * amenity_score + price_weight * price_score + region_weight * region_score
+
+
+def rerank(profile, listings):
+    """Listings reordered by base rank blended with the profile's personal score"""
+    if not profile or len(listings) < 2:
+        return listings
+    base = 1.0 - np.arange(len(listings)) / len(listings)
+    order = np.argsort(-(base + PERSONAL_WEIGHT * personal_scores(profile, listings)), kind="stable")
+    return [listings[i] for i in order]
+
+
+def rerank_page(profile, candidates, skip, per_page, window=RERANK_WINDOW):
+    """One page of candidates whose first `window` entries are personally re-ranked
+
+    candidates are in base order and must start at the first result and
+    cover the page.
+    """
+    return (rerank(profile, candidates[:window]) + candidates[window:])[skip:skip + per_page]
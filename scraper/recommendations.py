@@ -0,0 +1,233 @@
+import argparse
+import datetime
+import logging
+import numpy as np
+import pymongo
+from bson import ObjectId
+from pymongo import ReplaceOne
+import db
+import listing_fields
+import saved_listings
+
+logger = logging.getLogger(__name__)
+
+# Similar listings are precomputed offline. Every listing becomes a feature
+# vector (amenities, log price, rating, guests, region), and an inverted-file
+# approximate nearest neighbor search finds each listing's top K by cosine
+# similarity: listings are clustered around sqrt(n) centroids and only the
+# clusters nearest to a listing's own are compared against it. The neighbors
+# are stored with their card fields, so /get-listing/<id>/similar is a single
+# document read.
+
+NEIGHBORS_COLLECTION = "listing_neighbors"
+DEFAULT_K = 10
+# Clusters compared against each listing's own cluster
+DEFAULT_PROBES = 8
+KMEANS_ITERATIONS = 8
+WRITE_BATCH_SIZE = 1000
+
+# Share of the vector's weight held by each feature group
+FEATURE_WEIGHTS = {
+    "amenities": 0.45,
+    "price": 0.2,
+    "rating": 0.1,
+    "guests": 0.1,
+    "region": 0.15,
+}
+
+SOURCE_PROJECTION = dict(saved_listings.CARD_PROJECTION, amenityIds=1, house_details=1, region=1, url=1)
+
+
+def _standardized(values):
+    """Z-scores with missing values (NaN) at the mean"""
+    present = ~np.isnan(values)
+    if not present.any():
+        return np.zeros(len(values), dtype=np.float32)
+    mean = values[present].mean()
+    std = values[present].std() or 1.0
+    return np.where(present, (values - mean) / std, 0.0).astype(np.float32)
+
+
+def feature_matrix(listings):
+    """Unit-length feature vectors, one row per listing"""
+    n = len(listings)
+    price = np.full(n, np.nan)
+    rating = np.full(n, np.nan)
+    guests = np.full(n, np.nan)
+    for row, listing in enumerate(listings):
+        value = listing_fields.parse_price(listing.get("price"))
+        if value is not None and value > 0:
+            price[row] = np.log(value)
+        value = listing_fields.parse_rating(listing.get("rating"))
+        if value is not None:
+            rating[row] = value
+        value = listing_fields.parse_guests(listing.get("house_details"))
+        if value is not None:
+            guests[row] = value
+
+    amenity_ids = [listing.get("amenityIds") or [] for listing in listings]
+    width = max([max(ids) + 1 for ids in amenity_ids if ids] or [1])
+    amenities = np.zeros((n, width), dtype=np.float32)
+    rows = np.repeat(np.arange(n), [len(ids) for ids in amenity_ids])
+    amenities[rows, np.concatenate([ids for ids in amenity_ids if ids] or [[]]).astype(np.intp)] = 1.0
+    amenities /= np.maximum(np.linalg.norm(amenities, axis=1, keepdims=True), 1.0)
+
+    region_names, region_index = np.unique([listing.get("region") or "" for listing in listings],
+                                           return_inverse=True)
+    regions = np.zeros((n, len(region_names)), dtype=np.float32)
+    regions[np.arange(n), region_index] = 1.0
+    regions[:, region_names == ""] = 0.0
+
+    # Scalars are scaled down so one standard deviation weighs about as much as a full one-hot group
+    vectors = np.hstack([
+        amenities * FEATURE_WEIGHTS["amenities"],
+        (_standardized(price) * FEATURE_WEIGHTS["price"] / 2)[:, None],
+        (_standardized(rating) * FEATURE_WEIGHTS["rating"] / 2)[:, None],
+        (_standardized(guests) * FEATURE_WEIGHTS["guests"] / 2)[:, None],
+        regions * FEATURE_WEIGHTS["region"],
+    ]).astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+    return vectors
+
+
+def kmeans(vectors, clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means; returns (centroids, cluster of each row)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty clusters keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-6), centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+def nearest_neighbors(vectors, k=DEFAULT_K, probes=DEFAULT_PROBES):
+    """Approximate top-k neighbors by cosine similarity; returns (indices, scores), -1 padded"""
+    n = len(vectors)
+    indices = np.full((n, k), -1, dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if n < 2:
+        return indices, scores
+
+    clusters = max(1, int(np.sqrt(n)))
+    centroids, assignment = kmeans(vectors, clusters)
+    members = [np.flatnonzero(assignment == cluster) for cluster in range(clusters)]
+    probes = min(probes, clusters)
+    nearest_clusters = np.argsort(-(centroids @ centroids.T), axis=1)[:, :probes]
+
+    for cluster in range(clusters):
+        rows = members[cluster]
+        if not len(rows):
+            continue
+        candidates = np.concatenate([members[other] for other in nearest_clusters[cluster]])
+        similarity = vectors[rows] @ vectors[candidates].T
+        # A listing is never its own neighbor
+        similarity[rows[:, None] == candidates[None, :]] = -np.inf
+
+        top = min(k, len(candidates) - 1)
+        if top <= 0:
+            continue
+        best = np.argpartition(-similarity, top - 1, axis=1)[:, :top]
+        best_scores = np.take_along_axis(similarity, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        indices[rows, :top] = candidates[np.take_along_axis(best, order, axis=1)]
+        scores[rows, :top] = np.take_along_axis(best_scores, order, axis=1)
+
+    indices[~np.isfinite(scores)] = -1
+    return indices, np.where(np.isfinite(scores), scores, 0.0)
+
+
+def distinct_by_url(listings):
+    """(distinct listings, row in the distinct list of each listing)
+
+    Older crawls inserted the same url more than once; the first copy stands
+    in for all of them. Listings without a url are each their own entry.
+    """
+    distinct = []
+    rows = []
+    row_of_url = {}
+    for listing in listings:
+        url = listing.get("url")
+        if url and url in row_of_url:
+            rows.append(row_of_url[url])
+            continue
+        if url:
+            row_of_url[url] = len(distinct)
+        rows.append(len(distinct))
+        distinct.append(listing)
+    return distinct, rows
+
+
+def ensure_neighbor_indexes(db_name):
+    """Create the similar listing indexes"""
+    try:
+        db.get_collection(db_name, NEIGHBORS_COLLECTION).create_index([("builtAt", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating similar listing indexes: {str(e)}")
+        return False
+
+
+def build_neighbors(db_name, listings_collection, k=DEFAULT_K, probes=DEFAULT_PROBES):
+    """Recompute and store the top-k similar listings for every listing
+
+    Returns the number of listings written.
+    """
+    try:
+        listings = list(db.get_collection(db_name, listings_collection).find({}, SOURCE_PROJECTION).sort("_id", 1))
+        if not listings:
+            return 0
+
+        # Copies of a listing share one entry, so a listing is never recommended next to itself
+        distinct, rows = distinct_by_url(listings)
+        indices, scores = nearest_neighbors(feature_matrix(distinct), k, probes)
+        cards = [dict(saved_listings.card_snapshot(listing), id=str(listing["_id"])) for listing in distinct]
+
+        neighbors = db.get_collection(db_name, NEIGHBORS_COLLECTION)
+        built_at = datetime.datetime.utcnow().isoformat()
+        written = 0
+        for start in range(0, len(listings), WRITE_BATCH_SIZE):
+            operations = []
+            for listing, row in zip(listings[start:start + WRITE_BATCH_SIZE], rows[start:start + WRITE_BATCH_SIZE]):
+                similar = [dict(cards[neighbor], score=round(float(score), 4))
+                           for neighbor, score in zip(indices[row], scores[row]) if neighbor >= 0]
+                operations.append(ReplaceOne({"_id": listing["_id"]},
+                                             {"neighbors": similar, "builtAt": built_at}, upsert=True))
+            neighbors.bulk_write(operations, ordered=False)
+            written += len(operations)
+
+        # Listings deleted since the last build
+        neighbors.delete_many({"builtAt": {"$lt": built_at}})
+        logger.info(f"Stored {k} similar listings for {written} listings")
+        return written
+    except Exception as e:
+        logger.error(f"Error building similar listings: {str(e)}")
+        return 0
+
+
+def get_similar_listings(db_name, listing_id, limit=DEFAULT_K):
+    """Stored similar listing cards for a listing, or None if it has no entry"""
+    if not ObjectId.is_valid(listing_id):
+        return None
+    try:
+        entry = db.get_collection(db_name, NEIGHBORS_COLLECTION).find_one(
+            {"_id": ObjectId(listing_id)}, {"neighbors": {"$slice": limit}})
+        return entry["neighbors"] if entry else None
+    except Exception as e:
+        logger.error(f"Error getting similar listings: {str(e)}")
+        return None
+
+
+if __name__ == "__main__":
+    from config import config
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the similar listings table")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help='Neighbors stored per listing')
+    parser.add_argument('--probes', type=int, default=DEFAULT_PROBES, help='Clusters searched per listing')
+    args = parser.parse_args()
+
+    print(build_neighbors(config.DB_NAME, config.COLLECTION_NAME, args.k, args.probes))
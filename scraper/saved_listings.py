@@ -0,0 +1,142 @@
+import datetime
+import logging
+import pymongo
+from bson import ObjectId
+from pymongo import UpdateOne
+import db
+import personalization
+
+logger = logging.getLogger(__name__)
+
+# Saved listings live in their own collection, one document per (user,
+# listing) with the time it was saved and a copy of the fields a listing card
+# shows. A page of favorites is then one indexed range read with no lookup in
+# the listings collection; denormalize keeps the card copies current.
+
+SAVED_LISTINGS_COLLECTION = "saved_listings"
+MAX_PAGE_SIZE = 100
+
+# Card field -> function of the listing document
+CARD_FIELDS = {
+    "title": lambda listing: listing.get("title", ""),
+    "picture_url": lambda listing: listing.get("picture_url", ""),
+    "thumbnail": lambda listing: (listing.get("image") or {}).get("thumbnails", {}).get("320", ""),
+    "placeholder": lambda listing: (listing.get("image") or {}).get("placeholder", ""),
+    "location": lambda listing: listing.get("location", ""),
+    "price": lambda listing: listing.get("price", ""),
+    "rating": lambda listing: listing.get("rating", ""),
+}
+CARD_PROJECTION = {"title": 1, "picture_url": 1, "image.thumbnails": 1, "image.placeholder": 1,
+                   "location": 1, "price": 1, "rating": 1}
+
+
+def card_snapshot(listing):
+    """The listing fields a saved listing keeps a copy of"""
+    return {field: value(listing) for field, value in CARD_FIELDS.items()}
+
+
+def ensure_saved_listing_indexes(db_name, collection_name=SAVED_LISTINGS_COLLECTION):
+    """Create the saved listing indexes"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        collection.create_index([("userId", pymongo.ASCENDING), ("listingId", pymongo.ASCENDING)], unique=True)
+        # Newest-first pages per user
+        collection.create_index([("userId", pymongo.ASCENDING), ("savedAt", pymongo.DESCENDING),
+                                 ("_id", pymongo.DESCENDING)])
+        # Used by denormalize to find the copies of a listing
+        collection.create_index([("listingId", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating saved listing indexes: {str(e)}")
+        return False
+
+
+def save_listing(db_name, user_id, listing_id, listing, collection_name=SAVED_LISTINGS_COLLECTION):
+    """Save a listing for a user; saving it again keeps the original savedAt
+
+    Returns True if the listing was newly saved, False if it already was,
+    and None on error.
+    """
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        result = collection.update_one(
+            {"userId": user_id, "listingId": listing_id},
+            {"$set": card_snapshot(listing),
+             # Kept from the first save, the one that added to the user's profile
+             "$setOnInsert": {"savedAt": datetime.datetime.utcnow().isoformat(),
+                              personalization.SNAPSHOT_FIELD: personalization.interaction_snapshot(listing)}},
+            upsert=True
+        )
+        return result.upserted_id is not None
+    except Exception as e:
+        logger.error(f"Error saving listing: {str(e)}")
+        return None
+
+
+def remove_saved_listing(db_name, user_id, listing_id, collection_name=SAVED_LISTINGS_COLLECTION):
+    """Remove a saved listing, returning the removed document, or None if the user hadn't saved it"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        return collection.find_one_and_delete({"userId": user_id, "listingId": listing_id})
+    except Exception as e:
+        logger.error(f"Error removing saved listing: {str(e)}")
+        return None
+
+
+def get_saved_listings(db_name, user_id, page=1, page_size=20, collection_name=SAVED_LISTINGS_COLLECTION):
+    """One page of a user's saved listing cards, newest first, and the total count"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        total_count = collection.count_documents({"userId": user_id})
+        cursor = collection.find({"userId": user_id}, {"userId": 0, personalization.SNAPSHOT_FIELD: 0}).sort(
+            [("savedAt", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+        ).skip((page - 1) * page_size).limit(page_size)
+
+        listings = []
+        for saved in cursor:
+            del saved["_id"]
+            saved["id"] = saved.pop("listingId")
+            listings.append(saved)
+        return listings, total_count
+    except Exception as e:
+        logger.error(f"Error getting saved listings: {str(e)}")
+        return [], 0
+
+
+def migrate_user_saved_listings(db_name, users_collection, listings_collection,
+                                collection_name=SAVED_LISTINGS_COLLECTION):
+    """Move savedListings arrays from user documents into the saved listings collection
+
+    Returns the number of users migrated.
+    """
+    try:
+        users = db.get_collection(db_name, users_collection)
+        listings = db.get_collection(db_name, listings_collection)
+        saved = db.get_collection(db_name, collection_name)
+        migrated_at = datetime.datetime.utcnow().isoformat()
+
+        migrated = 0
+        for user in users.find({"savedListings.0": {"$exists": True}}, {"savedListings": 1}):
+            listing_ids = [ObjectId(listing_id) for listing_id in user["savedListings"]
+                           if ObjectId.is_valid(listing_id)]
+            operations = [
+                UpdateOne({"userId": str(user["_id"]), "listingId": str(listing["_id"])},
+                          {"$set": card_snapshot(listing),
+                           "$setOnInsert": {
+                               "savedAt": migrated_at,
+                               personalization.SNAPSHOT_FIELD: personalization.interaction_snapshot(listing)}},
+                          upsert=True)
+                for listing in listings.find({"_id": {"$in": listing_ids}},
+                                             dict(CARD_PROJECTION, **personalization.PROFILE_PROJECTION))
+            ]
+            if operations:
+                saved.bulk_write(operations, ordered=False)
+            users.update_one({"_id": user["_id"]}, {"$unset": {"savedListings": ""}})
+            migrated += 1
+
+        if migrated:
+            logger.info(f"Migrated saved listings for {migrated} users")
+        return migrated
+    except Exception as e:
+        logger.error(f"Error migrating saved listings: {str(e)}")
+        return 0
@@ -0,0 +1,446 @@
+import re
+import json
+import time
+import threading
+import logging
+import numpy as np
+from bson import ObjectId
+from bson.json_util import dumps
+from pymongo.errors import OperationFailure, PyMongoError
+import db
+import geo
+
+logger = logging.getLogger(__name__)
+
+# Numeric columns and their dtypes; missing values are NaN or -1
+COLUMN_TYPES = {
+    "price": np.float64,
+    "rating": np.float32,
+    "review_count": np.int32,
+    "guests": np.int16,
+    "region": np.int32,
+    "lng": np.float64,
+    "lat": np.float64,
+}
+
+# Compact a snapshot once this share of its rows has been deleted
+COMPACT_RATIO = 0.25
+
+# Sort modes as MongoDB sort specs over the stored numeric fields. The engine
+# orders by the same fields and _id tiebreaks and, like MongoDB, sorts missing
+# values lowest, so it returns the same pages as the MongoDB fallback.
+SORT_MODES = {
+    "price_asc": [("priceValue", 1), ("_id", 1)],
+    "price_desc": [("priceValue", -1), ("_id", -1)],
+    "rating": [("ratingValue", -1), ("_id", 1)],
+    "reviews": [("reviewCountValue", -1), ("_id", 1)],
+    # Locations starting with the search text come first, see mongo_search
+    "relevance": [("reviewCountValue", -1), ("_id", 1)],
+}
+DEFAULT_SORT = [("_id", 1)]
+
+# Stored numeric field -> engine column
+FIELD_COLUMNS = {
+    "priceValue": "price",
+    "ratingValue": "rating",
+    "reviewCountValue": "review_count",
+    "guestsValue": "guests",
+}
+
+# Error code for change streams on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = 40573
+WATCH_RETRY_SECONDS = 5
+
+
+def mongo_filter(location="", region=None, price_min=None, price_max=None, guests=None,
+                 bbox=None, radius=None, exclude_ids=()):
+    """MongoDB filter matching the listings SearchEngine.search matches for the same arguments
+
+    Amenities are added by the caller, see amenity_index.amenity_filter.
+    """
+    query = {}
+    if location:
+        query["location"] = {"$regex": re.escape(location), "$options": "i"}
+    if region:
+        query["region"] = region
+    if price_min is not None or price_max is not None:
+        query["priceValue"] = {}
+        if price_min is not None:
+            query["priceValue"]["$gte"] = price_min
+        if price_max is not None:
+            query["priceValue"]["$lte"] = price_max
+    if guests:
+        query["guestsValue"] = {"$gte": guests}
+    if bbox:
+        query.update(geo.bbox_query(bbox))
+    if radius:
+        query["geo"] = geo.radius_query(*radius)
+    excluded = [ObjectId(listing_id) for listing_id in exclude_ids if ObjectId.is_valid(listing_id)]
+    if excluded:
+        query["_id"] = {"$nin": excluded}
+    return query
+
+
+def mongo_search(collection, query, sort=None, location="", skip=0, limit=20):
+    """One page of the listings matching a mongo_filter query, in the engine's order"""
+    spec = SORT_MODES.get(sort, DEFAULT_SORT)
+    if sort != "relevance" or not location:
+        return list(collection.find(query).sort(spec).skip(skip).limit(limit))
+
+    # Relevance: listings whose location starts with the search text, then the rest,
+    # each read through the indexed sort
+    prefix = re.compile("^" + re.escape(location), re.IGNORECASE)
+    leading = dict(query, **{"$and": [{"location": prefix}]})
+    listings = list(collection.find(leading).sort(spec).skip(skip).limit(limit))
+    if len(listings) == limit:
+        return listings
+
+    leading_count = skip + len(listings) if listings else collection.count_documents(leading)
+    rest = dict(query, **{"$and": [{"location": {"$not": prefix}}]})
+    return listings + list(collection.find(rest).sort(spec).skip(max(skip - leading_count, 0))
+                           .limit(limit - len(listings)))
+
+
+def haversine_meters(lat, lng, lats, lngs):
+    """Great-circle distance in meters from one point to arrays of points"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+class ListingColumns:
+    """Immutable column snapshot of the listing inventory
+
+    Snapshots are never modified after construction. The engine builds a new
+    one for every batch of changes and swaps it in, so searches run without
+    locking.
+    """
+
+    def __init__(self, ids, docs, columns, location, amenities, alive):
+        self.ids = ids                # listing ID string per row
+        self.docs = docs              # JSON-ready listing documents per row
+        self.columns = columns        # name -> 1-D array, see COLUMN_TYPES
+        self.location = location      # lowercased location strings
+        self.amenities = amenities    # (rows, words) uint64 amenity bitmask
+        self.alive = alive            # False for deleted rows awaiting compaction
+
+        self.row_by_id = {listing_id: row for row, listing_id in enumerate(ids) if alive[row]}
+
+        # Rank of each row's ID; ObjectId hex strings sort in ObjectId order, as in MongoDB
+        self.id_rank = np.empty(len(ids), dtype=np.int64)
+        self.id_rank[np.argsort(np.array(ids, dtype=np.str_), kind="stable")] = np.arange(len(ids))
+
+        # Secondary index for price ranges: row order by price, NaN last
+        price = columns["price"]
+        self.price_order = np.argsort(price, kind="stable")
+        self.sorted_price = price[self.price_order]
+        self.priced_count = int(np.count_nonzero(~np.isnan(price)))
+
+        # Secondary index for regions: region id -> rows
+        region = columns["region"]
+        order = np.argsort(region, kind="stable")
+        values, starts = np.unique(region[order], return_index=True)
+        self.rows_by_region = {int(value): rows for value, rows in zip(values, np.split(order, starts[1:]))
+                               if value >= 0}
+
+    def __len__(self):
+        return len(self.row_by_id)
+
+    @property
+    def dead_count(self):
+        return len(self.ids) - len(self.row_by_id)
+
+    def compacted(self):
+        """Copy of the snapshot without deleted rows"""
+        keep = np.flatnonzero(self.alive)
+        return ListingColumns(
+            [self.ids[row] for row in keep],
+            [self.docs[row] for row in keep],
+            {name: column[keep] for name, column in self.columns.items()},
+            self.location[keep],
+            self.amenities[keep],
+            np.ones(len(keep), dtype=bool)
+        )
+
+    def amenity_words(self, amenity_ids):
+        """Bitmask row for a set of amenity ids, or None if one is wider than the matrix"""
+        words = np.zeros(self.amenities.shape[1], dtype=np.uint64)
+        for amenity_id in amenity_ids:
+            word, bit = divmod(amenity_id, 64)
+            if word >= len(words):
+                return None
+            words[word] |= np.uint64(1) << np.uint64(bit)
+        return words
+
+
+class SearchEngine:
+    """In-process listing search over NumPy column arrays
+
+    Loaded in full with refresh(), then kept current with apply_changes(),
+    either from a MongoDB change stream or from crawl completion hooks
+    calling refresh_ids().
+    """
+
+    def __init__(self, db_name, collection_name):
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self._snapshot = None
+        self._regions = {}
+        self._write_lock = threading.Lock()
+        self._watch_thread = None
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def region_id(self, region):
+        """Id of a region name, or -1 if no listing has it"""
+        return self._regions.get(region, -1)
+
+    def refresh(self):
+        """Reload the whole inventory from MongoDB"""
+        try:
+            collection = db.get_collection(self.db_name, self.collection_name)
+            docs = list(collection.find({}))
+            with self._write_lock:
+                ids, json_docs, columns, location, amenities = self._encode(docs)
+                self._snapshot = ListingColumns(ids, json_docs, columns, location, amenities,
+                                                np.ones(len(ids), dtype=bool))
+            logger.info(f"Search engine loaded {len(ids)} listings")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading search engine: {str(e)}")
+            return False
+
+    def refresh_ids(self, listing_ids):
+        """Reload specific listings, e.g. the ones a crawl just inserted"""
+        if not self.ready or not listing_ids:
+            return
+        try:
+            collection = db.get_collection(self.db_name, self.collection_name)
+            object_ids = [ObjectId(listing_id) for listing_id in listing_ids if ObjectId.is_valid(str(listing_id))]
+            docs = list(collection.find({"_id": {"$in": object_ids}}))
+            found = {str(doc["_id"]) for doc in docs}
+            self.apply_changes(upserts=docs, deletes=[str(i) for i in listing_ids if str(i) not in found])
+        except Exception as e:
+            logger.error(f"Error refreshing search engine listings: {str(e)}")
+
+    def apply_changes(self, upserts=(), deletes=()):
+        """Build and swap in a snapshot with listings upserted and deleted"""
+        with self._write_lock:
+            old = self._snapshot
+            if old is None:
+                return
+
+            # Last write wins for a listing changed more than once in the batch
+            latest = {str(doc["_id"]): doc for doc in upserts}
+            alive = old.alive.copy()
+            for listing_id in deletes:
+                row = old.row_by_id.get(listing_id)
+                if row is not None and listing_id not in latest:
+                    alive[row] = False
+
+            ids, json_docs, columns, location, amenities = self._encode(list(latest.values()))
+            existing = [(i, old.row_by_id[listing_id]) for i, listing_id in enumerate(ids)
+                        if listing_id in old.row_by_id]
+            appended = np.array([i for i, listing_id in enumerate(ids) if listing_id not in old.row_by_id],
+                                dtype=np.intp)
+            src = np.array([i for i, _ in existing], dtype=np.intp)
+            dst = np.array([row for _, row in existing], dtype=np.intp)
+
+            new_columns = {}
+            for name, column in old.columns.items():
+                column = column.copy()
+                column[dst] = columns[name][src]
+                new_columns[name] = np.concatenate([column, columns[name][appended]])
+
+            # Widen the bitmask matrix if the batch brought new amenities
+            width = max(old.amenities.shape[1], amenities.shape[1])
+            old_amenities = np.pad(old.amenities, ((0, 0), (0, width - old.amenities.shape[1])))
+            amenities = np.pad(amenities, ((0, 0), (0, width - amenities.shape[1])))
+            old_amenities[dst] = amenities[src]
+
+            new_location = old.location.astype(np.result_type(old.location.dtype, location.dtype))
+            new_location[dst] = location[src]
+
+            new_docs = list(old.docs)
+            for i, row in existing:
+                new_docs[row] = json_docs[i]
+
+            snapshot = ListingColumns(
+                old.ids + [ids[i] for i in appended],
+                new_docs + [json_docs[i] for i in appended],
+                new_columns,
+                np.concatenate([new_location, location[appended]]),
+                np.concatenate([old_amenities, amenities[appended]]),
+                np.concatenate([alive, np.ones(len(appended), dtype=bool)])
+            )
+            if snapshot.dead_count > COMPACT_RATIO * len(snapshot.ids):
+                snapshot = snapshot.compacted()
+
+            self._snapshot = snapshot
+
+    def start_change_stream(self):
+        """Follow inserts, updates and deletes in a background thread
+
+        Change streams need a replica set; on a standalone server the engine
+        only refreshes through refresh_ids().
+        """
+        if self._watch_thread is None:
+            self._watch_thread = threading.Thread(target=self._watch, name="search-engine-watch", daemon=True)
+            self._watch_thread.start()
+
+    def _watch(self):
+        """Apply changes from the change stream, reopening it whenever it ends
+
+        Interrupted streams resume after the last applied change. A drop or
+        rename invalidates the stream, so a new one is opened and the whole
+        inventory reloaded.
+        """
+        resume_token = None
+        reload = False
+        try:
+            while True:
+                try:
+                    collection = db.get_collection(self.db_name, self.collection_name)
+                    with collection.watch(full_document="updateLookup", max_await_time_ms=1000,
+                                          resume_after=resume_token) as stream:
+                        if reload:
+                            # Reloading once the new stream is open means no change falls in between
+                            self.refresh()
+                            reload = False
+                        while stream.alive and not reload:
+                            upserts, deletes = [], []
+                            # Drain everything that is ready so bursts are applied as one snapshot
+                            change = stream.try_next()
+                            while change is not None:
+                                operation = change["operationType"]
+                                if operation in ("insert", "update", "replace") and change.get("fullDocument"):
+                                    upserts.append(change["fullDocument"])
+                                elif operation == "delete":
+                                    deletes.append(str(change["documentKey"]["_id"]))
+                                elif operation in ("drop", "rename", "invalidate"):
+                                    reload = True
+                                    break
+                                change = stream.try_next()
+
+                            if upserts or deletes:
+                                self.apply_changes(upserts, deletes)
+                            resume_token = None if reload else stream.resume_token
+                except OperationFailure as e:
+                    if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                        logger.warning(f"Change streams unavailable, search engine will refresh on crawl completion: {e}")
+                        return
+                    # Usually the resume point has aged out of the oplog
+                    logger.warning(f"Search engine change stream can't resume, reloading: {e}")
+                    resume_token, reload = None, True
+                    time.sleep(WATCH_RETRY_SECONDS)
+                except PyMongoError as e:
+                    logger.error(f"Search engine change stream interrupted, retrying: {e}")
+                    time.sleep(WATCH_RETRY_SECONDS)
+        finally:
+            self._watch_thread = None
+
+    def _encode(self, docs):
+        """Turn listing documents into row IDs, JSON documents and column arrays"""
+        n = len(docs)
+        columns = {name: np.full(n, np.nan if np.issubdtype(dtype, np.floating) else -1, dtype=dtype)
+                   for name, dtype in COLUMN_TYPES.items()}
+        amenity_ids = [doc.get("amenityIds") or [] for doc in docs]
+        words = max([max(ids) // 64 + 1 for ids in amenity_ids if ids] or [1])
+        amenities = np.zeros((n, words), dtype=np.uint64)
+
+        for row, doc in enumerate(docs):
+            # The stored numeric fields, which the MongoDB fallback filters and sorts on
+            for field, name in FIELD_COLUMNS.items():
+                value = doc.get(field)
+                if value is not None:
+                    columns[name][row] = value
+
+            region = doc.get("region")
+            if region:
+                columns["region"][row] = self._regions.setdefault(region, len(self._regions))
+
+            point = doc.get("geo") or {}
+            if point.get("coordinates"):
+                columns["lng"][row], columns["lat"][row] = point["coordinates"]
+
+            for amenity_id in amenity_ids[row]:
+                word, bit = divmod(amenity_id, 64)
+                amenities[row, word] |= np.uint64(1) << np.uint64(bit)
+
+        location = np.array([(doc.get("location") or "").lower() for doc in docs], dtype=np.str_)
+        ids = [str(doc["_id"]) for doc in docs]
+        return ids, json.loads(dumps(docs)), columns, location, amenities
+
+    def search(self, location="", region=None, price_min=None, price_max=None, guests=None, amenity_ids=(),
+               bbox=None, radius=None, exclude_ids=(), sort=None, page=1, per_page=20):
+        """Filter, sort and paginate listings, returning (listings, total_count)"""
+        snapshot = self._snapshot
+        mask = snapshot.alive.copy()
+
+        if price_min is not None or price_max is not None:
+            lo = 0 if price_min is None else np.searchsorted(snapshot.sorted_price, price_min, side="left")
+            hi = snapshot.priced_count
+            if price_max is not None:
+                hi = min(hi, np.searchsorted(snapshot.sorted_price, price_max, side="right"))
+            in_range = np.zeros(len(mask), dtype=bool)
+            in_range[snapshot.price_order[lo:hi]] = True
+            mask &= in_range
+
+        if region is not None:
+            in_region = np.zeros(len(mask), dtype=bool)
+            in_region[snapshot.rows_by_region.get(self.region_id(region), [])] = True
+            mask &= in_region
+
+        if guests:
+            mask &= snapshot.columns["guests"] >= guests
+
+        if location:
+            mask &= np.char.find(snapshot.location, location.lower()) >= 0
+
+        if amenity_ids:
+            required = snapshot.amenity_words(amenity_ids)
+            if required is None:
+                return [], 0
+            mask &= np.all((snapshot.amenities & required) == required, axis=1)
+
+        # NaN coordinates compare False, so listings without a location drop out
+        lngs, lats = snapshot.columns["lng"], snapshot.columns["lat"]
+        if bbox:
+            _, min_lat, _, max_lat = bbox
+            in_box = np.zeros(len(mask), dtype=bool)
+            for min_lng, max_lng in geo.bbox_longitude_ranges(bbox):
+                in_box |= (lngs >= min_lng) & (lngs <= max_lng)
+            mask &= in_box & (lats >= min_lat) & (lats <= max_lat)
+        if radius:
+            lat, lng, meters = radius
+            mask &= haversine_meters(lat, lng, lats, lngs) <= meters
+
+        for listing_id in exclude_ids:
+            row = snapshot.row_by_id.get(listing_id)
+            if row is not None:
+                mask[row] = False
+
+        rows = self._sorted(snapshot, np.flatnonzero(mask), sort, location)
+        start = (page - 1) * per_page
+        return [snapshot.docs[row] for row in rows[start:start + per_page]], len(rows)
+
+    def _sorted(self, snapshot, rows, sort, location=""):
+        """Order matching rows for a sort mode, the way mongo_search orders them"""
+        keys = []
+        for field, direction in SORT_MODES.get(sort, DEFAULT_SORT):
+            if field == "_id":
+                values = snapshot.id_rank[rows]
+            else:
+                column = snapshot.columns[FIELD_COLUMNS[field]][rows]
+                values = column.astype(np.float64)
+                # Missing values (NaN, or -1 in integer columns) sort lowest, as in MongoDB
+                values[np.isnan(values) if np.issubdtype(column.dtype, np.floating) else column < 0] = -np.inf
+            keys.append(values * direction)
+        if sort == "relevance" and location:
+            keys.insert(0, -np.char.startswith(snapshot.location[rows], location.lower()).astype(np.int8))
+
+        # np.lexsort sorts by the last key first
+        return rows[np.lexsort(keys[::-1])]
@@ -0,0 +1,182 @@
+import time
+import threading
+import logging
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+logger = logging.getLogger(__name__)
+
+# The site's class names are obfuscated and change with layout releases, so
+# each field has several selectors. All live variants are polled together
+# inside one wait, so a stale selector no longer costs its own timeout, and
+# the variant that matched last is checked first on the next page.
+
+# Alternatives per field, in the order they were added
+SELECTOR_VARIANTS = {
+    "search_results": [
+        (By.CLASS_NAME, "atm_7l_1j28jx2"),
+        (By.CLASS_NAME, "lr88w8j"),
+        (By.CSS_SELECTOR, "a[href*='/rooms/']"),
+    ],
+    "title": [
+        (By.TAG_NAME, "h1"),
+        (By.CSS_SELECTOR, "[data-section-id='TITLE_DEFAULT'] h1"),
+    ],
+    "picture_url": [
+        (By.CLASS_NAME, "i1ezuexe"),
+        (By.CSS_SELECTOR, "[data-section-id='HERO_DEFAULT'] img"),
+        (By.CSS_SELECTOR, "picture img"),
+    ],
+    "description": [
+        (By.CLASS_NAME, "l1h825yc"),
+        (By.CSS_SELECTOR, "[data-section-id='DESCRIPTION_DEFAULT'] span"),
+    ],
+    "price": [
+        (By.CLASS_NAME, "_j1kt73"),
+        (By.CLASS_NAME, "_tyxjp1"),
+        (By.CSS_SELECTOR, "[data-section-id='BOOK_IT_SIDEBAR'] span"),
+    ],
+    "rating": [
+        (By.CLASS_NAME, "r1dxllyb"),
+        (By.CSS_SELECTOR, "[data-testid='pdp-reviews-highlight-banner-host-rating']"),
+    ],
+    "location": [
+        (By.CLASS_NAME, "s1qk96pm"),
+        (By.CLASS_NAME, "_152qbzi"),
+        (By.CSS_SELECTOR, "[data-section-id='LOCATION_DEFAULT'] h3"),
+    ],
+    "house_details": [
+        (By.CLASS_NAME, "l7n4lsf"),
+        (By.CSS_SELECTOR, "[data-section-id='OVERVIEW_DEFAULT_V2'] li"),
+    ],
+}
+
+# Weight of the latest result in a variant's success rate
+SCORE_WEIGHT = 0.2
+# Misses in a row, on pages where another variant matched, before a variant is considered dead
+DEAD_AFTER_MISSES = 3
+# Dead variants are polled again once every this many lookups, in case the layout reverts
+DEAD_PROBE_INTERVAL = 50
+
+
+class SelectorStats:
+    def __init__(self, order):
+        self.order = order
+        self.score = 0.5
+        self.hits = 0
+        self.misses = 0
+        self.miss_streak = 0
+
+    @property
+    def dead(self):
+        return self.miss_streak >= DEAD_AFTER_MISSES
+
+    def record(self, hit):
+        self.score = (1 - SCORE_WEIGHT) * self.score + SCORE_WEIGHT * (1.0 if hit else 0.0)
+        if hit:
+            self.hits += 1
+            self.miss_streak = 0
+        else:
+            self.misses += 1
+            self.miss_streak += 1
+
+
+class SelectorRegistry:
+    """Tracks which selector variants work for each field"""
+
+    def __init__(self, variants=SELECTOR_VARIANTS):
+        self.variants = variants
+        self._lock = threading.Lock()
+        self._stats = {(field, selector): SelectorStats(order)
+                       for field, selectors in variants.items()
+                       for order, selector in enumerate(selectors)}
+        self._last_match = {}
+        self._lookups = {}
+
+    def candidates(self, field):
+        """Live variants for a field, best first; dead ones only on probe lookups"""
+        with self._lock:
+            lookups = self._lookups.get(field, 0)
+            self._lookups[field] = lookups + 1
+            probe = lookups % DEAD_PROBE_INTERVAL == DEAD_PROBE_INTERVAL - 1
+
+            selectors = self.variants[field]
+            live = [selector for selector in selectors if probe or not self._stats[(field, selector)].dead]
+            if not live:
+                # Everything looks dead; poll all of them rather than give up on the field
+                live = list(selectors)
+
+            last_match = self._last_match.get(field)
+            return sorted(live, key=lambda selector: (
+                selector != last_match,
+                -self._stats[(field, selector)].score,
+                self._stats[(field, selector)].order))
+
+    def record(self, field, polled, matched):
+        """Record a lookup; variants polled ahead of the match count as misses
+
+        When nothing matched the field may simply be absent from the page,
+        so no variant is penalized.
+        """
+        if matched is None:
+            return
+        with self._lock:
+            for selector in polled:
+                stats = self._stats[(field, selector)]
+                if selector == matched:
+                    stats.record(True)
+                    break
+                was_dead = stats.dead
+                stats.record(False)
+                if stats.dead and not was_dead:
+                    logger.warning(f"Selector {selector} for {field} stopped matching; skipping it")
+            self._last_match[field] = matched
+
+    def report(self):
+        """Per field, each variant's score, hit/miss counts and whether it is dead"""
+        with self._lock:
+            return {
+                field: [{"by": by, "value": value,
+                         "score": round(self._stats[(field, (by, value))].score, 3),
+                         "hits": self._stats[(field, (by, value))].hits,
+                         "misses": self._stats[(field, (by, value))].misses,
+                         "dead": self._stats[(field, (by, value))].dead,
+                         "last_match": self._last_match.get(field) == (by, value)}
+                        for by, value in selectors]
+                for field, selectors in self.variants.items()
+            }
+
+
+registry = SelectorRegistry()
+
+
+def find_all(browser, field, timeout=10):
+    """Wait for any variant of a field's selector and return the matching elements
+
+    Raises TimeoutException if no variant matches within the timeout.
+    """
+    selectors = registry.candidates(field)
+    matched = {}
+
+    def any_variant(driver):
+        for selector in selectors:
+            elements = driver.find_elements(*selector)
+            if elements:
+                matched["selector"] = selector
+                return elements
+        return False
+
+    start = time.perf_counter()
+    try:
+        elements = WebDriverWait(browser, timeout).until(any_variant)
+    except TimeoutException:
+        logger.debug(f"No selector for {field} matched after {time.perf_counter() - start:.1f}s")
+        raise
+    finally:
+        registry.record(field, selectors, matched.get("selector"))
+    return elements
+
+
+def find_one(browser, field, timeout=10):
+    return find_all(browser, field, timeout)[0]
@@ -0,0 +1,48 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+# The routes use this database name
+DB_NAME = "airbnb"
+SECRET_KEY = "your-secret-key-here"
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An in-memory database behind db.get_collection"""
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(db, "get_collection", lambda db_name, collection_name: client[db_name][collection_name])
+    return client[DB_NAME]
+
+
+@pytest.fixture
+def client(mongo):
+    """Test client for an app with the user, trip and review routes"""
+    flask = pytest.importorskip("flask")
+    jwt = pytest.importorskip("jwt")
+    from user_routes import user_bp
+    from trip_routes import trip_bp
+    from review_routes import review_bp
+
+    app = flask.Flask(__name__)
+    app.register_blueprint(user_bp, url_prefix='/user')
+    app.register_blueprint(trip_bp, url_prefix='/trips')
+    app.register_blueprint(review_bp, url_prefix='/reviews')
+    test_client = app.test_client()
+
+    def login(user_id):
+        token = jwt.encode({"sub": str(user_id)}, SECRET_KEY, algorithm="HS256")
+        test_client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    test_client.login = login
+    return test_client
+
+
+@pytest.fixture
+def user_id(mongo):
+    return str(mongo["users"].insert_one({"email": "guest@example.com", "defaultPaymentMethodId": None}).inserted_id)
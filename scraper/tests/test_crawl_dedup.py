@@ -0,0 +1,17 @@
+import crawl_dedup
+
+
+def test_urls_are_seen_only_once_marked(tmp_path):
+    seen = crawl_dedup.SeenUrls("test", directory=str(tmp_path), capacity=1000)
+    urls = ["https://www.airbnb.com/rooms/1", "https://www.airbnb.com/rooms/2", "https://www.airbnb.com/rooms/1"]
+
+    assert seen.filter_new(urls) == urls[:2]
+    # Nothing was written, so a retry schedules them again
+    assert seen.filter_new(urls) == urls[:2]
+
+    seen.mark_seen(urls[:1])
+    seen.save()
+
+    resumed = crawl_dedup.SeenUrls("test", directory=str(tmp_path), capacity=1000)
+    assert resumed.filter_new(urls) == urls[1:2]
+    assert resumed.skipped == 2
@@ -0,0 +1,64 @@
+import threading
+import db
+import denormalize
+import saved_listings
+from conftest import DB_NAME
+
+URL = "https://www.airbnb.com/rooms/1"
+
+
+def crawled(price, title="Cabin"):
+    return {"url": URL, "title": title, "price": price, "location": "Aspen, Colorado, United States"}
+
+
+def test_recrawl_keeps_listing_id(mongo):
+    first = db.upsert_listings_by_url(DB_NAME, "listings", [crawled("$100")])
+    second = db.upsert_listings_by_url(DB_NAME, "listings", [crawled("$150")])
+
+    assert first == second
+    assert mongo["listings"].count_documents({}) == 1
+    assert mongo["listings"].find_one()["price"] == "$150"
+
+
+def test_recrawl_refreshes_trip_and_saved_copies(mongo):
+    listing_id = db.upsert_listings_by_url(DB_NAME, "listings", [crawled("$100")])[0]
+    listing = mongo["listings"].find_one({"_id": listing_id})
+    mongo[denormalize.TRIPS_COLLECTION].insert_one(
+        dict(denormalize.trip_listing_snapshot(listing), userId="u1", listingId=str(listing_id)))
+    saved_listings.save_listing(DB_NAME, "u1", str(listing_id), listing)
+
+    recrawled_ids = db.upsert_listings_by_url(DB_NAME, "listings", [crawled("$150", "Cabin with hot tub")])
+    counts = denormalize.refresh_listing_copies(DB_NAME, "listings", recrawled_ids)
+
+    assert counts == {"trips": 1, "saved_listings": 1}
+    assert mongo[denormalize.TRIPS_COLLECTION].find_one()["listingTitle"] == "Cabin with hot tub"
+    saved = mongo[saved_listings.SAVED_LISTINGS_COLLECTION].find_one()
+    assert (saved["price"], saved["title"]) == ("$150", "Cabin with hot tub")
+
+    # Nothing changed since, so nothing is rewritten
+    assert denormalize.refresh_listing_copies(DB_NAME, "listings") == {"trips": 0, "saved_listings": 0}
+
+
+def test_refresh_requested_during_a_run_is_not_dropped(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    finished = threading.Event()
+    runs = []
+
+    def refresh(db_name, listings_collection, listing_ids=None, batch_size=500):
+        runs.append(None if listing_ids is None else sorted(listing_ids))
+        started.set()
+        release.wait(5)
+        if len(runs) == 2:
+            finished.set()
+
+    monkeypatch.setattr(denormalize, "refresh_listing_copies", refresh)
+
+    denormalize.refresh_in_background(DB_NAME, "listings", [1])
+    assert started.wait(5)
+    denormalize.refresh_in_background(DB_NAME, "listings", [2])
+    denormalize.refresh_in_background(DB_NAME, "listings", [3])
+    release.set()
+
+    assert finished.wait(5)
+    assert runs == [[1], [2, 3]]
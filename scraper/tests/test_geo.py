@@ -0,0 +1,34 @@
+import pytest
+import geo
+
+
+def test_parse_bbox_clamps_latitude():
+    assert geo.parse_bbox("-10,-95,10,100") == (-10.0, -90.0, 10.0, 90.0)
+
+
+def test_parse_bbox_full_world_for_wide_viewports():
+    assert geo.parse_bbox("-180,-60,180,60") == (-180.0, -60.0, 180.0, 60.0)
+    assert geo.parse_bbox("-400,-60,200,60") == (-180.0, -60.0, 180.0, 60.0)
+
+
+def test_parse_bbox_wraps_longitude_across_antimeridian():
+    # A viewport panned past 180 becomes a box crossing the antimeridian
+    assert geo.parse_bbox("170,-20,190,-10") == (170.0, -20.0, -170.0, -10.0)
+    assert geo.parse_bbox("0,0,180,10") == (0.0, 0.0, 180.0, 10.0)
+
+
+@pytest.mark.parametrize("value", ["", "1,2,3", "a,b,c,d", "0,10,5,10", "5,0,5,10", "nan,0,1,1", "0,0,inf,1"])
+def test_parse_bbox_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        geo.parse_bbox(value)
+
+
+def test_bbox_query_uses_box():
+    assert geo.bbox_query((-10.0, -5.0, 10.0, 5.0)) == {
+        geo.GEO_POINT_FIELD: {"$geoWithin": {"$box": [[-10.0, -5.0], [10.0, 5.0]]}}}
+
+
+def test_bbox_query_splits_at_antimeridian():
+    query = geo.bbox_query((170.0, -20.0, -170.0, -10.0))
+    assert [clause[geo.GEO_POINT_FIELD]["$geoWithin"]["$box"] for clause in query["$or"]] == [
+        [[170.0, -20.0], [180.0, -10.0]], [[-180.0, -20.0], [-170.0, -10.0]]]
@@ -0,0 +1,31 @@
+import json
+import pytest
+
+http_fetcher = pytest.importorskip("http_fetcher")
+
+
+def page(linked_data, payload):
+    return (f'<script type="application/ld+json">{json.dumps(linked_data)}</script>'
+            f'<script type="application/json">{json.dumps(payload)}</script>')
+
+
+def test_discounted_price_wins_over_original_price():
+    html = page({"@type": "VacationRental", "name": "Cabin"},
+                {"pricing": {"originalPrice": "$180 night", "discountedPrice": "$150 night"}})
+
+    assert http_fetcher.parse_place(html)["price"] == "$150 night"
+
+
+def test_original_price_is_the_last_resort():
+    html = page({"@type": "VacationRental", "name": "Cabin"}, {"pricing": {"originalPrice": "$180 night"}})
+
+    assert http_fetcher.parse_place(html)["price"] == "$180 night"
+
+
+def test_rating_needs_a_rating_value():
+    html = page({"@type": "VacationRental", "name": "Cabin", "aggregateRating": {"reviewCount": 12}}, {})
+    assert "rating" not in http_fetcher.parse_place(html)
+
+    html = page({"@type": "VacationRental", "name": "Cabin",
+                 "aggregateRating": {"ratingValue": 4.9, "reviewCount": 12}}, {})
+    assert http_fetcher.parse_place(html)["rating"] == "4.9 · 12 reviews"
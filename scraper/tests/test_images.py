@@ -0,0 +1,75 @@
+import asyncio
+import io
+import threading
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+images = pytest.importorskip("images")
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, content):
+        self.content = content
+
+    async def get(self, url):
+        return FakeResponse(self.content)
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def fetch(content, directory):
+    return asyncio.run(images._fetch_image(FakeClient(content), asyncio.Semaphore(1), "listing",
+                                           "https://a0.muscache.com/x.jpg", directory))
+
+
+def test_decompression_bomb_skips_the_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+
+    assert fetch(png(40, 40), str(tmp_path)) == ("listing", None)
+
+
+def test_image_is_processed(tmp_path):
+    listing_id, image = fetch(png(800, 600), str(tmp_path))
+
+    assert image["width"] == 800
+    assert set(image["thumbnails"]) == {"320", "640"}
+
+
+def test_listings_queued_during_a_run_are_processed_after_it(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    finished = threading.Event()
+    batches = []
+
+    def process(db_name, collection_name, listing_ids, concurrency):
+        batches.append(sorted(listing_ids))
+        started.set()
+        release.wait(5)
+        return len(listing_ids)
+
+    def processed(listing_ids):
+        if len(batches) == 2:
+            finished.set()
+
+    monkeypatch.setattr(images, "process_listing_images", process)
+
+    images.process_in_background("airbnb", "listings", [1, 2], on_processed=processed)
+    assert started.wait(5)
+    images.process_in_background("airbnb", "listings", [3], on_processed=processed)
+    images.process_in_background("airbnb", "listings", [4], on_processed=processed)
+    release.set()
+
+    assert finished.wait(5)
+    assert batches == [[1, 2], [3, 4]]
@@ -0,0 +1,103 @@
+import pytest
+import db_extensions
+from conftest import DB_NAME
+
+
+def create_itinerary(mongo, user_id):
+    return str(mongo["itineraries"].insert_one({
+        "userId": user_id, "name": "Colorado", "activities": [], "accommodations": [], "transportation": [],
+        "totalBudget": 500, "updatedAt": "2026-10-01T00:00:00"}).inserted_id)
+
+
+def test_rollups_are_saved_by_the_item_write(mongo, user_id, monkeypatch):
+    itinerary_id = create_itinerary(mongo, user_id)
+    writes = []
+    update_one = type(mongo["itineraries"]).update_one
+
+    def counted(self, *args, **kwargs):
+        writes.append(args[1])
+        return update_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(mongo["itineraries"]), "update_one", counted)
+
+    assert db_extensions.add_itinerary_item(DB_NAME, "itineraries", itinerary_id, user_id, "activities",
+                                            {"id": "a1", "name": "Hike", "date": "2026-12-02", "cost": 40})
+
+    assert len(writes) == 1
+    assert {"activities", "timeline", "costSummary"} <= set(writes[0]["$set"])
+    stored = mongo["itineraries"].find_one()
+    assert stored["costSummary"]["total"] == 40
+    assert stored["rollupsUpdatedAt"] == stored["updatedAt"]
+
+
+def test_concurrent_write_is_not_overwritten(mongo, user_id, monkeypatch):
+    itinerary_id = create_itinerary(mongo, user_id)
+    find_one = type(mongo["itineraries"]).find_one
+    raced = []
+
+    def read_then_race(self, *args, **kwargs):
+        itinerary = find_one(self, *args, **kwargs)
+        if not raced:
+            # Another request adds an activity between this read and its write
+            raced.append(True)
+            assert db_extensions.add_itinerary_item(DB_NAME, "itineraries", itinerary_id, user_id, "activities",
+                                                    {"id": "a0", "name": "Ski", "date": "2026-12-01", "cost": 60})
+        return itinerary
+
+    monkeypatch.setattr(type(mongo["itineraries"]), "find_one", read_then_race)
+
+    assert db_extensions.add_itinerary_item(DB_NAME, "itineraries", itinerary_id, user_id, "activities",
+                                            {"id": "a1", "name": "Hike", "date": "2026-12-02", "cost": 40})
+
+    stored = find_one(mongo["itineraries"])
+    assert [activity["id"] for activity in stored["activities"]] == ["a0", "a1"]
+    assert stored["costSummary"]["total"] == 100
+
+
+def test_itinerary_without_rollups_gets_them_on_read(mongo, user_id):
+    itinerary_id = create_itinerary(mongo, user_id)
+    mongo["itineraries"].update_one({}, {"$set": {"activities": [
+        {"id": "a1", "name": "Hike", "date": "2026-12-02", "cost": 40}]}})
+
+    itinerary = db_extensions.get_itinerary_by_id(DB_NAME, "itineraries", itinerary_id)
+    assert itinerary["costSummary"]["total"] == 40
+    assert [day["date"] for day in itinerary["timeline"]] == ["2026-12-02"]
+    assert mongo["itineraries"].find_one()["costSummary"]["remaining"] == 460
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "add", "section": "activities", "data": ["Hike", "2026-12-02"]},
+    {"op": "add", "section": "activities", "data": {"name": "Hike", "date": "2026-12-02", "userId": "x"}},
+    {"op": "add", "section": "activities", "data": {"name": {"$concat": ["a"]}, "date": "2026-12-02"}},
+    {"op": "update", "section": "activities", "id": "a1", "data": "Hike"},
+    {"op": "replace", "section": "activities", "id": "a1", "data": {"name": "Hike"}},
+    {"op": "delete", "section": ["activities"], "id": "a1"},
+    {"op": "delete", "section": "activities", "id": {"$ne": None}},
+])
+def test_invalid_batch_operations_are_rejected(client, mongo, user_id, operation):
+    client.login(user_id)
+    itinerary_id = create_itinerary(mongo, user_id)
+    mongo["itineraries"].update_one({}, {"$set": {"activities": [{"id": "a1", "name": "Hike", "date": "2026-12-02"}]}})
+
+    response = client.patch(f"/trips/itineraries/{itinerary_id}/items", json={"operations": [operation]})
+
+    assert response.status_code == 400
+    assert mongo["itineraries"].find_one()["activities"] == [{"id": "a1", "name": "Hike", "date": "2026-12-02"}]
+
+
+def test_batch_operations_apply_together(client, mongo, user_id):
+    client.login(user_id)
+    itinerary_id = create_itinerary(mongo, user_id)
+    mongo["itineraries"].update_one({}, {"$set": {"activities": [{"id": "a1", "name": "Hike", "date": "2026-12-02"}]}})
+
+    response = client.patch(f"/trips/itineraries/{itinerary_id}/items", json={"operations": [
+        {"op": "update", "section": "activities", "id": "a1", "data": {"cost": 25}},
+        {"op": "add", "section": "accommodations",
+         "data": {"name": "Cabin", "checkIn": "2026-12-01", "checkOut": "2026-12-04", "cost": 300}},
+    ]})
+
+    assert response.status_code == 200
+    assert response.get_json()["itinerary"]["costSummary"]["total"] == 325
+    assert client.patch(f"/trips/itineraries/{itinerary_id}/items", json=[]).status_code == 400
+    assert mongo["itineraries"].find_one()["activities"][0] == {"id": "a1", "name": "Hike", "date": "2026-12-02",
+                                                                "cost": 25}
@@ -0,0 +1,32 @@
+import pytest
+import listing_fields
+
+
+@pytest.mark.parametrize("text,rating", [
+    ("4.92 · 120 reviews", 4.92),
+    ("★4.8 (36)", 4.8),
+    ("Rated 5.0 out of 5.", 5.0),
+    ("120 reviews", None),
+    ("3 reviews", None),
+    ("New", None),
+    ("", None),
+])
+def test_parse_rating(text, rating):
+    assert listing_fields.parse_rating(text) == rating
+
+
+@pytest.mark.parametrize("text,price", [
+    ("$1,234 night", 1234.0),
+    ("$180 $150 night", 150.0),
+    ("$150 / night · $900 total", 150.0),
+    ("Originally $180, now $150", 150.0),
+    ("$99.50", 99.5),
+    ("Price unavailable", None),
+])
+def test_parse_price_prefers_the_current_price(text, price):
+    assert listing_fields.parse_price(text) == price
+
+
+def test_review_count_is_not_read_as_rating():
+    assert listing_fields.numeric_fields({"rating": "120 reviews"})["ratingValue"] is None
+    assert listing_fields.numeric_fields({"rating": "120 reviews"})["reviewCountValue"] == 120
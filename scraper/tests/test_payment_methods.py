@@ -0,0 +1,70 @@
+import db_extensions
+from conftest import DB_NAME
+
+
+def add(mongo, user_id, last4="4242"):
+    return db_extensions.add_payment_method(DB_NAME, "users", "payment_methods", user_id,
+                                            {"userId": user_id, "type": "visa", "last4": last4})
+
+
+def user(mongo):
+    return mongo["users"].find_one()
+
+
+def test_first_method_becomes_default(mongo, user_id):
+    first_id, first_default = add(mongo, user_id)
+    second_id, second_default = add(mongo, user_id, "1111")
+
+    assert (first_default, second_default) == (True, False)
+    assert user(mongo)["defaultPaymentMethodId"] == first_id
+    assert user(mongo)["paymentMethodIds"] == [first_id, second_id]
+
+
+def test_default_must_be_owned(mongo, user_id):
+    other_id = str(mongo["users"].insert_one({"email": "other@example.com"}).inserted_id)
+    other_method, _ = add(mongo, other_id)
+    add(mongo, user_id)
+
+    assert not db_extensions.set_default_payment_method(DB_NAME, "users", user_id, other_method)
+    assert db_extensions.remove_payment_method(DB_NAME, "users", "payment_methods", user_id, other_method) is False
+    assert mongo["payment_methods"].count_documents({}) == 2
+
+
+def test_default_is_removed_only_when_it_is_the_last_method(mongo, user_id):
+    first_id, _ = add(mongo, user_id)
+    second_id, _ = add(mongo, user_id, "1111")
+
+    assert not db_extensions.remove_payment_method(DB_NAME, "users", "payment_methods", user_id, first_id)
+
+    assert db_extensions.set_default_payment_method(DB_NAME, "users", user_id, second_id)
+    assert db_extensions.remove_payment_method(DB_NAME, "users", "payment_methods", user_id, first_id)
+    assert db_extensions.remove_payment_method(DB_NAME, "users", "payment_methods", user_id, second_id)
+
+    assert user(mongo)["defaultPaymentMethodId"] is None
+    assert user(mongo)["paymentMethodIds"] == []
+    assert mongo["payment_methods"].count_documents({}) == 0
+    # A removed method can't become the default again
+    assert not db_extensions.set_default_payment_method(DB_NAME, "users", user_id, second_id)
+
+
+def test_backfill_from_is_default_flag(mongo):
+    user_id = str(mongo["users"].insert_one({"email": "old@example.com"}).inserted_id)
+    methods = mongo["payment_methods"].insert_many([
+        {"userId": user_id, "last4": "1111"}, {"userId": user_id, "last4": "4242", "isDefault": True}]).inserted_ids
+
+    assert db_extensions.backfill_user_payment_methods(DB_NAME, "users", "payment_methods") == 1
+
+    assert user(mongo)["paymentMethodIds"] == [str(method_id) for method_id in methods]
+    assert user(mongo)["defaultPaymentMethodId"] == str(methods[1])
+    assert db_extensions.backfill_user_payment_methods(DB_NAME, "users", "payment_methods") == 0
+
+
+def test_remove_route_reports_default_from_current_state(client, mongo, user_id):
+    client.login(user_id)
+    first_id = client.post("/user/payment-methods", json={"type": "visa", "cardNumber": "4242424242424242",
+                                                          "expMonth": 1, "expYear": 2030}).get_json()["paymentMethod"]["id"]
+    client.post("/user/payment-methods", json={"type": "visa", "cardNumber": "4111111111111111",
+                                               "expMonth": 1, "expYear": 2030})
+
+    assert client.delete(f"/user/payment-methods/{first_id}").status_code == 400
+    assert client.delete(f"/user/payment-methods/{'0' * 24}").status_code == 404
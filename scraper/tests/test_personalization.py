@@ -0,0 +1,100 @@
+import pytest
+import availability
+import personalization
+from conftest import DB_NAME
+
+
+@pytest.fixture
+def listing_id(mongo):
+    availability.ensure_availability_indexes(DB_NAME)
+    return str(mongo["listings"].insert_one({"url": "https://www.airbnb.com/rooms/1", "title": "Cabin",
+                                             "price": "$100", "region": "Colorado",
+                                             "amenityIds": [1, 4]}).inserted_id)
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    personalization._profile_cache.clear()
+
+
+def profile(mongo, user_id):
+    return mongo[personalization.PROFILES_COLLECTION].find_one({"_id": user_id}) or {}
+
+
+def test_review_updates_profile(client, mongo, user_id, listing_id):
+    mongo["users"].update_one({}, {"$set": {"name": "Guest"}})
+    mongo["trips"].insert_one({"userId": user_id, "listingId": listing_id, "status": "completed"})
+    client.login(user_id)
+
+    response = client.post(f"/reviews/listings/{listing_id}/reviews", json={"rating": 5, "comment": "Great"})
+
+    assert response.status_code == 201
+    stored = profile(mongo, user_id)
+    assert stored["regions"]["Colorado"] == personalization.review_weight(5)
+    assert stored["amenities"]["4"] == personalization.review_weight(5)
+    assert mongo["listings"].find_one()["reviewCount"] == 1
+    # A second review of the same listing is rejected and leaves the profile alone
+    assert client.post(f"/reviews/listings/{listing_id}/reviews",
+                       json={"rating": 1, "comment": "Changed my mind"}).status_code == 409
+    assert profile(mongo, user_id)["regions"]["Colorado"] == personalization.review_weight(5)
+
+
+def test_cancelled_booking_is_taken_out_of_profile(client, mongo, user_id, listing_id):
+    client.login(user_id)
+    trip_id = client.post("/trips/trips", json={"listingId": listing_id, "checkIn": "2026-12-01",
+                                                "checkOut": "2026-12-04", "guests": 2,
+                                                "totalPrice": 300}).get_json()["trip"]["id"]
+    booked = profile(mongo, user_id)
+    assert booked["regions"]["Colorado"] == personalization.BOOKING_WEIGHT
+    assert booked["interactions"] == 1
+
+    assert client.put(f"/trips/trips/{trip_id}/cancel").status_code == 200
+
+    cancelled = profile(mongo, user_id)
+    assert cancelled["regions"]["Colorado"] == 0
+    assert cancelled["price"]["weight"] == 0
+    assert cancelled["interactions"] == 0
+    assert personalization.get_profile(DB_NAME, user_id) is None
+
+
+def test_negative_review_still_counts_as_an_interaction(client, mongo, user_id, listing_id):
+    mongo["users"].update_one({}, {"$set": {"name": "Guest"}})
+    mongo["trips"].insert_one({"userId": user_id, "listingId": listing_id, "status": "completed"})
+    assert personalization.record_interaction(DB_NAME, user_id, mongo["listings"].find_one(),
+                                              personalization.BOOKING_WEIGHT)
+    client.login(user_id)
+
+    assert client.post(f"/reviews/listings/{listing_id}/reviews",
+                       json={"rating": 1, "comment": "Cold"}).status_code == 201
+
+    assert profile(mongo, user_id)["interactions"] == 2
+    assert personalization.get_profile(DB_NAME, user_id) is not None
+
+
+def test_cancel_subtracts_the_values_the_booking_added(client, mongo, user_id, listing_id):
+    client.login(user_id)
+    trip_id = client.post("/trips/trips", json={"listingId": listing_id, "checkIn": "2026-12-01",
+                                                "checkOut": "2026-12-04", "guests": 2,
+                                                "totalPrice": 300}).get_json()["trip"]["id"]
+    # Re-crawled between booking and cancelling
+    mongo["listings"].update_one({}, {"$set": {"price": "$250", "region": "Utah", "amenityIds": [2]}})
+
+    assert client.put(f"/trips/trips/{trip_id}/cancel").status_code == 200
+
+    cancelled = profile(mongo, user_id)
+    assert cancelled["regions"] == {"Colorado": 0}
+    assert cancelled["amenities"] == {"1": 0, "4": 0}
+    assert cancelled["price"] == {"weight": 0, "sum": 0, "squares": 0}
+
+
+def test_unsave_subtracts_the_values_the_save_added(client, mongo, user_id, listing_id):
+    client.login(user_id)
+    assert client.post(f"/user/saved-listings/{listing_id}").status_code == 200
+    mongo["listings"].update_one({}, {"$set": {"region": "Utah"}})
+    # Saving again refreshes the card but not the snapshot
+    assert client.post(f"/user/saved-listings/{listing_id}").status_code == 200
+
+    assert client.delete(f"/user/saved-listings/{listing_id}").status_code == 200
+
+    assert profile(mongo, user_id)["regions"] == {"Colorado": 0}
+    assert profile(mongo, user_id)["interactions"] == 0
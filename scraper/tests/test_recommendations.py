@@ -0,0 +1,30 @@
+import recommendations
+from conftest import DB_NAME
+
+
+def listing(url, region, price, amenity_ids):
+    return {"url": url, "title": url.rsplit("/", 1)[-1], "region": region, "price": price,
+            "rating": "4.80 · 20 reviews", "house_details": ["4 guests"], "amenityIds": amenity_ids}
+
+
+def test_copies_of_a_listing_are_not_neighbors(mongo):
+    ids = mongo["listings"].insert_many([
+        listing("https://www.airbnb.com/rooms/1", "Colorado", "$200", [1, 2, 3]),
+        listing("https://www.airbnb.com/rooms/1", "Colorado", "$200", [1, 2, 3]),
+        listing("https://www.airbnb.com/rooms/2", "Colorado", "$210", [1, 2, 3]),
+        listing("https://www.airbnb.com/rooms/3", "Texas", "$90", [4, 5]),
+        listing("https://www.airbnb.com/rooms/4", "Texas", "$95", [4, 5]),
+    ]).inserted_ids
+
+    assert recommendations.build_neighbors(DB_NAME, "listings", k=3, probes=2) == 5
+
+    first, copy = (recommendations.get_similar_listings(DB_NAME, str(listing_id)) for listing_id in ids[:2])
+    assert first == copy
+    neighbor_ids = [neighbor["id"] for neighbor in first]
+    assert len(neighbor_ids) == len(set(neighbor_ids)) == 3
+    assert not {str(ids[0]), str(ids[1])} & set(neighbor_ids)
+
+    for listing_id in ids[2:]:
+        neighbor_ids = [neighbor["id"] for neighbor in recommendations.get_similar_listings(DB_NAME, str(listing_id))]
+        assert str(ids[1]) not in neighbor_ids
+        assert neighbor_ids.count(str(ids[0])) <= 1
@@ -0,0 +1,151 @@
+import itertools
+import pytest
+from bson import ObjectId
+import listing_fields
+from search_engine import SearchEngine, SORT_MODES, mongo_filter, mongo_search
+from conftest import DB_NAME
+
+LISTINGS = [
+    # location, region, price, rating, guests
+    ("Aspen, Colorado, United States", "Colorado", "$250 night", "4.95 · 120 reviews", "6 guests"),
+    ("Aspen, Colorado, United States", "Colorado", "$180 night", "4.80 · 45 reviews", "4 guests"),
+    ("Snowmass, Colorado, United States", "Colorado", "$180 night", "4.80 · 45 reviews", "2 guests"),
+    ("Denver, Colorado, United States", "Colorado", "$95 night", "4.70 · 300 reviews", "2 guests"),
+    ("Boulder, Colorado, United States", "Colorado", "", "New", "3 guests"),
+    ("Near Aspen, Colorado, United States", "Colorado", "$210 night", "4.95 · 120 reviews", "8 guests"),
+    ("Austin, Texas, United States", "Texas", "$120 night", "4.60 · 12 reviews", "4 guests"),
+    ("Austin, Texas, United States", "Texas", "$120 night", "", ""),
+    ("Houston, Texas, United States", "Texas", "$75 night", "4.95 · 120 reviews", "5 guests"),
+    ("Aspen Hill, Maryland, United States", "Maryland", "$140 night", "4.90 · 8 reviews", "4 guests"),
+]
+
+FILTERS = [
+    {},
+    {"location": "aspen"},
+    {"location": "United States"},
+    {"location": "a.pen"},
+    {"region": "Colorado"},
+    {"price_min": 100, "price_max": 200},
+    {"guests": 4},
+    {"location": "aspen", "guests": 5},
+]
+
+
+@pytest.fixture
+def listing_ids(mongo):
+    docs = []
+    for location, region, price, rating, guests in LISTINGS:
+        doc = {"location": location, "region": region, "price": price, "rating": rating,
+               "house_details": [guests] if guests else []}
+        doc.update(listing_fields.numeric_fields(doc))
+        docs.append(doc)
+    return [str(listing_id) for listing_id in mongo["listings"].insert_many(docs).inserted_ids]
+
+
+@pytest.fixture
+def engine(mongo, listing_ids):
+    engine = SearchEngine(DB_NAME, "listings")
+    assert engine.refresh()
+    return engine
+
+
+@pytest.mark.parametrize("filters,sort", itertools.product(FILTERS, [None] + list(SORT_MODES)))
+def test_engine_matches_mongodb(mongo, engine, filters, sort):
+    location = filters.get("location", "")
+    query = mongo_filter(**filters)
+    total = mongo["listings"].count_documents(query)
+
+    for page in (1, 2, 3):
+        listings, total_count = engine.search(**filters, sort=sort, page=page, per_page=3)
+        expected = mongo_search(mongo["listings"], query, sort, location, (page - 1) * 3, 3)
+        assert total_count == total
+        assert [listing["_id"]["$oid"] for listing in listings] == [str(doc["_id"]) for doc in expected]
+
+
+def test_excluded_ids_match(mongo, engine, listing_ids):
+    excluded = listing_ids[:3]
+    listings, total_count = engine.search(exclude_ids=excluded, per_page=20)
+    query = mongo_filter(exclude_ids=excluded)
+
+    assert total_count == mongo["listings"].count_documents(query) == len(LISTINGS) - 3
+    assert [listing["_id"]["$oid"] for listing in listings] == [
+        str(doc["_id"]) for doc in mongo_search(mongo["listings"], query, limit=20)]
+
+
+def test_relevance_ranks_location_prefix_first(engine, listing_ids):
+    listings, _ = engine.search(location="aspen", sort="relevance", per_page=20)
+    assert [listing["location"] for listing in listings] == [
+        "Aspen, Colorado, United States", "Aspen, Colorado, United States",
+        "Aspen Hill, Maryland, United States", "Near Aspen, Colorado, United States"]
+
+
+@pytest.mark.parametrize("sort", [None] + list(SORT_MODES))
+def test_total_count_does_not_depend_on_sort(mongo, engine, sort):
+    # relevance only orders the location matches; it must not narrow them
+    listings, total_count = engine.search(location="aspen", sort=sort, per_page=20)
+    assert total_count == len(listings) == mongo["listings"].count_documents(mongo_filter(location="aspen")) == 4
+
+
+class FakeStream:
+    """Change stream that yields scripted changes, then ends"""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.alive = True
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self.changes:
+            self.alive = False
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = change.get("_id")
+        return change
+
+
+class FakeListings:
+    """Listings collection whose watch() hands out FakeStreams, then reports a standalone server"""
+
+    def __init__(self, docs, streams):
+        self.docs = docs
+        self.streams = list(streams)
+        self.resumed_after = []
+
+    def find(self, query):
+        return list(self.docs)
+
+    def watch(self, resume_after=None, **kwargs):
+        from pymongo.errors import OperationFailure
+        self.resumed_after.append(resume_after)
+        if not self.streams:
+            raise OperationFailure("not a replica set", code=40573)
+        return FakeStream(self.streams.pop(0))
+
+
+def test_change_stream_reopens_after_invalidate(monkeypatch):
+    import db
+    first, second = {"_id": ObjectId(), "location": "Aspen"}, {"_id": ObjectId(), "location": "Denver"}
+    listings = FakeListings([], [
+        [{"_id": "t1", "operationType": "insert", "fullDocument": first},
+         {"_id": "t2", "operationType": "drop"}, {"_id": "t3", "operationType": "invalidate"}],
+        [{"_id": "t4", "operationType": "insert", "fullDocument": second}],
+    ])
+    monkeypatch.setattr(db, "get_collection", lambda db_name, collection_name: listings)
+    engine = SearchEngine(DB_NAME, "listings")
+    assert engine.refresh()
+
+    # The collection was recreated with the first listing before the second stream opened
+    listings.docs = [first]
+    engine._watch()
+
+    # Fresh stream after the drop, resumed stream after the second one ended
+    assert listings.resumed_after == [None, None, "t4"]
+    listings_found, total_count = engine.search(per_page=10)
+    assert total_count == 2
+    assert {listing["location"] for listing in listings_found} == {"Aspen", "Denver"}
@@ -0,0 +1,73 @@
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+import availability
+import db
+from conftest import DB_NAME
+
+
+@pytest.fixture
+def listing_id(mongo):
+    availability.ensure_availability_indexes(DB_NAME)
+    return str(mongo["listings"].insert_one(
+        {"url": "https://www.airbnb.com/rooms/1", "title": "Cabin", "price": "$100"}).inserted_id)
+
+
+def book(client, listing_id, check_in="2026-12-01", check_out="2026-12-04"):
+    return client.post("/trips/trips", json={"listingId": listing_id, "checkIn": check_in, "checkOut": check_out,
+                                             "guests": 2, "totalPrice": 300})
+
+
+def test_cancel_releases_nights_for_rebooking(client, mongo, user_id, listing_id):
+    client.login(user_id)
+    trip_id = book(client, listing_id).get_json()["trip"]["id"]
+    assert book(client, listing_id, "2026-12-03", "2026-12-05").status_code == 409
+
+    response = client.put(f"/trips/trips/{trip_id}/cancel")
+
+    assert response.status_code == 200
+    assert mongo["trips"].find_one()["status"] == "cancelled"
+    assert mongo[availability.AVAILABILITY_COLLECTION].find_one()["bookedNights"] == []
+    assert book(client, listing_id, "2026-12-03", "2026-12-05").status_code == 201
+    assert client.put(f"/trips/trips/{trip_id}/cancel").status_code == 400
+
+
+def test_booking_reports_database_errors_as_500(client, mongo, user_id, listing_id, monkeypatch):
+    client.login(user_id)
+    get_collection = db.get_collection
+
+    def unreachable(db_name, collection_name):
+        if collection_name == availability.AVAILABILITY_COLLECTION:
+            raise ServerSelectionTimeoutError("no servers")
+        return get_collection(db_name, collection_name)
+
+    monkeypatch.setattr(db, "get_collection", unreachable)
+
+    assert book(client, listing_id).status_code == 500
+    assert mongo["trips"].count_documents({}) == 0
+
+
+def test_active_trip_cannot_be_cancelled(client, mongo, user_id, listing_id):
+    client.login(user_id)
+    trip_id = book(client, listing_id).get_json()["trip"]["id"]
+    # The status sweep moved it on
+    mongo["trips"].update_one({}, {"$set": {"status": "active"}})
+
+    assert client.put(f"/trips/trips/{trip_id}/cancel").status_code == 400
+    assert mongo["trips"].find_one()["status"] == "active"
+    assert book(client, listing_id, "2026-12-03", "2026-12-05").status_code == 409
+
+
+def test_backfill_reserves_existing_trips(client, mongo, user_id, listing_id):
+    mongo["trips"].insert_many([
+        {"userId": user_id, "listingId": listing_id, "checkIn": "2026-12-01", "checkOut": "2026-12-04",
+         "status": "upcoming"},
+        {"userId": user_id, "listingId": listing_id, "checkIn": "2026-12-10", "checkOut": "2026-12-12",
+         "status": "cancelled"},
+    ])
+
+    assert availability.backfill_trip_nights(DB_NAME, "trips") == 1
+    assert availability.backfill_trip_nights(DB_NAME, "trips") == 0
+
+    client.login(user_id)
+    assert book(client, listing_id, "2026-12-03", "2026-12-05").status_code == 409
+    assert book(client, listing_id, "2026-12-10", "2026-12-12").status_code == 201
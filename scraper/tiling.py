@@ -0,0 +1,135 @@
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A search by region name returns at most MAX_SEARCH_PAGES pages of results,
+# so big regions are crawled as map tiles instead. A tile whose results fill
+# every page is split into quadrants and each quadrant is searched again,
+# until tiles come back under the cap or reach MIN_TILE_SPAN.
+
+# Largest tile searched first, in degrees; region bounds are gridded into tiles this size
+MAX_TILE_SPAN = 2.0
+# Tiles smaller than this are not split further even if they still hit the cap
+MIN_TILE_SPAN = 0.02
+
+# Approximate (min_lng, min_lat, max_lng, max_lat) bounds, rounded outwards
+REGION_BOUNDS = {
+    # Canadian provinces and territories
+    "Alberta": (-120.0, 49.0, -110.0, 60.0),
+    "British Columbia": (-139.1, 48.2, -114.0, 60.0),
+    "Manitoba": (-102.1, 49.0, -88.9, 60.0),
+    "New Brunswick": (-69.1, 44.6, -63.7, 48.1),
+    "Newfoundland and Labrador": (-67.8, 46.6, -52.6, 60.4),
+    "Northwest Territories": (-136.5, 60.0, -101.9, 78.8),
+    "Nova Scotia": (-66.4, 43.4, -59.7, 47.1),
+    "Nunavut": (-120.7, 51.6, -61.1, 83.2),
+    "Ontario": (-95.2, 41.6, -74.3, 56.9),
+    "Prince Edward Island": (-64.5, 45.9, -61.9, 47.1),
+    "Quebec": (-79.8, 44.9, -57.1, 62.6),
+    "Saskatchewan": (-110.0, 49.0, -101.3, 60.0),
+    "Yukon": (-141.0, 60.0, -123.8, 69.7),
+    # US states
+    "Alabama": (-88.5, 30.1, -84.9, 35.0),
+    "Alaska": (-179.2, 51.2, -129.9, 71.4),
+    "Arizona": (-114.9, 31.3, -109.0, 37.0),
+    "Arkansas": (-94.7, 33.0, -89.6, 36.5),
+    "California": (-124.5, 32.5, -114.1, 42.0),
+    "Colorado": (-109.1, 36.9, -102.0, 41.0),
+    "Connecticut": (-73.8, 40.9, -71.8, 42.1),
+    "Delaware": (-75.8, 38.4, -75.0, 39.9),
+    "Florida": (-87.7, 24.4, -80.0, 31.0),
+    "Georgia": (-85.7, 30.3, -80.8, 35.0),
+    "Hawaii": (-160.3, 18.9, -154.8, 22.3),
+    "Idaho": (-117.3, 41.9, -111.0, 49.0),
+    "Illinois": (-91.6, 36.9, -87.0, 42.6),
+    "Indiana": (-88.1, 37.7, -84.7, 41.8),
+    "Iowa": (-96.7, 40.3, -90.1, 43.6),
+    "Kansas": (-102.1, 36.9, -94.5, 40.1),
+    "Kentucky": (-89.6, 36.4, -81.9, 39.2),
+    "Louisiana": (-94.1, 28.9, -88.8, 33.1),
+    "Maine": (-71.1, 43.0, -66.9, 47.5),
+    "Maryland": (-79.5, 37.9, -75.0, 39.8),
+    "Massachusetts": (-73.6, 41.2, -69.9, 42.9),
+    "Michigan": (-90.5, 41.6, -82.1, 48.3),
+    "Minnesota": (-97.3, 43.4, -89.4, 49.4),
+    "Mississippi": (-91.7, 30.1, -88.1, 35.0),
+    "Missouri": (-95.8, 35.9, -89.1, 40.7),
+    "Montana": (-116.1, 44.3, -104.0, 49.0),
+    "Nebraska": (-104.1, 39.9, -95.3, 43.1),
+    "Nevada": (-120.1, 35.0, -114.0, 42.0),
+    "New Hampshire": (-72.6, 42.6, -70.6, 45.4),
+    "New Jersey": (-75.6, 38.9, -73.9, 41.4),
+    "New Mexico": (-109.1, 31.3, -103.0, 37.0),
+    "New York": (-79.8, 40.4, -71.8, 45.1),
+    "North Carolina": (-84.4, 33.8, -75.4, 36.6),
+    "North Dakota": (-104.1, 45.9, -96.5, 49.0),
+    "Ohio": (-84.9, 38.4, -80.5, 42.0),
+    "Oklahoma": (-103.1, 33.6, -94.4, 37.0),
+    "Oregon": (-124.6, 41.9, -116.4, 46.3),
+    "Pennsylvania": (-80.6, 39.7, -74.6, 42.3),
+    "Rhode Island": (-71.9, 41.1, -71.1, 42.1),
+    "South Carolina": (-83.4, 32.0, -78.5, 35.3),
+    "South Dakota": (-104.1, 42.4, -96.4, 46.0),
+    "Tennessee": (-90.4, 34.9, -81.6, 36.7),
+    "Texas": (-106.7, 25.8, -93.5, 36.5),
+    "Utah": (-114.1, 36.9, -109.0, 42.0),
+    "Vermont": (-73.5, 42.7, -71.4, 45.1),
+    "Virginia": (-83.7, 36.5, -75.2, 39.5),
+    "Washington": (-124.8, 45.5, -116.9, 49.0),
+    "West Virginia": (-82.7, 37.2, -77.7, 40.7),
+    "Wisconsin": (-92.9, 42.4, -86.2, 47.1),
+    "Wyoming": (-111.1, 41.0, -104.0, 45.0),
+}
+
+
+def region_bounds(region):
+    """Bounding box for a state or province name, or None if it isn't known"""
+    return REGION_BOUNDS.get(region)
+
+
+def tile_span(tile):
+    min_lng, min_lat, max_lng, max_lat = tile
+    return max(max_lng - min_lng, max_lat - min_lat)
+
+
+def grid_tiles(bbox, max_span=MAX_TILE_SPAN):
+    """Cover a bounding box with a grid of tiles no wider or taller than max_span"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    columns = max(1, math.ceil((max_lng - min_lng) / max_span))
+    rows = max(1, math.ceil((max_lat - min_lat) / max_span))
+    lng_step = (max_lng - min_lng) / columns
+    lat_step = (max_lat - min_lat) / rows
+
+    return [(min_lng + column * lng_step, min_lat + row * lat_step,
+             min_lng + (column + 1) * lng_step, min_lat + (row + 1) * lat_step)
+            for row in range(rows) for column in range(columns)]
+
+
+def can_split(tile):
+    return tile_span(tile) / 2 >= MIN_TILE_SPAN
+
+
+def split_tile(tile):
+    """Split a tile into four quadrants"""
+    min_lng, min_lat, max_lng, max_lat = tile
+    mid_lng = (min_lng + max_lng) / 2
+    mid_lat = (min_lat + max_lat) / 2
+    return [
+        (min_lng, min_lat, mid_lng, mid_lat),
+        (mid_lng, min_lat, max_lng, mid_lat),
+        (min_lng, mid_lat, mid_lng, max_lat),
+        (mid_lng, mid_lat, max_lng, max_lat),
+    ]
+
+
+def map_zoom(tile):
+    """Web map zoom level at which a tile roughly fills the search map"""
+    return max(1, min(20, int(math.log2(360.0 / max(tile_span(tile), 1e-6)))))
+
+
+def tile_query(tile):
+    """Search URL parameters restricting results to a tile's map bounds"""
+    min_lng, min_lat, max_lng, max_lat = tile
+    return (f'&search_by_map=true&ne_lat={max_lat:.6f}&ne_lng={max_lng:.6f}'
+            f'&sw_lat={min_lat:.6f}&sw_lng={min_lng:.6f}&zoom={map_zoom(tile)}')
@@ -0,0 +1,590 @@
+from flask import Blueprint, request, jsonify
+from bson import ObjectId
+from functools import wraps
+import jwt
+import db
+import availability
+import denormalize
+import personalization
+import db_extensions
+import itinerary_rollups
+import logging
+import datetime
+import json
+from bson.json_util import dumps
+
+trip_bp = Blueprint('trip', __name__)
+
+# Constants
+DB_NAME = "airbnb"
+TRIPS_COLLECTION = "trips"
+LISTINGS_COLLECTION = "listings"
+USERS_COLLECTION = "users"
+ITINERARIES_COLLECTION = "itineraries"
+AVAILABILITY_COLLECTION = availability.AVAILABILITY_COLLECTION
+
+# Itinerary entry fields: required ones, then optional ones with their defaults
+ITINERARY_ITEM_FIELDS = {
+    'activities': (['name', 'date'],
+                   {'time': '', 'location': '', 'cost': 0, 'notes': '', 'booked': False}),
+    'accommodations': (['name', 'checkIn', 'checkOut'],
+                       {'location': '', 'cost': 0, 'confirmation': '', 'notes': ''}),
+    'transportation': (['type', 'from', 'to', 'departureDate'],
+                       {'departureTime': '', 'arrivalDate': None, 'arrivalTime': '', 'carrier': '',
+                        'confirmation': '', 'cost': 0, 'notes': ''}),
+}
+MAX_BATCH_OPERATIONS = 100
+
+
+def missing_item_field(section, data):
+    """First required field missing from an itinerary entry, or None"""
+    required, _ = ITINERARY_ITEM_FIELDS[section]
+    return next((field for field in required if field not in data), None)
+
+
+def invalid_item_field(section, data):
+    """First field of an entry that isn't part of the section or isn't a plain value, or None"""
+    required, optional = ITINERARY_ITEM_FIELDS[section]
+    for field, value in data.items():
+        if field not in required and field not in optional:
+            return field
+        if value is not None and not isinstance(value, (str, int, float, bool)):
+            return field
+    return None
+
+
+def build_itinerary_item(section, data):
+    """New itinerary entry with a generated ID and defaults for omitted fields"""
+    required, optional = ITINERARY_ITEM_FIELDS[section]
+    item = {'id': str(ObjectId())}
+    item.update({field: data[field] for field in required})
+    item.update({field: data.get(field, default) for field, default in optional.items()})
+    if section == 'transportation' and item['arrivalDate'] is None:
+        item['arrivalDate'] = data['departureDate']
+    return item
+
+
+def itinerary_item_updates(section, data):
+    """The fields of an entry update that may be changed"""
+    required, optional = ITINERARY_ITEM_FIELDS[section]
+    return {field: data[field] for field in required + list(optional) if field in data}
+
+
+# Token validation decorator (copied from auth_routes to avoid circular imports)
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+        auth_header = request.headers.get('Authorization')
+
+        if auth_header and auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+
+        if not token:
+            return jsonify({'message': 'Token is missing'}), 401
+
+        try:
+            # Replace with your actual secret key
+            SECRET_KEY = 'your-secret-key-here'
+            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            user_id = payload['sub']
+
+            # Fetch the user from database to verify they exist
+            user = db.get_user_by_id(DB_NAME, USERS_COLLECTION, user_id)
+            if not user:
+                return jsonify({'message': 'Invalid token. User not found'}), 401
+
+            # Add user to request context
+            request.user = user
+
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Invalid token'}), 401
+
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+@trip_bp.route('/trips', methods=['GET'])
+@token_required
+def get_user_trips():
+    """Get all trips for the current user"""
+    user = request.user
+    status = request.args.get('status')  # Filter by status if provided
+
+    trips = db.get_user_trips(DB_NAME, TRIPS_COLLECTION, str(user['_id']), status)
+
+    return jsonify(trips), 200
+
+
+@trip_bp.route('/trips/<trip_id>', methods=['GET'])
+@token_required
+def get_trip(trip_id):
+    """Get details of a specific trip"""
+    user = request.user
+
+    trip = db_extensions.get_trip_by_id(DB_NAME, TRIPS_COLLECTION, trip_id)
+
+    if not trip:
+        return jsonify({'message': 'Trip not found'}), 404
+
+    # Ensure trip belongs to the current user
+    if trip.get('userId') != str(user['_id']):
+        return jsonify({'message': 'Unauthorized access to trip'}), 403
+
+    return jsonify(trip), 200
+
+
+@trip_bp.route('/trips', methods=['POST'])
+@token_required
+def create_trip():
+    """Create a new trip booking"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    required_fields = ['listingId', 'checkIn', 'checkOut', 'guests', 'totalPrice']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+
+    # Check if listing exists
+    listing = db.get_listing_by_id(DB_NAME, LISTINGS_COLLECTION, data['listingId'])
+    if not listing:
+        return jsonify({'message': 'Listing not found'}), 404
+
+    try:
+        nights = availability.nights_between(data['checkIn'], data['checkOut'])
+    except ValueError as e:
+        return jsonify({'message': f'Invalid dates: {str(e)}'}), 400
+
+    # Reserve the nights before creating the trip so concurrent bookings can't overlap
+    reserved = availability.reserve_nights(DB_NAME, AVAILABILITY_COLLECTION, data['listingId'], nights)
+    if reserved is None:
+        return jsonify({'message': 'Failed to check availability'}), 500
+    if not reserved:
+        return jsonify({'message': 'Listing is not available for the selected dates'}), 409
+
+    # Create trip document
+    trip = {
+        'userId': str(user['_id']),
+        'listingId': data['listingId'],
+        # Listing details are copied so /trips needs no listing lookups; denormalize keeps them current
+        **denormalize.trip_listing_snapshot(listing),
+        'checkIn': data['checkIn'],
+        'checkOut': data['checkOut'],
+        'guests': data['guests'],
+        'totalPrice': data['totalPrice'],
+        'status': 'upcoming',  # Initial status
+        'bookedAt': datetime.datetime.utcnow().isoformat(),
+        'paymentMethodId': data.get('paymentMethodId'),
+        'specialRequests': data.get('specialRequests', ''),
+        # What the booking adds to the user's profile, subtracted again if it's cancelled
+        personalization.SNAPSHOT_FIELD: personalization.interaction_snapshot(listing)
+    }
+
+    # Insert trip document
+    trip_id = db.insert_one_into_collection(DB_NAME, TRIPS_COLLECTION, trip)
+
+    if not trip_id:
+        availability.release_nights(DB_NAME, AVAILABILITY_COLLECTION, data['listingId'], nights)
+        return jsonify({'message': 'Failed to create trip'}), 500
+
+    # insert_one added the ObjectId to the document
+    trip.pop('_id', None)
+    trip['id'] = trip_id
+    personalization.record_interaction(DB_NAME, str(user['_id']), trip.pop(personalization.SNAPSHOT_FIELD),
+                                       personalization.BOOKING_WEIGHT)
+
+    return jsonify({
+        'message': 'Trip booked successfully',
+        'trip': trip
+    }), 201
+
+
+@trip_bp.route('/trips/<trip_id>/cancel', methods=['PUT'])
+@token_required
+def cancel_trip(trip_id):
+    """Cancel a trip"""
+    user = request.user
+
+    # Get trip
+    trip = db_extensions.get_trip_by_id(DB_NAME, TRIPS_COLLECTION, trip_id)
+
+    if not trip:
+        return jsonify({'message': 'Trip not found'}), 404
+
+    # Ensure trip belongs to the current user
+    if trip.get('userId') != str(user['_id']):
+        return jsonify({'message': 'Unauthorized access to trip'}), 403
+
+    # Ensure trip is not already cancelled
+    if trip.get('status') == 'cancelled':
+        return jsonify({'message': 'Trip is already cancelled'}), 400
+
+    # Stays that have started or finished keep their nights
+    if trip.get('status') != 'upcoming':
+        return jsonify({'message': 'Only upcoming trips can be cancelled'}), 400
+
+    # Conditional on the status, so a concurrent status sweep or cancel can't slip in between
+    result = db_extensions.update_trip_status(DB_NAME, TRIPS_COLLECTION, trip_id, 'cancelled',
+                                              from_statuses=['upcoming'])
+
+    if result is None:
+        return jsonify({'message': 'Failed to cancel trip'}), 500
+    if not result:
+        return jsonify({'message': 'Only upcoming trips can be cancelled'}), 409
+
+    # Free the nights for other guests
+    try:
+        nights = availability.nights_between(trip['checkIn'], trip['checkOut'])
+        availability.release_nights(DB_NAME, AVAILABILITY_COLLECTION, trip['listingId'], nights)
+    except (KeyError, ValueError) as e:
+        logging.warning(f"Could not release nights for trip {trip_id}: {e}")
+
+    personalization.undo_interaction(DB_NAME, LISTINGS_COLLECTION, str(user['_id']), trip,
+                                     personalization.BOOKING_WEIGHT)
+
+    return jsonify({'message': 'Trip cancelled successfully'}), 200
+
+
+@trip_bp.route('/itineraries', methods=['GET'])
+@token_required
+def get_user_itineraries():
+    """Get all travel itineraries for the current user"""
+    user = request.user
+
+    itineraries = db.get_user_itineraries(DB_NAME, ITINERARIES_COLLECTION, str(user['_id']))
+
+    return jsonify(itineraries), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>', methods=['GET'])
+@token_required
+def get_itinerary(itinerary_id):
+    """Get details of a specific travel itinerary"""
+    user = request.user
+
+    itinerary = db_extensions.get_itinerary_by_id(DB_NAME, ITINERARIES_COLLECTION, itinerary_id)
+
+    if not itinerary:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    # Ensure itinerary belongs to the current user
+    if itinerary.get('userId') != str(user['_id']):
+        return jsonify({'message': 'Unauthorized access to itinerary'}), 403
+
+    return jsonify(itinerary), 200
+
+
+@trip_bp.route('/itineraries', methods=['POST'])
+@token_required
+def create_itinerary():
+    """Create a new travel itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    required_fields = ['name', 'destination', 'startDate', 'endDate']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+
+    # Create itinerary document
+    itinerary = {
+        'userId': str(user['_id']),
+        'name': data['name'],
+        'destination': data['destination'],
+        'startDate': data['startDate'],
+        'endDate': data['endDate'],
+        'activities': data.get('activities', []),
+        'accommodations': data.get('accommodations', []),
+        'transportation': data.get('transportation', []),
+        'totalBudget': data.get('totalBudget', 0),
+        'notes': data.get('notes', ''),
+        'createdAt': datetime.datetime.utcnow().isoformat(),
+        'updatedAt': datetime.datetime.utcnow().isoformat()
+    }
+    itinerary.update(itinerary_rollups.itinerary_rollups(itinerary))
+
+    # Insert itinerary document
+    itinerary_id = db.insert_one_into_collection(DB_NAME, ITINERARIES_COLLECTION, itinerary)
+
+    if not itinerary_id:
+        return jsonify({'message': 'Failed to create itinerary'}), 500
+
+    itinerary['id'] = itinerary_id
+
+    return jsonify({
+        'message': 'Itinerary created successfully',
+        'itinerary': itinerary
+    }), 201
+
+
+@trip_bp.route('/itineraries/<itinerary_id>', methods=['PUT'])
+@token_required
+def update_itinerary(itinerary_id):
+    """Update a travel itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Get itinerary
+    itinerary = db_extensions.get_itinerary_by_id(DB_NAME, ITINERARIES_COLLECTION, itinerary_id)
+
+    if not itinerary:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    # Ensure itinerary belongs to the current user
+    if itinerary.get('userId') != str(user['_id']):
+        return jsonify({'message': 'Unauthorized access to itinerary'}), 403
+
+    # Fields that can be updated
+    updatable_fields = ['name', 'destination', 'startDate', 'endDate', 'activities',
+                        'accommodations', 'transportation', 'totalBudget', 'notes']
+
+    # Create update data with only allowed fields
+    update_data = {}
+    for field in updatable_fields:
+        if field in data:
+            update_data[field] = data[field]
+
+    # Add updatedAt timestamp
+    update_data['updatedAt'] = datetime.datetime.utcnow().isoformat()
+
+    if not update_data:
+        return jsonify({'message': 'No valid fields to update'}), 400
+
+    # Update itinerary in database
+    result = db_extensions.update_itinerary(DB_NAME, ITINERARIES_COLLECTION, itinerary_id, update_data)
+
+    if not result:
+        return jsonify({'message': 'Failed to update itinerary'}), 500
+
+    # Get updated itinerary
+    updated_itinerary = db_extensions.get_itinerary_by_id(DB_NAME, ITINERARIES_COLLECTION, itinerary_id)
+
+    return jsonify({
+        'message': 'Itinerary updated successfully',
+        'itinerary': updated_itinerary
+    }), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>', methods=['DELETE'])
+@token_required
+def delete_itinerary(itinerary_id):
+    """Delete a travel itinerary"""
+    user = request.user
+
+    # Get itinerary
+    itinerary = db_extensions.get_itinerary_by_id(DB_NAME, ITINERARIES_COLLECTION, itinerary_id)
+
+    if not itinerary:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    # Ensure itinerary belongs to the current user
+    if itinerary.get('userId') != str(user['_id']):
+        return jsonify({'message': 'Unauthorized access to itinerary'}), 403
+
+    # Delete itinerary
+    result = db_extensions.delete_itinerary(DB_NAME, ITINERARIES_COLLECTION, itinerary_id)
+
+    if not result:
+        return jsonify({'message': 'Failed to delete itinerary'}), 500
+
+    return jsonify({'message': 'Itinerary deleted successfully'}), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/items', methods=['PATCH'])
+@token_required
+def patch_itinerary_items(itinerary_id):
+    """Apply a batch of activity, accommodation and transportation edits atomically"""
+    user = request.user
+    data = request.get_json() or {}
+
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'message': 'operations must be a non-empty list'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'message': f'At most {MAX_BATCH_OPERATIONS} operations per request'}), 400
+
+    changes = []
+    referenced = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            return jsonify({'message': f'Operation {index}: must be an object'}), 400
+        section = operation.get('section')
+        op = operation.get('op')
+        operation_data = operation.get('data') or {}
+        if not isinstance(section, str) or section not in ITINERARY_ITEM_FIELDS:
+            return jsonify({'message': f'Operation {index}: unknown section {section}'}), 400
+        if op not in ('add', 'update', 'delete'):
+            return jsonify({'message': f'Operation {index}: op must be add, update or delete'}), 400
+        if not isinstance(operation_data, dict):
+            return jsonify({'message': f'Operation {index}: data must be an object'}), 400
+        invalid_field = invalid_item_field(section, operation_data)
+        if invalid_field:
+            return jsonify({'message': f'Operation {index}: invalid field: {invalid_field}'}), 400
+
+        if op == 'add':
+            missing_field = missing_item_field(section, operation_data)
+            if missing_field:
+                return jsonify({'message': f'Operation {index}: missing required field: {missing_field}'}), 400
+            changes.append({'op': 'add', 'section': section, 'item': build_itinerary_item(section, operation_data)})
+            continue
+
+        item_id = operation.get('id')
+        if not isinstance(item_id, str) or not item_id:
+            return jsonify({'message': f'Operation {index}: id is required'}), 400
+        if (section, item_id) in referenced:
+            return jsonify({'message': f'Operation {index}: {item_id} is already changed by this batch'}), 400
+        referenced.add((section, item_id))
+
+        if op == 'update':
+            update_data = itinerary_item_updates(section, operation_data)
+            if not update_data:
+                return jsonify({'message': f'Operation {index}: no valid fields to update'}), 400
+            changes.append({'op': 'update', 'section': section, 'id': item_id, 'data': update_data})
+        else:
+            changes.append({'op': 'delete', 'section': section, 'id': item_id})
+
+    # One atomic write: either every operation applies or none does
+    itinerary = db_extensions.apply_itinerary_changes(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                                      str(user['_id']), changes)
+
+    if not itinerary:
+        return jsonify({'message': 'Itinerary not found, or an operation references a missing entry'}), 404
+
+    return jsonify({
+        'message': 'Itinerary updated successfully',
+        'itinerary': itinerary,
+        'added': [change['item'] for change in changes if change['op'] == 'add']
+    }), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/activities', methods=['POST'])
+@token_required
+def add_activity(itinerary_id):
+    """Add an activity to an itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    missing_field = missing_item_field('activities', data)
+    if missing_field:
+        return jsonify({'message': f'Missing required field: {missing_field}'}), 400
+
+    # Create activity with ID
+    activity = build_itinerary_item('activities', data)
+
+    # Add activity to itinerary; the update only matches the user's own itinerary
+    added = db_extensions.add_itinerary_item(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                             str(user['_id']), 'activities', activity)
+
+    if not added:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    return jsonify({
+        'message': 'Activity added successfully',
+        'activity': activity
+    }), 201
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/activities/<activity_id>', methods=['PUT'])
+@token_required
+def update_activity(itinerary_id, activity_id):
+    """Update an activity in an itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Create update data with only allowed fields
+    update_data = itinerary_item_updates('activities', data)
+
+    if not update_data:
+        return jsonify({'message': 'No valid fields to update'}), 400
+
+    # Update the activity and get it back in one round-trip; ownership is part of the filter
+    updated_activity = db_extensions.update_itinerary_item(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                                           str(user['_id']), 'activities', activity_id,
+                                                           update_data)
+
+    if not updated_activity:
+        return jsonify({'message': 'Activity not found in itinerary'}), 404
+
+    return jsonify({
+        'message': 'Activity updated successfully',
+        'activity': updated_activity
+    }), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/activities/<activity_id>', methods=['DELETE'])
+@token_required
+def delete_activity(itinerary_id, activity_id):
+    """Delete an activity from an itinerary"""
+    user = request.user
+
+    # Delete activity; ownership is part of the filter
+    deleted = db_extensions.delete_itinerary_item(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                                  str(user['_id']), 'activities', activity_id)
+
+    if not deleted:
+        return jsonify({'message': 'Activity not found in itinerary'}), 404
+
+    return jsonify({'message': 'Activity deleted successfully'}), 200
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/accommodations', methods=['POST'])
+@token_required
+def add_accommodation(itinerary_id):
+    """Add an accommodation to an itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    missing_field = missing_item_field('accommodations', data)
+    if missing_field:
+        return jsonify({'message': f'Missing required field: {missing_field}'}), 400
+
+    # Create accommodation with ID
+    accommodation = build_itinerary_item('accommodations', data)
+
+    # Add accommodation to itinerary; the update only matches the user's own itinerary
+    added = db_extensions.add_itinerary_item(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                             str(user['_id']), 'accommodations', accommodation)
+
+    if not added:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    return jsonify({
+        'message': 'Accommodation added successfully',
+        'accommodation': accommodation
+    }), 201
+
+
+@trip_bp.route('/itineraries/<itinerary_id>/transportation', methods=['POST'])
+@token_required
+def add_transportation(itinerary_id):
+    """Add transportation to an itinerary"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    missing_field = missing_item_field('transportation', data)
+    if missing_field:
+        return jsonify({'message': f'Missing required field: {missing_field}'}), 400
+
+    # Create transportation with ID
+    transportation = build_itinerary_item('transportation', data)
+
+    # Add transportation to itinerary; the update only matches the user's own itinerary
+    added = db_extensions.add_itinerary_item(DB_NAME, ITINERARIES_COLLECTION, itinerary_id,
+                                             str(user['_id']), 'transportation', transportation)
+
+    if not added:
+        return jsonify({'message': 'Itinerary not found'}), 404
+
+    return jsonify({
+        'message': 'Transportation added successfully',
+        'transportation': transportation
+    }), 201
\ No newline at end of file
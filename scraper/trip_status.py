@@ -0,0 +1,76 @@
+import datetime
+import threading
+import logging
+import pymongo
+import db
+
+logger = logging.getLogger(__name__)
+
+# Trips are created 'upcoming' and only the cancel route changes their status
+# by hand. This sweep moves them to 'active' once the check-in day arrives and
+# to 'completed' on the check-out day, so review eligibility is a plain
+# indexed count on status. checkIn/checkOut are 'YYYY-MM-DD' (or ISO
+# datetime) strings, which order the same way as the dates they hold.
+
+TRIPS_COLLECTION = "trips"
+
+# Default seconds between sweeps
+SWEEP_INTERVAL = 15 * 60
+
+
+def ensure_trip_indexes(db_name, collection_name=TRIPS_COLLECTION):
+    """Create the indexes used by the status sweep and review eligibility checks"""
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        collection.create_index([("status", pymongo.ASCENDING), ("checkIn", pymongo.ASCENDING)])
+        collection.create_index([("status", pymongo.ASCENDING), ("checkOut", pymongo.ASCENDING)])
+        collection.create_index([("userId", pymongo.ASCENDING), ("listingId", pymongo.ASCENDING),
+                                 ("status", pymongo.ASCENDING)])
+        return True
+    except Exception as e:
+        logger.error(f"Error creating trip indexes: {str(e)}")
+        return False
+
+
+def sweep_trip_statuses(db_name, collection_name=TRIPS_COLLECTION, today=None):
+    """Move trips whose dates have come to 'active' or 'completed'
+
+    Returns the number of trips moved to each status.
+    """
+    try:
+        collection = db.get_collection(db_name, collection_name)
+        today = today or datetime.date.today()
+        # Anything before tomorrow is on or before today, including datetime strings for today
+        tomorrow = (today + datetime.timedelta(days=1)).isoformat()
+        now = datetime.datetime.utcnow().isoformat()
+
+        # Completed first, so a trip that was missed entirely goes straight from upcoming to completed
+        completed = collection.update_many(
+            {"status": {"$in": ["upcoming", "active"]}, "checkOut": {"$lt": tomorrow}},
+            {"$set": {"status": "completed", "statusUpdatedAt": now}}
+        )
+        active = collection.update_many(
+            {"status": "upcoming", "checkIn": {"$lt": tomorrow}},
+            {"$set": {"status": "active", "statusUpdatedAt": now}}
+        )
+
+        counts = {"active": active.modified_count, "completed": completed.modified_count}
+        if counts["active"] or counts["completed"]:
+            logger.info(f"Trip status sweep: {counts['active']} active, {counts['completed']} completed")
+        return counts
+    except Exception as e:
+        logger.error(f"Error sweeping trip statuses: {str(e)}")
+        return {"active": 0, "completed": 0}
+
+
+def start_sweeper(db_name, interval=SWEEP_INTERVAL, collection_name=TRIPS_COLLECTION):
+    """Sweep now and then every `interval` seconds on a daemon thread; returns an Event that stops it"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            sweep_trip_statuses(db_name, collection_name)
+            stop.wait(interval)
+
+    threading.Thread(target=run, name="trip-status-sweeper", daemon=True).start()
+    return stop
@@ -0,0 +1,270 @@
+from flask import Blueprint, request, jsonify
+from bson import ObjectId
+from auth_routes import token_required
+from bson.json_util import dumps
+import json
+import db
+import db_extensions
+import saved_listings
+import personalization
+import logging
+import datetime
+
+user_bp = Blueprint('user', __name__)
+
+# Constants
+DB_NAME = "airbnb"
+USERS_COLLECTION = "users"
+LISTINGS_COLLECTION = "listings"
+TRIPS_COLLECTION = "trips"
+PAYMENT_METHODS_COLLECTION = "payment_methods"
+
+
+@user_bp.route('/profile', methods=['GET'])
+@token_required
+def get_profile():
+    """Get the current user's profile"""
+    user = request.user
+    user.pop('password', None)  # Remove password from response
+
+    return jsonify(json.loads(dumps(user))), 200
+
+
+@user_bp.route('/profile', methods=['PUT'])
+@token_required
+def update_profile():
+    """Update the current user's profile"""
+    data = request.get_json()
+    user = request.user
+
+    # Fields that can be updated
+    updatable_fields = ['name', 'phone', 'profileImage', 'bio']
+
+    # Create update data with only allowed fields
+    update_data = {}
+    for field in updatable_fields:
+        if field in data:
+            update_data[field] = data[field]
+
+    # Don't allow updating email through this endpoint (should have separate email change flow)
+    if not update_data:
+        return jsonify({'message': 'No valid fields to update'}), 400
+
+    # Update user in database
+    result = db.update_user(DB_NAME, USERS_COLLECTION, str(user['_id']), update_data)
+
+    if not result:
+        return jsonify({'message': 'Failed to update profile'}), 500
+
+    # Get updated user
+    updated_user = db.get_user_by_id(DB_NAME, USERS_COLLECTION, str(user['_id']))
+    updated_user.pop('password', None)  # Remove password from response
+
+    return jsonify({
+        'message': 'Profile updated successfully',
+        'user': json.loads(dumps(updated_user))
+    }), 200
+
+
+@user_bp.route('/saved-listings', methods=['GET'])
+@token_required
+def get_saved_listings():
+    """Get a page of the user's saved listings, newest first"""
+    user = request.user
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = min(saved_listings.MAX_PAGE_SIZE, max(1, int(request.args.get('pageSize', 20))))
+    except ValueError:
+        return jsonify({'message': 'page and pageSize must be integers'}), 400
+
+    listings, total_count = saved_listings.get_saved_listings(DB_NAME, str(user['_id']), page, page_size)
+
+    return jsonify({
+        'listings': listings,
+        'totalCount': total_count,
+        'pageCount': (total_count + page_size - 1) // page_size,
+        'currentPage': page
+    }), 200
+
+
+@user_bp.route('/saved-listings/<listing_id>', methods=['POST'])
+@token_required
+def save_listing(listing_id):
+    """Save a listing to user's favorites"""
+    user = request.user
+
+    # Check if listing exists
+    listing = db.get_listing_by_id(DB_NAME, LISTINGS_COLLECTION, listing_id)
+    if not listing:
+        return jsonify({'message': 'Listing not found'}), 404
+
+    # Add listing to saved listings if not already saved
+    created = saved_listings.save_listing(DB_NAME, str(user['_id']), listing_id, listing)
+
+    if created is None:
+        return jsonify({'message': 'Failed to save listing'}), 500
+
+    if created:
+        personalization.record_interaction(DB_NAME, str(user['_id']), listing, personalization.SAVE_WEIGHT)
+
+    return jsonify({'message': 'Listing saved successfully'}), 200
+
+
+@user_bp.route('/saved-listings/<listing_id>', methods=['DELETE'])
+@token_required
+def remove_saved_listing(listing_id):
+    """Remove a listing from user's favorites"""
+    user = request.user
+
+    # Remove listing from saved listings
+    removed = saved_listings.remove_saved_listing(DB_NAME, str(user['_id']), listing_id)
+
+    if not removed:
+        return jsonify({'message': 'Saved listing not found'}), 404
+
+    # Take back what saving it added to the user's profile
+    personalization.undo_interaction(DB_NAME, LISTINGS_COLLECTION, str(user['_id']), removed,
+                                     personalization.SAVE_WEIGHT)
+
+    return jsonify({'message': 'Listing removed successfully'}), 200
+
+
+@user_bp.route('/trips', methods=['GET'])
+@token_required
+def get_trips():
+    """Get user's trips"""
+    user = request.user
+
+    # Filter status if provided
+    status = request.args.get('status')
+
+    # Get trips from database
+    trips = db.get_user_trips(DB_NAME, TRIPS_COLLECTION, str(user['_id']), status)
+
+    return jsonify(trips), 200
+
+
+@user_bp.route('/payment-methods', methods=['GET'])
+@token_required
+def get_payment_methods():
+    """Get user's payment methods"""
+    user = request.user
+
+    # Get payment methods from database
+    payment_methods = db_extensions.get_user_payment_methods(DB_NAME, PAYMENT_METHODS_COLLECTION, user)
+
+    return jsonify(payment_methods), 200
+
+
+@user_bp.route('/payment-methods', methods=['POST'])
+@token_required
+def add_payment_method():
+    """Add a new payment method"""
+    user = request.user
+    data = request.get_json()
+
+    # Validate required fields
+    required_fields = ['type', 'cardNumber', 'expMonth', 'expYear']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+
+    # In a real app, you would validate the card details and process it through a payment gateway
+    # Here we'll just store the last 4 digits for privacy and security
+
+    # Create payment method document
+    payment_method = {
+        'userId': str(user['_id']),
+        'type': data['type'],
+        'last4': data['cardNumber'][-4:],  # Only store last 4 digits
+        'expMonth': data['expMonth'],
+        'expYear': data['expYear'],
+        'createdAt': datetime.datetime.utcnow()
+    }
+
+    # Insert payment method; the user's first one becomes the default
+    payment_method_id, is_default = db_extensions.add_payment_method(
+        DB_NAME, USERS_COLLECTION, PAYMENT_METHODS_COLLECTION, str(user['_id']), payment_method)
+
+    if not payment_method_id:
+        return jsonify({'message': 'Failed to add payment method'}), 500
+
+    del payment_method['_id']
+    payment_method['id'] = payment_method_id
+    payment_method['isDefault'] = is_default
+
+    return jsonify({
+        'message': 'Payment method added successfully',
+        'paymentMethod': payment_method
+    }), 201
+
+
+@user_bp.route('/payment-methods/<payment_method_id>/default', methods=['PUT'])
+@token_required
+def set_default_payment_method(payment_method_id):
+    """Set a payment method as default"""
+    user = request.user
+
+    # Update payment method as default
+    result = db_extensions.set_default_payment_method(DB_NAME, USERS_COLLECTION, str(user['_id']), payment_method_id)
+
+    if not result:
+        return jsonify({'message': 'Payment method not found'}), 404
+
+    return jsonify({'message': 'Default payment method updated successfully'}), 200
+
+
+@user_bp.route('/payment-methods/<payment_method_id>', methods=['DELETE'])
+@token_required
+def remove_payment_method(payment_method_id):
+    """Remove a payment method"""
+    user = request.user
+
+    # Remove payment method; refused if it isn't the user's, or is their default while they have others
+    result = db_extensions.remove_payment_method(DB_NAME, USERS_COLLECTION, PAYMENT_METHODS_COLLECTION,
+                                                 str(user['_id']), payment_method_id)
+
+    if not result:
+        # Re-read the user to tell which, rather than trusting the copy loaded with the request
+        current = db.get_user_by_id(DB_NAME, USERS_COLLECTION, str(user['_id'])) or {}
+        if payment_method_id in current.get('paymentMethodIds', []):
+            return jsonify(
+                {'message': 'Cannot remove default payment method. Please set another method as default first.'}), 400
+        return jsonify({'message': 'Payment method not found'}), 404
+
+    return jsonify({'message': 'Payment method removed successfully'}), 200
+
+
+@user_bp.route('/notification-preferences', methods=['GET'])
+@token_required
+def get_notification_preferences():
+    """Get user's notification preferences"""
+    user = request.user
+
+    # Get notification preferences from user document
+    notification_preferences = user.get('notificationPreferences', [])
+
+    return jsonify(notification_preferences), 200
+
+
+@user_bp.route('/notification-preferences', methods=['PUT'])
+@token_required
+def update_notification_preferences():
+    """Update user's notification preferences"""
+    user = request.user
+    data = request.get_json()
+
+    if not isinstance(data, list):
+        return jsonify({'message': 'Invalid data format. Expected array of notification preferences.'}), 400
+
+    # Update notification preferences
+    result = db.update_notification_preferences(DB_NAME, USERS_COLLECTION, str(user['_id']), data)
+
+    if not result:
+        return jsonify({'message': 'Failed to update notification preferences'}), 500
+
+    return jsonify({
+        'message': 'Notification preferences updated successfully',
+        'preferences': data
+    }), 200
\ No newline at end of file